@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Announcement, Translation, AudioFile, DisplayBoard
+from .models import Announcement, Translation, AudioBlob, AudioFile, DisplayBoard
 
 
 @admin.register(Announcement)
@@ -42,8 +42,8 @@ class TranslationAdmin(admin.ModelAdmin):
 
 @admin.register(AudioFile)
 class AudioFileAdmin(admin.ModelAdmin):
-    list_display = ['announcement', 'language_code', 'audio_file', 'duration_seconds', 'tts_service', 'created_at']
-    list_filter = ['language_code', 'tts_service', 'created_at']
+    list_display = ['announcement', 'language_code', 'variant', 'audio_file', 'duration_seconds', 'tts_service', 'created_at']
+    list_filter = ['language_code', 'variant', 'tts_service', 'created_at']
     search_fields = ['announcement__text']
     readonly_fields = ['created_at']
     
@@ -53,6 +53,14 @@ class AudioFileAdmin(admin.ModelAdmin):
         return self.readonly_fields
 
 
+@admin.register(AudioBlob)
+class AudioBlobAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'language_code', 'variant', 'tts_service', 'duration_seconds', 'ref_count', 'created_at']
+    list_filter = ['language_code', 'variant', 'tts_service', 'created_at']
+    search_fields = ['content_hash']
+    readonly_fields = ['content_hash', 'audio_file', 'ref_count', 'created_at']
+
+
 @admin.register(DisplayBoard)
 class DisplayBoardAdmin(admin.ModelAdmin):
     list_display = ['name', 'location', 'is_active', 'current_announcement', 'updated_at']
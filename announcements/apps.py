@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AnnouncementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'announcements'
+
+    def ready(self):
+        from django.conf import settings
+        from .services import LanguageDetector
+
+        if getattr(settings, 'LANGUAGE_DETECTION_PRELOAD', True):
+            LanguageDetector.preload()
@@ -5,6 +5,7 @@ import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.utils import timezone
 from .models import Announcement, Translation, AudioFile
 
 logger = logging.getLogger(__name__)
@@ -67,6 +68,35 @@ class DisplayBoardConsumer(AsyncWebsocketConsumer):
             'announcement': announcement_data
         }))
     
+    async def announcement_processing(self, event):
+        """Handle announcement_processing event: a new announcement has started processing"""
+        await self.send(text_data=json.dumps({
+            'type': 'announcement_processing',
+            'announcement_id': event.get('announcement_id'),
+        }))
+    
+    async def translation_ready(self, event):
+        """Handle translation_ready event for a subscribed announcement"""
+        await self.send(text_data=json.dumps({
+            'type': 'translation_ready',
+            'announcement_id': event.get('announcement_id'),
+            'language_code': event.get('language_code'),
+            'text': event.get('text'),
+            'translation_service': event.get('translation_service'),
+        }))
+    
+    async def audio_ready(self, event):
+        """Handle audio_ready event for a subscribed announcement"""
+        await self.send(text_data=json.dumps({
+            'type': 'audio_ready',
+            'announcement_id': event.get('announcement_id'),
+            'language_code': event.get('language_code'),
+            'audio_url': event.get('audio_url'),
+            'duration_seconds': event.get('duration_seconds'),
+            'waveform_peaks': event.get('waveform_peaks'),
+            'variants': event.get('variants', []),
+        }))
+    
     async def send_current_announcements(self):
         """Send current active announcements to client"""
         announcements = await self.get_active_announcements()
@@ -81,39 +111,49 @@ class DisplayBoardConsumer(AsyncWebsocketConsumer):
         """Get active announcements from database"""
         from django.db.models import Case, When, IntegerField
         
+        # Scheduled announcements appear when they are due
         announcements = Announcement.objects.filter(
             is_active=True
-        ).exclude(status='failed').annotate(
+        ).exclude(
+            status__in=['failed', 'scheduled']
+        ).exclude(
+            announcement_time__gt=timezone.now()
+        ).annotate(
             status_order=Case(
                 When(status='completed', then=1),
                 When(status='processing', then=2),
-                When(status='pending', then=3),
+                When(status__in=['pending', 'queued'], then=3),
                 default=4,
                 output_field=IntegerField()
             )
         ).order_by('status_order', '-priority', '-created_at')[:10]
         
+        announcements = list(announcements)
+        audio_payload = AudioFile.audio_payload([ann.id for ann in announcements])
+        
         result = []
         for ann in announcements:
+            audio = audio_payload.get(ann.id, {})
             translations = {}
             for trans in ann.translations.all():
                 translations[trans.language_code] = {
                     'text': trans.translated_text,
-                    'audio_url': None
+                    'audio_url': None,
+                    'audio_variants': [],
+                    'waveform_peaks': None,
                 }
-                # Get audio URL
-                audio = AudioFile.objects.filter(
-                    announcement=ann,
-                    language_code=trans.language_code
-                ).first()
-                if audio:
-                    translations[trans.language_code]['audio_url'] = audio.audio_file.url
+                # Get audio URLs
+                if trans.language_code in audio:
+                    translations[trans.language_code]['audio_url'] = audio[trans.language_code]['audio_url']
+                    translations[trans.language_code]['audio_variants'] = audio[trans.language_code]['variants']
+                    translations[trans.language_code]['waveform_peaks'] = audio[trans.language_code]['waveform_peaks']
             
             result.append({
                 'id': ann.id,
                 'text': ann.text,
                 'detected_language': ann.detected_language,
                 'translations': translations,
+                'program': audio.get(AudioFile.PROGRAM_LANGUAGE),
                 'priority': ann.priority,
                 'created_at': ann.created_at.isoformat(),
             })
@@ -1,9 +1,53 @@
 """
 Management command to process pending announcements
 """
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
 from announcements.models import Announcement
-from announcements.tasks import process_announcement
+from announcements.tasks import enqueue_announcement, enqueue_announcements, process_announcement
+
+
+def init_worker():
+    """Pool process setup: Django apps, and no database connections shared with the parent"""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def process_one(announcement_id):
+    """
+    Run the whole pipeline for one announcement (in a pool process).
+    
+    Returns:
+        tuple: (announcement_id, success: bool, seconds: float, error: str or None)
+    """
+    started = time.monotonic()
+    try:
+        process_announcement(announcement_id)
+        return announcement_id, True, time.monotonic() - started, None
+    except Exception as e:
+        return announcement_id, False, time.monotonic() - started, str(e)
+
+
+class Throttle:
+    """Space out starts to at most `rate` per second (no limit when rate is falsy)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.interval = 1.0 / rate if rate else 0
+        self.next_start = time.monotonic()
+
+    def wait(self, count=1):
+        """Wait for the next start slot and reserve `count` starts from it"""
+        if not self.interval:
+            return
+        delay = self.next_start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_start = max(self.next_start, time.monotonic()) + self.interval * count
 
 
 class Command(BaseCommand):
@@ -20,6 +64,24 @@ class Command(BaseCommand):
             type=int,
             help='Process specific announcement ID',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes running the pipeline in parallel with --sync (default: 1, inline)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Pending announcements claimed per round (default: 50)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Maximum announcements started or queued per second (default: no limit)',
+        )
 
     def handle(self, *args, **options):
         if options['id']:
@@ -33,32 +95,157 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.SUCCESS(f'Successfully processed announcement #{announcement.id}'))
                 else:
                     # Process via Celery
-                    process_announcement.delay(announcement.id)
+                    enqueue_announcement(announcement)
                     self.stdout.write(self.style.SUCCESS(f'Successfully queued announcement #{announcement.id}'))
             except Announcement.DoesNotExist:
                 self.stdout.write(self.style.ERROR(f'Announcement #{options["id"]} not found'))
+            return
+        
+        if options['workers'] < 1 or options['batch_size'] < 1 or options['rate'] < 0:
+            raise CommandError('--workers and --batch-size must be at least 1, --rate must not be negative')
+        
+        count = Announcement.objects.filter(status='pending').count()
+        if count == 0:
+            self.stdout.write(self.style.WARNING('No pending announcements found'))
+            return
+        self.stdout.write(f'Found {count} pending announcement(s)')
+        
+        self.started = time.monotonic()
+        self.latencies = []
+        self.succeeded = 0
+        self.failed = 0
+        if options['sync']:
+            self.process_sync(options['workers'], options['batch_size'], Throttle(options['rate']))
         else:
-            # Process all pending announcements
-            pending = Announcement.objects.filter(status='pending')
-            count = pending.count()
-            
-            if count == 0:
-                self.stdout.write(self.style.WARNING('No pending announcements found'))
-                return
-            
-            self.stdout.write(f'Found {count} pending announcement(s)')
-            
-            for announcement in pending:
-                self.stdout.write(f'Processing announcement #{announcement.id}...')
-                if options['sync']:
-                    # Process synchronously (for testing)
-                    try:
-                        process_announcement(announcement.id)
-                        self.stdout.write(self.style.SUCCESS(f'Successfully processed announcement #{announcement.id}'))
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f'Error processing announcement #{announcement.id}: {e}'))
-                else:
-                    # Process via Celery
-                    process_announcement.delay(announcement.id)
-                    self.stdout.write(self.style.SUCCESS(f'Queued announcement #{announcement.id} for processing'))
+            self.enqueue_all(options['batch_size'], Throttle(options['rate']))
+        self.report(final=True)
+
+    def claim_batch(self, batch_size, claim_status='processing', exclude=()):
+        """
+        Atomically take up to batch_size pending announcements, most urgent first.
+        
+        The batch is claimed with one conditional UPDATE (status pending ->
+        claim_status). Candidates are locked with SKIP LOCKED where the
+        database supports it, so concurrent runs take different rows;
+        elsewhere only rows carrying this claim's updated_at stamp are
+        returned, so when two runs race for a row exactly one of them gets
+        it. Rows already in the broker ('queued', e.g. scheduled pre-renders)
+        are never pending.
+        
+        Args:
+            exclude: IDs not to claim (e.g. ones the broker refused this run)
+        
+        Returns:
+            list: Claimed announcements (with the fields lanes and scheduling need)
+        """
+        with transaction.atomic():
+            candidates = list(
+                Announcement.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .exclude(id__in=list(exclude))
+                .order_by('-priority', 'created_at')
+                .only('id', 'priority', 'is_urgent', 'announcement_time')[:batch_size]
+            )
+            if not candidates:
+                return []
+            now = timezone.now()
+            ids = [announcement.id for announcement in candidates]
+            claimed = Announcement.objects.filter(id__in=ids, status='pending').update(status=claim_status, updated_at=now)
+        if claimed < len(candidates):
+            ours = set(
+                Announcement.objects.filter(id__in=ids, status=claim_status, updated_at=now)
+                .values_list('id', flat=True)
+            )
+            candidates = [announcement for announcement in candidates if announcement.id in ours]
+        return candidates
 
+    def process_sync(self, workers, batch_size, throttle):
+        """Run the pipeline for every pending announcement, inline or on a process pool"""
+        if workers == 1:
+            while True:
+                claimed = self.claim_batch(batch_size)
+                if not claimed:
+                    return
+                for announcement in claimed:
+                    throttle.wait()
+                    self.record(*process_one(announcement.id))
+                self.report()
+        
+        # Forked processes must not inherit the parent's open database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            running = set()
+            while True:
+                # Keep about one batch in flight; claim more only as results come back
+                if len(running) < batch_size:
+                    claimed = self.claim_batch(batch_size - len(running))
+                    for announcement in claimed:
+                        throttle.wait()
+                        running.add(pool.submit(process_one, announcement.id))
+                    if not claimed and not running:
+                        return
+                done, running = wait(running, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.record(*future.result())
+                if done:
+                    self.report()
+
+    def enqueue_all(self, batch_size, throttle):
+        """
+        Queue every pending announcement, a claimed batch at a time over one broker connection.
+        
+        Rows the broker refuses go back to pending and are not claimed again
+        in this run; a batch the broker refuses entirely (broker down) ends it.
+        """
+        if throttle.rate:
+            # A batch is published at once, so never claim more than --rate per second
+            batch_size = min(batch_size, max(1, int(throttle.rate)))
+        refused = set()
+        with process_announcement.app.producer_or_acquire() as producer:
+            while True:
+                claimed = self.claim_batch(batch_size, claim_status='queued', exclude=refused)
+                if not claimed:
+                    return
+                throttle.wait(len(claimed))
+                started = time.monotonic()
+                _, _, failed = enqueue_announcements(claimed, producer=producer)
+                seconds = time.monotonic() - started
+                for announcement in claimed:
+                    error = failed.get(announcement.id)
+                    self.record(announcement.id, error is None, seconds, None if error is None else str(error))
+                self.report()
+                refused.update(failed)
+                if len(failed) == len(claimed):
+                    self.stdout.write(self.style.ERROR('The broker refused a whole batch; leaving the rest pending'))
+                    return
+
+    def record(self, announcement_id, success, seconds, error):
+        self.latencies.append(seconds)
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+            self.stdout.write(self.style.ERROR(f'Error processing announcement #{announcement_id}: {error}'))
+
+    @staticmethod
+    def percentile(ordered, fraction):
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    def report(self, final=False):
+        """Print throughput and per-announcement latency so far"""
+        done = self.succeeded + self.failed
+        elapsed = time.monotonic() - self.started
+        ordered = sorted(self.latencies)
+        line = (
+            f'{done} done ({self.succeeded} ok, {self.failed} failed) in {elapsed:.1f}s, '
+            f'{done / elapsed if elapsed else 0:.2f}/s, '
+            f'latency p50 {self.percentile(ordered, 0.5):.2f}s p95 {self.percentile(ordered, 0.95):.2f}s '
+            f'max {ordered[-1] if ordered else 0:.2f}s'
+        )
+        if final:
+            style = self.style.SUCCESS if not self.failed else self.style.WARNING
+            self.stdout.write(style(f'Finished: {line}'))
+        else:
+            self.stdout.write(line)
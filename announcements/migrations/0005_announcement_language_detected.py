@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0004_announcement_fixed_at_announcement_is_fixed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='language_detected',
+            field=models.BooleanField(default=False, help_text='Whether detected_language was set by the detector'),
+        ),
+    ]
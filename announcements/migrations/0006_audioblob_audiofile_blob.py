@@ -0,0 +1,33 @@
+# Generated by Django 5.0.4 on 2026-10-18 10:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0005_announcement_language_detected'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of text, language, engine and voice settings', max_length=64, unique=True)),
+                ('audio_file', models.FileField(help_text='Shared audio file', upload_to='audio/blobs/')),
+                ('language_code', models.CharField(help_text='Language of the audio', max_length=10)),
+                ('duration_seconds', models.FloatField(blank=True, help_text='Duration of audio in seconds', null=True)),
+                ('tts_service', models.CharField(help_text='TTS service used (coqui, pyttsx3)', max_length=50)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of AudioFile rows using this blob')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Shared content-addressed audio', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audio_files', to='announcements.audioblob'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0006_audioblob_audiofile_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioblob',
+            name='variant',
+            field=models.CharField(default='wav', help_text='Encoding variant (wav master, opus, opus_low, mp3)', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='variant',
+            field=models.CharField(default='wav', help_text='Encoding variant (wav master, opus, opus_low, mp3)', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='mime_type',
+            field=models.CharField(default='audio/wav', help_text='MIME type of the audio file', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='bitrate_kbps',
+            field=models.PositiveIntegerField(blank=True, help_text='Nominal bitrate of compressed variants', null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='audiofile',
+            unique_together={('announcement', 'language_code', 'variant')},
+        ),
+    ]
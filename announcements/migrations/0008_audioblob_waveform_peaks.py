@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0007_audio_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioblob',
+            name='waveform_peaks',
+            field=models.JSONField(blank=True, help_text='Downsampled absolute peaks (0-1) for waveform display', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0008_audioblob_waveform_peaks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='Fingerprint of the text detected_language was derived from', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='source_hash',
+            field=models.CharField(blank=True, help_text='Fingerprint of the source text and language translated (blank: retry)', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='source_hash',
+            field=models.CharField(blank=True, help_text='Fingerprint of the spoken text and language', max_length=64),
+        ),
+    ]
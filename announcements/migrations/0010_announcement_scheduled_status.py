@@ -0,0 +1,22 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0009_content_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='announcement',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(fields=['status', 'announcement_time'], name='announcemen_status_9553ce_idx'),
+        ),
+    ]
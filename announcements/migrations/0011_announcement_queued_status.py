@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0010_announcement_scheduled_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='announcement',
+            name='status',
+            field=models.CharField(choices=[('scheduled', 'Scheduled'), ('pending', 'Pending'), ('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -1,13 +1,26 @@
-from django.db import models
+import hashlib
+import unicodedata
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.conf import settings
 
 
+def content_fingerprint(*parts):
+    """SHA-256 over whitespace- and Unicode-normalized parts (identical content, identical fingerprint)"""
+    normalized = '\x1f'.join(' '.join(unicodedata.normalize('NFC', str(part or '')).split()) for part in parts)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
 class Announcement(models.Model):
     """Main announcement model"""
     STATUS_CHOICES = [
+        ('scheduled', 'Scheduled'),
         ('pending', 'Pending'),
+        ('queued', 'Queued'),
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
@@ -17,6 +30,8 @@ class Announcement(models.Model):
     description = models.TextField(blank=True, help_text="Detailed description")
     text = models.TextField(help_text="Original announcement text")
     detected_language = models.CharField(max_length=10, default='en', help_text="Auto-detected language code")
+    language_detected = models.BooleanField(default=False, help_text="Whether detected_language was set by the detector")
+    content_hash = models.CharField(max_length=64, blank=True, help_text="Fingerprint of the text detected_language was derived from")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
     handler = models.CharField(max_length=100, blank=True, help_text="Official name handling this announcement")
@@ -43,10 +58,19 @@ class Announcement(models.Model):
         indexes = [
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['is_active', '-priority', '-created_at']),
+            models.Index(fields=['status', 'announcement_time']),
         ]
     
     def __str__(self):
         return f"Announcement #{self.id} - {self.text[:50]}..."
+    
+    def current_fingerprint(self):
+        """Fingerprint of the text as it is now"""
+        return content_fingerprint(self.text)
+    
+    def translation_source_hash(self):
+        """Source hash an up-to-date Translation of this announcement carries"""
+        return content_fingerprint(self.text, self.detected_language)
 
 
 class Translation(models.Model):
@@ -57,6 +81,7 @@ class Translation(models.Model):
     
     created_at = models.DateTimeField(default=timezone.now)
     translation_service = models.CharField(max_length=50, default='libretranslate', help_text="Service used for translation")
+    source_hash = models.CharField(max_length=64, blank=True, help_text="Fingerprint of the source text and language translated (blank: retry)")
     
     class Meta:
         unique_together = ['announcement', 'language_code']
@@ -68,26 +93,156 @@ class Translation(models.Model):
         return f"{self.announcement.id} -> {self.language_code}: {self.translated_text[:50]}..."
 
 
+class AudioBlob(models.Model):
+    """Content-addressed audio shared by every AudioFile with the same spoken content"""
+    content_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of text, language, engine and voice settings")
+    audio_file = models.FileField(upload_to='audio/blobs/', help_text="Shared audio file")
+    language_code = models.CharField(max_length=10, help_text="Language of the audio")
+    duration_seconds = models.FloatField(null=True, blank=True, help_text="Duration of audio in seconds")
+    tts_service = models.CharField(max_length=50, help_text="TTS service used (coqui, pyttsx3)")
+    variant = models.CharField(max_length=20, default='wav', help_text="Encoding variant (wav master, opus, opus_low, mp3)")
+    waveform_peaks = models.JSONField(null=True, blank=True, help_text="Downsampled absolute peaks (0-1) for waveform display")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of AudioFile rows using this blob")
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Audio blob {self.content_hash[:12]} ({self.language_code}/{self.variant}, refs={self.ref_count})"
+    
+    @staticmethod
+    def path_for(content_hash, extension='wav'):
+        """Storage path (relative to MEDIA_ROOT) for a content hash"""
+        return f"audio/blobs/{content_hash[:2]}/{content_hash}.{extension}"
+    
+    def acquire(self):
+        """Add a reference"""
+        AudioBlob.objects.filter(pk=self.pk).update(ref_count=F('ref_count') + 1)
+    
+    @classmethod
+    def acquire_all(cls, blob_ids):
+        """
+        Add a reference to each blob in one query.
+        
+        Call inside a transaction: the rows stay locked until it commits, so a
+        concurrent release() cannot delete a blob between this and the link.
+        
+        Returns:
+            set: IDs of blobs that no longer exist (deleted by a release meanwhile)
+        """
+        blob_ids = set(blob_ids)
+        if not blob_ids:
+            return set()
+        locked = set(cls.objects.select_for_update().filter(pk__in=blob_ids).order_by('pk').values_list('pk', flat=True))
+        if locked:
+            cls.objects.filter(pk__in=locked).update(ref_count=F('ref_count') + 1)
+        return blob_ids - locked
+    
+    def _delete_with_file(self):
+        """Delete the (locked) row; its file goes once the deletion is committed"""
+        storage, name = self.audio_file.storage, self.audio_file.name
+        self.delete()
+        transaction.on_commit(lambda: storage.delete(name))
+    
+    def release(self):
+        """
+        Drop a reference; the blob and its file are deleted when none are left.
+        
+        The row is locked while its count is checked and it is deleted, so a
+        concurrent link either takes its reference first (and the blob stays)
+        or finds the blob gone.
+        """
+        with transaction.atomic():
+            blob = AudioBlob.objects.select_for_update().filter(pk=self.pk).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                AudioBlob.objects.filter(pk=self.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob._delete_with_file()
+    
+    @classmethod
+    def delete_unreferenced(cls, created_before):
+        """
+        Delete blobs that were stored but never linked (e.g. their link failed).
+        
+        Args:
+            created_before: Only blobs older than this; younger ones may still be on their way to a link
+        
+        Returns:
+            int: Number of blobs deleted
+        """
+        deleted = 0
+        candidates = cls.objects.filter(ref_count=0, created_at__lt=created_before, audio_files__isnull=True)
+        for pk in candidates.values_list('pk', flat=True):
+            with transaction.atomic():
+                blob = cls.objects.select_for_update().filter(pk=pk, ref_count=0).first()
+                if blob is not None and not blob.audio_files.exists():
+                    blob._delete_with_file()
+                    deleted += 1
+        return deleted
+
+
 class AudioFile(models.Model):
     """Stores generated audio files for announcements"""
+    # language_code of the sequenced multilingual program (chime + every language)
+    PROGRAM_LANGUAGE = 'program'
+    
     announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='audio_files')
     translation = models.ForeignKey(Translation, on_delete=models.CASCADE, related_name='audio_files', null=True, blank=True)
     language_code = models.CharField(max_length=10, help_text="Language of the audio")
     
     audio_file = models.FileField(upload_to='audio/%Y/%m/%d/', help_text="Generated audio file")
     duration_seconds = models.FloatField(null=True, blank=True, help_text="Duration of audio in seconds")
+    variant = models.CharField(max_length=20, default='wav', help_text="Encoding variant (wav master, opus, opus_low, mp3)")
+    mime_type = models.CharField(max_length=50, default='audio/wav', help_text="MIME type of the audio file")
+    bitrate_kbps = models.PositiveIntegerField(null=True, blank=True, help_text="Nominal bitrate of compressed variants")
     
     tts_service = models.CharField(max_length=50, default='coqui', help_text="TTS service used (coqui, pyttsx3)")
+    blob = models.ForeignKey(AudioBlob, on_delete=models.SET_NULL, related_name='audio_files', null=True, blank=True, help_text="Shared content-addressed audio")
+    source_hash = models.CharField(max_length=64, blank=True, help_text="Fingerprint of the spoken text and language")
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
-        unique_together = ['announcement', 'language_code']
+        unique_together = ['announcement', 'language_code', 'variant']
         indexes = [
             models.Index(fields=['announcement', 'language_code']),
         ]
     
     def __str__(self):
-        return f"Audio: {self.announcement.id} - {self.language_code}"
+        return f"Audio: {self.announcement.id} - {self.language_code} ({self.variant})"
+    
+    def as_variant(self):
+        """Variant description advertised to boards and API clients"""
+        return {
+            'variant': self.variant,
+            'url': self.audio_file.url,
+            'mime_type': self.mime_type,
+            'bitrate_kbps': self.bitrate_kbps,
+            'duration_seconds': self.duration_seconds,
+        }
+    
+    @classmethod
+    def audio_payload(cls, announcement_ids):
+        """
+        Audio URLs and variants for several announcements in one query.
+        
+        Returns:
+            dict: announcement id -> language code -> {'audio_url', 'variants',
+            'waveform_peaks'}, where audio_url is the settings.TTS_DEFAULT_AUDIO_VARIANT
+            when present
+        """
+        default_variant = getattr(settings, 'TTS_DEFAULT_AUDIO_VARIANT', 'mp3')
+        payload = {}
+        audio_files = cls.objects.filter(announcement_id__in=announcement_ids).select_related('blob')
+        for audio in audio_files.order_by(F('bitrate_kbps').asc(nulls_last=True)):
+            entry = payload.setdefault(audio.announcement_id, {}).setdefault(
+                audio.language_code, {'audio_url': None, 'variants': [], 'waveform_peaks': None}
+            )
+            entry['variants'].append(audio.as_variant())
+            if entry['waveform_peaks'] is None and audio.blob is not None:
+                entry['waveform_peaks'] = audio.blob.waveform_peaks
+            if audio.variant == default_variant or entry['audio_url'] is None:
+                entry['audio_url'] = audio.audio_file.url
+        return payload
 
 
 class DisplayBoard(models.Model):
@@ -110,3 +265,12 @@ class DisplayBoard(models.Model):
     
     def __str__(self):
         return f"Display Board: {self.name}"
+
+
+@receiver(post_delete, sender=AudioFile)
+def release_audio_blob(sender, instance, **kwargs):
+    """Drop the blob reference held by a deleted AudioFile"""
+    if instance.blob_id:
+        blob = AudioBlob.objects.filter(pk=instance.blob_id).first()
+        if blob:
+            blob.release()
@@ -1,6 +1,54 @@
+from .audio_encoder import AudioEncoder
+from .audio_postprocess import AudioPostProcessor
+from .audio_program import AudioProgramRenderer
 from .language_detector import LanguageDetector
+from .rate_limiter import RateLimiter
 from .translator import Translator
+from .queue_metrics import QueueWaitMetrics
+from .shared_counters import SharedCounters
+from .translation_backends import (
+    CircuitBreaker,
+    GeminiBackend,
+    LibreTranslateBackend,
+    StubBackend,
+    TranslationBackend,
+    TranslationBackendError,
+    register_backend,
+)
+from .translation_cache import TranslationCache
+from .micro_batcher import RedisMicroBatcher
+from .translation_batcher import TranslationBatcher
+from .template_engine import AnnouncementTemplate, TemplateEngine
+from .tts_model_pool import CoquiModelPool
+from .tts_batcher import TTSBatcher
+from .pyttsx3_pool import Pyttsx3ProcessPool
+from .phrase_audio import PhraseAudioCache
 from .tts_service import TTSService
 
-__all__ = ['LanguageDetector', 'Translator', 'TTSService']
-
+__all__ = [
+    'AudioEncoder',
+    'AudioPostProcessor',
+    'AudioProgramRenderer',
+    'LanguageDetector',
+    'RateLimiter',
+    'Translator',
+    'QueueWaitMetrics',
+    'SharedCounters',
+    'CircuitBreaker',
+    'GeminiBackend',
+    'LibreTranslateBackend',
+    'StubBackend',
+    'TranslationBackend',
+    'TranslationBackendError',
+    'register_backend',
+    'TranslationCache',
+    'RedisMicroBatcher',
+    'TranslationBatcher',
+    'AnnouncementTemplate',
+    'TemplateEngine',
+    'CoquiModelPool',
+    'TTSBatcher',
+    'Pyttsx3ProcessPool',
+    'PhraseAudioCache',
+    'TTSService',
+]
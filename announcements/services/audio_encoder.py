@@ -0,0 +1,119 @@
+"""
+Audio encoding stage: compressed Opus/MP3 variants of synthesized WAV audio
+"""
+import json
+import hashlib
+import logging
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AudioEncoder:
+    """
+    Encode master WAV audio into compact variants for boards on slow links.
+    
+    Variants are configured in settings.TTS_AUDIO_VARIANTS as
+    name -> {'format', 'codec', 'bitrate', 'extension', 'mime_type'}.
+    The WAV master itself is the 'wav' variant.
+    """
+    
+    MASTER_VARIANT = 'wav'
+    MASTER_SPEC = {'format': 'wav', 'extension': 'wav', 'mime_type': 'audio/wav'}
+    
+    DEFAULT_VARIANTS = {
+        'opus': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '32k', 'extension': 'ogg', 'mime_type': 'audio/ogg; codecs=opus'},
+        'opus_low': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '12k', 'extension': 'ogg', 'mime_type': 'audio/ogg; codecs=opus'},
+        'mp3': {'format': 'mp3', 'codec': 'libmp3lame', 'bitrate': '64k', 'extension': 'mp3', 'mime_type': 'audio/mpeg'},
+    }
+    
+    def __init__(self, variants=None):
+        if variants is None:
+            variants = getattr(settings, 'TTS_AUDIO_VARIANTS', self.DEFAULT_VARIANTS)
+        self.variants = variants
+    
+    def spec(self, variant):
+        """Encoding settings for a variant"""
+        if variant == self.MASTER_VARIANT:
+            return self.MASTER_SPEC
+        return self.variants[variant]
+    
+    def extension(self, variant):
+        return self.spec(variant).get('extension', self.spec(variant)['format'])
+    
+    def mime_type(self, variant):
+        return self.spec(variant).get('mime_type', f"audio/{self.spec(variant)['format']}")
+    
+    def bitrate_kbps(self, variant):
+        """Nominal bitrate in kbit/s, or None for the uncompressed master"""
+        bitrate = self.spec(variant).get('bitrate')
+        if not bitrate:
+            return None
+        return int(str(bitrate).rstrip('kK'))
+    
+    def variant_hash(self, master_hash, variant):
+        """
+        Content address of a variant derived from its master's content hash.
+        
+        Returns:
+            str: SHA-256 hex digest of the master hash and the encoding settings
+        """
+        payload = json.dumps({'master': master_hash, 'variant': variant, 'spec': self.spec(variant)}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def encode(self, source_path, output_path, variant, audio=None):
+        """
+        Encode a WAV file into one variant.
+        
+        Args:
+            source_path: Master WAV file
+            output_path: Where to write the encoded file
+            variant: Variant name from TTS_AUDIO_VARIANTS
+            audio: Already decoded AudioSegment of source_path (optional)
+        
+        Returns:
+            bool: True if the variant was written
+        """
+        try:
+            from pydub import AudioSegment
+            spec = self.spec(variant)
+            if audio is None:
+                audio = AudioSegment.from_file(str(source_path))
+            
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            audio.export(
+                str(output_path),
+                format=spec['format'],
+                codec=spec.get('codec'),
+                bitrate=spec.get('bitrate'),
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Encoding {source_path} to {variant} failed: {e}")
+            return False
+    
+    def encode_many(self, source_path, outputs):
+        """
+        Encode one WAV file into several variants, decoding it only once.
+        
+        Args:
+            source_path: Master WAV file
+            outputs: Dict of variant name -> output path
+        
+        Returns:
+            list: Variant names that were written
+        """
+        if not outputs:
+            return []
+        try:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_file(str(source_path))
+        except Exception as e:
+            logger.error(f"Could not decode {source_path} for encoding: {e}")
+            return []
+        return [
+            variant for variant, output_path in outputs.items()
+            if self.encode(source_path, output_path, variant, audio=audio)
+        ]
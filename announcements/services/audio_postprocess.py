@@ -0,0 +1,125 @@
+"""
+Audio post-processing: header-based duration, loudness normalization and waveform peaks
+"""
+import logging
+import wave
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPostProcessor:
+    """
+    Post-process synthesized WAV audio in a single read of the file.
+    
+    The duration comes from the WAV header, the samples are read once into a
+    NumPy array, normalized to a common loudness (Coqui and pyttsx3 output
+    differ widely) and reduced to a short list of peaks for waveform display.
+    Without NumPy only the duration is computed.
+    """
+    
+    # NumPy dtype and zero offset for each WAV sample width
+    SAMPLE_FORMATS = {1: ('u1', 128), 2: ('<i2', 0), 4: ('<i4', 0)}
+    
+    # Gains smaller than this are not worth rewriting the file for
+    MIN_GAIN_DB = 0.5
+    
+    def __init__(self, target_dbfs=None, peak_ceiling_dbfs=None, peak_count=None):
+        self.target_dbfs = target_dbfs if target_dbfs is not None else getattr(settings, 'TTS_TARGET_LOUDNESS_DBFS', -20.0)
+        self.peak_ceiling_dbfs = peak_ceiling_dbfs if peak_ceiling_dbfs is not None else getattr(settings, 'TTS_PEAK_CEILING_DBFS', -1.0)
+        self.peak_count = peak_count or getattr(settings, 'TTS_WAVEFORM_PEAKS', 100)
+    
+    def duration(self, path):
+        """
+        Duration in seconds read from the container header, without decoding.
+        
+        Returns:
+            float or None
+        """
+        try:
+            with wave.open(str(path), 'rb') as wav:
+                return wav.getnframes() / float(wav.getframerate())
+        except (wave.Error, EOFError):
+            pass
+        except Exception as e:
+            logger.warning(f"Could not read WAV header of {path}: {e}")
+            return None
+        
+        # Compressed formats: ask ffprobe for the container duration
+        try:
+            from pydub.utils import mediainfo
+            return float(mediainfo(str(path))['duration'])
+        except Exception as e:
+            logger.warning(f"Could not get audio duration: {e}")
+            return None
+    
+    def process(self, path):
+        """
+        Normalize a WAV file in place and measure it.
+        
+        Args:
+            path: WAV file to process
+        
+        Returns:
+            dict: 'duration_seconds', 'gain_db' (gain towards the target
+            loudness, applied when at least MIN_GAIN_DB; None for silence) and
+            'waveform_peaks' (list of floats in 0..1, or None)
+        """
+        result = {'duration_seconds': None, 'gain_db': None, 'waveform_peaks': None}
+        try:
+            with wave.open(str(path), 'rb') as wav:
+                params = wav.getparams()
+                frames = wav.readframes(params.nframes)
+        except Exception as e:
+            logger.warning(f"Could not read {path} for post-processing: {e}")
+            result['duration_seconds'] = self.duration(path)
+            return result
+        
+        result['duration_seconds'] = params.nframes / float(params.framerate) if params.framerate else None
+        
+        try:
+            import numpy as np
+        except ImportError:
+            logger.info("NumPy not installed. Skipping loudness normalization and waveform peaks.")
+            return result
+        
+        sample_format = self.SAMPLE_FORMATS.get(params.sampwidth)
+        if sample_format is None or not frames:
+            return result
+        dtype, offset = sample_format
+        full_scale = float(2 ** (8 * params.sampwidth - 1))
+        
+        samples = (np.frombuffer(frames, dtype=dtype).astype(np.float32) - offset) / full_scale
+        
+        rms = float(np.sqrt(np.mean(np.square(samples))))
+        peak = float(np.max(np.abs(samples)))
+        if rms > 0 and peak > 0:
+            gain_db = self.target_dbfs - 20 * np.log10(rms)
+            # Never push the loudest sample above the ceiling
+            gain_db = min(gain_db, self.peak_ceiling_dbfs - 20 * np.log10(peak))
+            result['gain_db'] = round(float(gain_db), 2)
+        
+        # Skip rewriting files that are already close to the target
+        if result['gain_db'] is not None and abs(result['gain_db']) >= self.MIN_GAIN_DB:
+            samples = np.clip(samples * (10 ** (result['gain_db'] / 20)), -1.0, 1.0)
+            out = np.round(samples * (full_scale - 1) + offset).astype(dtype)
+            with wave.open(str(path), 'wb') as wav:
+                wav.setparams(params)
+                wav.writeframes(out.tobytes())
+        
+        result['waveform_peaks'] = self.peaks(samples, params.nchannels)
+        return result
+    
+    def peaks(self, samples, channels=1):
+        """Reduce samples (floats in -1..1) to peak_count absolute peaks"""
+        import numpy as np
+        
+        magnitudes = np.abs(samples)
+        if channels > 1:
+            magnitudes = magnitudes[:len(magnitudes) - len(magnitudes) % channels].reshape(-1, channels).max(axis=1)
+        buckets = min(self.peak_count, len(magnitudes))
+        if buckets == 0:
+            return []
+        usable = len(magnitudes) - len(magnitudes) % buckets
+        peaks = magnitudes[:usable].reshape(buckets, -1).max(axis=1)
+        return [round(float(p), 3) for p in peaks]
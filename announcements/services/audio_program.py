@@ -0,0 +1,124 @@
+"""
+Multilingual announcement program: chime plus every language in one audio file
+"""
+import json
+import hashlib
+import logging
+import os
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AudioProgramRenderer:
+    """
+    Render an announcement's languages into one sequenced, compressed file.
+    
+    The program is an optional chime followed by each language's audio in
+    the configured order, separated by fixed gaps, so a board can play an
+    announcement from a single request without scheduling separate files.
+    """
+    
+    # Synthesized two-tone chime used when TTS_PROGRAM_CHIME is 'builtin'
+    BUILTIN_CHIME = [(880, 350), (659, 550)]
+    
+    def __init__(self, encoder, language_order=None, gap_ms=None, chime=None, chime_gap_ms=None, variant=None):
+        self.encoder = encoder
+        self.language_order = language_order or getattr(
+            settings, 'TTS_PROGRAM_LANGUAGE_ORDER', ['en', 'hi', 'bn', 'ta', 'te', 'kn']
+        )
+        self.gap_ms = gap_ms if gap_ms is not None else getattr(settings, 'TTS_PROGRAM_GAP_MS', 800)
+        self.chime = chime if chime is not None else getattr(settings, 'TTS_PROGRAM_CHIME', 'builtin')
+        self.chime_gap_ms = chime_gap_ms if chime_gap_ms is not None else getattr(settings, 'TTS_PROGRAM_CHIME_GAP_MS', 400)
+        self.variant = variant or getattr(settings, 'TTS_PROGRAM_VARIANT', 'mp3')
+    
+    def order(self, language_codes):
+        """Languages in program order; ones missing from the configured order go last"""
+        rank = {lang: index for index, lang in enumerate(self.language_order)}
+        return sorted(language_codes, key=lambda lang: (rank.get(lang, len(rank)), lang))
+    
+    def _chime_id(self):
+        """Identity of the chime for the content hash (changes when the file changes)"""
+        if not self.chime:
+            return None
+        if self.chime == 'builtin':
+            return self.BUILTIN_CHIME
+        try:
+            return [str(self.chime), os.path.getmtime(self.chime)]
+        except OSError:
+            return None
+    
+    def program_hash(self, part_hashes):
+        """
+        Content address of a program.
+        
+        Args:
+            part_hashes: Content hashes of the per-language audio, in program order
+        
+        Returns:
+            str: SHA-256 hex digest of the parts, chime, gaps and encoding settings
+        """
+        payload = json.dumps({
+            'parts': part_hashes,
+            'chime': self._chime_id(),
+            'gap_ms': self.gap_ms,
+            'chime_gap_ms': self.chime_gap_ms,
+            'variant': self.variant,
+            'spec': self.encoder.spec(self.variant),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _load_chime(self):
+        from pydub import AudioSegment
+        from pydub.generators import Sine
+        
+        if self.chime == 'builtin':
+            chime = AudioSegment.empty()
+            for frequency, duration in self.BUILTIN_CHIME:
+                chime += Sine(frequency).to_audio_segment(duration=duration, volume=-12).fade_in(10).fade_out(duration // 2)
+            return chime
+        try:
+            return AudioSegment.from_file(str(self.chime))
+        except Exception as e:
+            logger.warning(f"Could not load program chime {self.chime}: {e}")
+            return None
+    
+    def render(self, part_paths, output_path):
+        """
+        Render the program to a compressed file.
+        
+        Args:
+            part_paths: WAV files to play, in program order
+            output_path: Where to write the program
+        
+        Returns:
+            float or None: Duration in seconds, or None if rendering failed
+        """
+        try:
+            from pydub import AudioSegment
+            
+            gap = AudioSegment.silent(duration=self.gap_ms)
+            program = AudioSegment.empty()
+            if self.chime:
+                chime = self._load_chime()
+                if chime is not None:
+                    program += chime + AudioSegment.silent(duration=self.chime_gap_ms)
+            for index, path in enumerate(part_paths):
+                if index:
+                    program += gap
+                program += AudioSegment.from_file(str(path))
+            
+            spec = self.encoder.spec(self.variant)
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            program.export(
+                str(output_path),
+                format=spec['format'],
+                codec=spec.get('codec'),
+                bitrate=spec.get('bitrate'),
+            )
+            return len(program) / 1000.0
+        except Exception as e:
+            logger.error(f"Rendering announcement program failed: {e}")
+            return None
@@ -1,8 +1,12 @@
 """
 Language detection service using langdetect
 """
-from langdetect import detect, LangDetectException
+from langdetect import detect, DetectorFactory, LangDetectException
+from collections import OrderedDict
+from django.conf import settings
+import hashlib
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +23,84 @@ class LanguageDetector:
         'en': 'en',  # English
     }
     
+    # Unicode blocks of the Indic scripts we support; each maps to exactly one language
+    SCRIPT_RANGES = (
+        (0x0900, 0x097F, 'hi'),  # Devanagari
+        (0x0980, 0x09FF, 'bn'),  # Bengali
+        (0x0B80, 0x0BFF, 'ta'),  # Tamil
+        (0x0C00, 0x0C7F, 'te'),  # Telugu
+        (0x0C80, 0x0CFF, 'kn'),  # Kannada
+    )
+    
+    # Memoized results keyed by text hash, bounded by LANGUAGE_DETECTION_CACHE_SIZE
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    _preloaded = False
+    
+    # Share of letters a script must hold to decide without langdetect
+    SCRIPT_DOMINANCE_THRESHOLD = 0.6
+    
+    @staticmethod
+    def preload():
+        """
+        Seed langdetect and load its language profiles now.
+        
+        langdetect loads profiles lazily on the first call and is random unless
+        seeded; calling this at process start removes the first-request spike
+        and makes the view and the Celery task agree on the same text.
+        """
+        from langdetect.detector_factory import init_factory
+        
+        DetectorFactory.seed = getattr(settings, 'LANGUAGE_DETECTION_SEED', 0)
+        try:
+            init_factory()
+            LanguageDetector._preloaded = True
+            logger.info("langdetect profiles preloaded")
+        except Exception as e:
+            logger.warning(f"Could not preload langdetect profiles: {e}")
+    
+    @staticmethod
+    def classify_script(text):
+        """
+        Classify text by counting code points per Unicode block.
+        
+        Args:
+            text: Text to classify
+            
+        Returns:
+            str: Language code if one Indic script clearly dominates, 'en' if the
+            text has no letters at all, or None if langdetect should decide
+            (Latin or mixed text)
+        """
+        counts = {}
+        letters = 0
+        for char in text:
+            code_point = ord(char)
+            if code_point < 0x0900:
+                if char.isalpha():
+                    letters += 1
+                    counts['latin'] = counts.get('latin', 0) + 1
+                continue
+            for start, end, lang in LanguageDetector.SCRIPT_RANGES:
+                if start <= code_point <= end:
+                    letters += 1
+                    counts[lang] = counts.get(lang, 0) + 1
+                    break
+            else:
+                if char.isalpha():
+                    letters += 1
+                    counts['other'] = counts.get('other', 0) + 1
+        
+        if letters == 0:
+            return 'en'
+        
+        script, count = max(counts.items(), key=lambda item: item[1])
+        if script in ('latin', 'other'):
+            return None
+        if count / letters >= LanguageDetector.SCRIPT_DOMINANCE_THRESHOLD:
+            return script
+        return None
+    
     @staticmethod
     def detect_language(text):
         """
@@ -33,6 +115,33 @@ class LanguageDetector:
         if not text or not text.strip():
             return 'en'
         
+        key = hashlib.sha1(text.encode('utf-8')).digest()
+        with LanguageDetector._cache_lock:
+            cached = LanguageDetector._cache.get(key)
+            if cached is not None:
+                LanguageDetector._cache.move_to_end(key)
+                return cached
+        
+        language = LanguageDetector._detect_uncached(text)
+        
+        max_entries = getattr(settings, 'LANGUAGE_DETECTION_CACHE_SIZE', 4096)
+        with LanguageDetector._cache_lock:
+            LanguageDetector._cache[key] = language
+            while len(LanguageDetector._cache) > max_entries:
+                LanguageDetector._cache.popitem(last=False)
+        return language
+    
+    @staticmethod
+    def _detect_uncached(text):
+        """Run script classification, then langdetect if needed"""
+        # Fast path: our Indic languages each have their own script
+        script_language = LanguageDetector.classify_script(text)
+        if script_language is not None:
+            return script_language
+        
+        if not LanguageDetector._preloaded:
+            LanguageDetector.preload()
+        
         try:
             detected = detect(text)
             # Map to our supported languages or default to English
@@ -43,4 +152,19 @@ class LanguageDetector:
         except Exception as e:
             logger.error(f"Unexpected error in language detection: {e}. Defaulting to 'en'")
             return 'en'
-
+    
+    @staticmethod
+    def detect_languages(texts):
+        """
+        Detect the language of many texts at once.
+        
+        Script-dominated texts are resolved by the fast path; only Latin or
+        ambiguous texts go through langdetect.
+        
+        Args:
+            texts: Iterable of texts
+            
+        Returns:
+            list: Language codes, in the same order as texts
+        """
+        return [LanguageDetector.detect_language(text) for text in texts]
@@ -0,0 +1,128 @@
+"""
+Redis-backed micro-batching shared by worker processes
+"""
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class RedisMicroBatcher:
+    """
+    Collect jobs from concurrent tasks into shared batches.
+    
+    Jobs are queued on a Redis list (one per group, e.g. per language) so
+    tasks in different worker processes share a batch. Whichever waiting
+    task holds the group's flush lock waits for the batch window (or until
+    the size cap is reached), hands the queued jobs to process_batch and
+    pushes each result back on a per-job Redis list. A task that gets no
+    answer within max_wait withdraws its job and gets None; if a flusher has
+    already taken the job, the task keeps waiting up to flush_timeout for
+    the result instead, so no job is processed twice.
+    
+    Subclasses set KEY_PREFIX and implement process_batch.
+    """
+    
+    KEY_PREFIX = None
+    
+    def __init__(self, redis_url=None, window_ms=None, max_size=None, max_wait=None, flush_timeout=None):
+        self.window = window_ms / 1000.0
+        self.max_size = max_size
+        self.max_wait = max_wait
+        # Longest process_batch may take; the flush lock outlives it
+        self.flush_timeout = flush_timeout or max_wait
+        self.redis = None
+        
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=max(self.max_wait, self.flush_timeout) + 5)
+            except Exception as e:
+                logger.warning(f"{type(self).__name__} unavailable: {e}. Not batching.")
+    
+    def _key(self, kind, suffix=None):
+        return f"{self.KEY_PREFIX}:{kind}" if suffix is None else f"{self.KEY_PREFIX}:{kind}:{suffix}"
+    
+    def process_batch(self, group, jobs):
+        """
+        Handle one batch.
+        
+        Args:
+            group: Group the jobs were queued under (None for the single queue)
+            jobs: Job dicts as submitted, each with an 'id'
+        
+        Returns:
+            dict: Job id -> JSON-serializable result
+        """
+        raise NotImplementedError
+    
+    def submit(self, job, group=None):
+        """
+        Queue a job and wait for its result, flushing the batch if no one else is.
+        
+        Returns:
+            The job's result, or None if it timed out
+        """
+        job_id = uuid.uuid4().hex
+        payload = json.dumps({'id': job_id, **job}, ensure_ascii=False)
+        queue_key = self._key('queue', group)
+        self.redis.rpush(queue_key, payload)
+        
+        result_key = self._key('result', job_id)
+        deadline = time.monotonic() + self.max_wait
+        while time.monotonic() < deadline:
+            self._try_flush(job_id, group)
+            remaining = deadline - time.monotonic()
+            timeout = max(0.05, min(self.window, remaining))
+            item = self.redis.blpop(result_key, timeout=timeout)
+            if item is not None:
+                return json.loads(item[1])
+        
+        # Give up: withdraw the job if it is still queued so no one processes it for nothing
+        if not self.redis.lrem(queue_key, 1, payload):
+            # A flusher already took it; processing it here as well would cost twice
+            item = self.redis.blpop(result_key, timeout=self.flush_timeout)
+            if item is not None:
+                return json.loads(item[1])
+        logger.warning(f"{type(self).__name__} job {job_id} timed out after {self.max_wait}s")
+        return None
+    
+    def _try_flush(self, job_id, group):
+        """Become the flusher if the group's lock is free, wait for the window, then process one batch"""
+        queue_key = self._key('queue', group)
+        lock_key = self._key('lock', group)
+        lock_ttl_ms = int((self.window + self.flush_timeout + 5) * 1000)
+        if not self.redis.set(lock_key, job_id, nx=True, px=lock_ttl_ms):
+            return
+        try:
+            window_end = time.monotonic() + self.window
+            while time.monotonic() < window_end and self.redis.llen(queue_key) < self.max_size:
+                time.sleep(0.01)
+            
+            pipe = self.redis.pipeline()
+            pipe.lrange(queue_key, 0, self.max_size - 1)
+            pipe.ltrim(queue_key, self.max_size, -1)
+            raw_jobs, _ = pipe.execute()
+            jobs = [json.loads(raw) for raw in raw_jobs]
+            if not jobs:
+                return
+            
+            results = {}
+            try:
+                results = self.process_batch(group, jobs)
+            except Exception as e:
+                logger.error(f"{type(self).__name__} batch of {len(jobs)} job(s) failed: {e}", exc_info=True)
+            finally:
+                # Every taken job gets an answer (None if it failed) so no submitter waits in vain
+                pipe = self.redis.pipeline()
+                for job in jobs:
+                    key = self._key('result', job['id'])
+                    pipe.rpush(key, json.dumps(results.get(job['id']), ensure_ascii=False))
+                    pipe.expire(key, int(max(self.max_wait, self.flush_timeout)) + 60)
+                pipe.execute()
+            logger.info(f"{type(self).__name__} flushed a batch of {len(jobs)} job(s)" + (f" ({group})" if group else ''))
+        finally:
+            if self.redis.get(lock_key) == job_id.encode():
+                self.redis.delete(lock_key)
@@ -0,0 +1,302 @@
+"""
+Phrase-level concatenative audio cache for recurring announcement phrases
+"""
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PhraseAudioCache:
+    """
+    Build announcement audio from cached clips of recurring phrases.
+    
+    Text is segmented into known phrases (station names, "platform number",
+    "is running late by", ...), numbers and runs of other words. Train
+    numbers are read digit by digit, times and other numbers as a whole. Each
+    segment's clip is cached on disk by content hash, so only segments never
+    heard before are synthesized; the clips are joined with short crossfades.
+    
+    Only phrase and number clips are cached. Runs of other words vary from
+    announcement to announcement, so they are synthesized to temp files.
+    """
+    
+    DEFAULT_PHRASES = {
+        'en': [
+            'your attention please',
+            'train number',
+            'platform number',
+            'will arrive on',
+            'will depart from',
+            'is arriving on',
+            'is running late by',
+            'is expected to arrive at',
+            'has been changed to',
+            'minutes',
+            'passengers are requested',
+            'the inconvenience caused is deeply regretted',
+        ],
+    }
+    DIGITS = '0123456789'
+    
+    # Numbers at least this long (train numbers) are spoken digit by digit
+    DIGIT_BY_DIGIT_MIN_LENGTH = 4
+    
+    # Trailing punctuation that ends a segment and inserts a short pause
+    PAUSE_PUNCTUATION = ',.;:!?।'
+    
+    def __init__(self, tts_service, phrases=None, clip_dir=None, crossfade_ms=None, pause_ms=None):
+        self.tts_service = tts_service
+        self.clip_dir = Path(clip_dir or Path(settings.MEDIA_ROOT) / 'audio' / 'phrases')
+        self.crossfade_ms = crossfade_ms if crossfade_ms is not None else getattr(settings, 'TTS_PHRASE_CROSSFADE_MS', 30)
+        self.pause_ms = pause_ms if pause_ms is not None else getattr(settings, 'TTS_PHRASE_PAUSE_MS', 250)
+        
+        if phrases is None:
+            phrases = {lang: list(items) for lang, items in self.DEFAULT_PHRASES.items()}
+            for lang, items in getattr(settings, 'TTS_PHRASES', {}).items():
+                phrases.setdefault(lang, []).extend(items)
+            stations = getattr(settings, 'TTS_STATION_NAMES', [])
+            for lang in settings.SUPPORTED_LANGUAGES:
+                phrases.setdefault(lang, []).extend(stations)
+        
+        # Known phrases per language as tuples of case-folded words
+        self.phrases = {
+            lang: {tuple(phrase.casefold().split()) for phrase in items if phrase.strip()}
+            for lang, items in phrases.items()
+        }
+        self.max_phrase_words = max(
+            (len(words) for items in self.phrases.values() for words in items),
+            default=1,
+        )
+        
+        self.clip_hits = 0
+        self.clip_misses = 0
+    
+    @classmethod
+    def _tokenize(cls, text):
+        """Split text into words, numbers and pause markers (None)"""
+        tokens = []
+        for word in text.split():
+            pause = word[-1] in cls.PAUSE_PUNCTUATION
+            word = word.strip(cls.PAUSE_PUNCTUATION + '"\'()')
+            for part in re.findall(r'\d+(?::\d+)?|\D+', word):
+                if part.isdigit() and len(part) >= cls.DIGIT_BY_DIGIT_MIN_LENGTH:
+                    tokens.extend(part)
+                else:
+                    tokens.append(part)
+            if pause:
+                tokens.append(None)
+        return tokens
+    
+    def segment(self, text, language_code):
+        """
+        Segment text into cacheable pieces.
+        
+        Returns:
+            list: (kind, text) tuples where kind is 'phrase', 'number', 'text'
+            or 'pause' (text is None for pauses)
+        """
+        known = self.phrases.get(language_code, set())
+        tokens = self._tokenize(text)
+        segments = []
+        run = []
+        
+        def flush_run():
+            if run:
+                segments.append(('text', ' '.join(run)))
+                run.clear()
+        
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token is None:
+                flush_run()
+                segments.append(('pause', None))
+                i += 1
+                continue
+            if token[0].isdigit():
+                flush_run()
+                segments.append(('number', token))
+                i += 1
+                continue
+            
+            matched = 0
+            for length in range(min(self.max_phrase_words, len(tokens) - i), 0, -1):
+                window = tokens[i:i + length]
+                if None in window:
+                    continue
+                if tuple(t.casefold() for t in window) in known:
+                    matched = length
+                    break
+            if matched:
+                flush_run()
+                segments.append(('phrase', ' '.join(tokens[i:i + matched])))
+                i += matched
+            else:
+                run.append(token)
+                i += 1
+        
+        flush_run()
+        while segments and segments[-1][0] == 'pause':
+            segments.pop()
+        return segments
+    
+    def should_use(self, segments):
+        """
+        Concatenation only pays off when a known phrase of the language matched.
+        
+        Numbers alone don't qualify: splitting free text around them just turns
+        one synthesis call into several.
+        """
+        return len(segments) > 1 and any(kind == 'phrase' for kind, _ in segments)
+    
+    def _clip_path(self, content_hash, language_code):
+        return self.clip_dir / language_code / f"{content_hash}.wav"
+    
+    def _cached_clip(self, text, language_code):
+        """Return (path, engine) of an existing clip, or (None, None)"""
+        for engine in self.tts_service.available_engines():
+            content_hash = self.tts_service.audio_hash(text, language_code, engine)
+            path = self._clip_path(content_hash, language_code)
+            if path.exists():
+                return path, engine
+        return None, None
+    
+    def _store_clip(self, tmp_path, text, language_code, service_used):
+        """Move a synthesized, post-processed clip into the cache"""
+        path = self._clip_path(self.tts_service.audio_hash(text, language_code, service_used), language_code)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+        return path
+    
+    def get_clip(self, text, language_code):
+        """
+        Return the path of a cached clip, synthesizing it if needed.
+        
+        Returns:
+            tuple: (path: Path or None, service_used: str or None)
+        """
+        path, engine = self._cached_clip(text, language_code)
+        if path is not None:
+            self.clip_hits += 1
+            return path, engine
+        
+        self.clip_misses += 1
+        tmp_path = self.clip_dir / 'tmp' / f"{uuid.uuid4().hex}.wav"
+        success, service_used = self.tts_service.synthesize(text, language_code, str(tmp_path))
+        if not success:
+            return None, None
+        # Clips from different engines must match in loudness once joined
+        self.tts_service.postprocess(str(tmp_path))
+        return self._store_clip(tmp_path, text, language_code, service_used), service_used
+    
+    def _resolve_clips(self, segments, language_code):
+        """
+        Load the audio of every non-pause segment.
+        
+        Cache misses and text runs are synthesized together in one
+        TTSService.synthesize_batch call, so an announcement with several new
+        segments pays for one batch instead of one batch window per segment.
+        
+        Returns:
+            dict: (kind, text) -> (AudioSegment, service_used), or None if any
+            segment could not be synthesized
+        """
+        from pydub import AudioSegment
+        
+        clips = {}
+        missing = []
+        for kind, text in segments:
+            if kind == 'pause' or (kind, text) in clips or (kind, text) in missing:
+                continue
+            if kind != 'text':
+                path, service_used = self._cached_clip(text, language_code)
+                if path is not None:
+                    self.clip_hits += 1
+                    clips[(kind, text)] = (AudioSegment.from_file(str(path)), service_used)
+                    continue
+                self.clip_misses += 1
+            missing.append((kind, text))
+        
+        if not missing:
+            return clips
+        
+        tmp_paths = [self.clip_dir / 'tmp' / f"{uuid.uuid4().hex}.wav" for _ in missing]
+        try:
+            results = self.tts_service.synthesize_batch(
+                [text for _, text in missing], language_code, [str(path) for path in tmp_paths],
+            )
+            for (kind, text), tmp_path, (success, service_used) in zip(missing, tmp_paths, results):
+                if not success:
+                    return None
+                # Clips from different engines must match in loudness once joined
+                self.tts_service.postprocess(str(tmp_path))
+                clips[(kind, text)] = (AudioSegment.from_file(str(tmp_path)), service_used)
+                if kind != 'text':
+                    self._store_clip(tmp_path, text, language_code, service_used)
+        finally:
+            for tmp_path in tmp_paths:
+                tmp_path.unlink(missing_ok=True)
+        return clips
+    
+    def generate_audio(self, segments, language_code, output_path):
+        """
+        Join cached clips for the segments into one file.
+        
+        Returns:
+            tuple: (success: bool, service_used: str)
+        """
+        from pydub import AudioSegment
+        
+        clips = self._resolve_clips(segments, language_code)
+        if clips is None:
+            return False, None
+        
+        combined = None
+        services = set()
+        for kind, text in segments:
+            if kind == 'pause':
+                clip = AudioSegment.silent(duration=self.pause_ms)
+            else:
+                clip, service_used = clips[(kind, text)]
+                services.add(service_used)
+            
+            if combined is None:
+                combined = clip
+                continue
+            crossfade = min(self.crossfade_ms, len(combined), len(clip))
+            combined = combined.append(clip, crossfade=crossfade)
+        
+        if combined is None:
+            return False, None
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        combined.export(str(output_path), format='wav')
+        # Report the primary engine if clips came from more than one
+        for engine in self.tts_service.available_engines():
+            if engine in services:
+                return True, engine
+        return True, services.pop()
+    
+    def warm(self, language_code):
+        """Pre-synthesize every known phrase and digit for a language"""
+        items = [' '.join(words) for words in self.phrases.get(language_code, set())]
+        items.extend(self.DIGITS)
+        for text in items:
+            try:
+                self.get_clip(text, language_code)
+            except Exception as e:
+                logger.warning(f"Could not warm phrase '{text}' ({language_code}): {e}")
+    
+    def stats(self):
+        total = self.clip_hits + self.clip_misses
+        return {
+            'clip_hits': self.clip_hits,
+            'clip_misses': self.clip_misses,
+            'hit_rate': self.clip_hits / total if total else 0.0,
+        }
@@ -0,0 +1,177 @@
+"""
+Pool of pyttsx3 subprocesses with hard per-job timeouts
+"""
+import atexit
+import json
+import logging
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Pyttsx3ProcessPool:
+    """
+    Runs pyttsx3 synthesis in a small pool of long-lived subprocesses.
+    
+    The pyttsx3 engine is not thread-safe and runAndWait() occasionally hangs,
+    so each engine lives in its own process (pyttsx3_worker.py). Jobs are sent
+    as JSON lines; a job that does not answer within the timeout gets its
+    process killed and a fresh one is started for the next job. Up to `size`
+    jobs run in parallel.
+    """
+    
+    WORKER_SCRIPT = Path(__file__).with_name('pyttsx3_worker.py')
+    
+    def __init__(self, size=None, timeout=None):
+        self.size = size or getattr(settings, 'PYTTSX3_POOL_SIZE', 2)
+        self.timeout = timeout or getattr(settings, 'PYTTSX3_TIMEOUT', 30)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._processes = set()
+        
+        self.jobs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.restarts = 0
+        
+        atexit.register(self.shutdown)
+    
+    def _spawn(self):
+        return subprocess.Popen(
+            [sys.executable, str(self.WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+        )
+    
+    def _acquire(self):
+        """Take an idle process, start one if below size, or wait for one to free up"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            process = None
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if len(self._processes) < self.size:
+                        process = self._spawn()
+                        self._processes.add(process)
+            if process is None:
+                # Poll briefly so a slot freed by a killed process is noticed
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise queue.Empty
+                try:
+                    process = self._idle.get(timeout=min(0.1, remaining))
+                except queue.Empty:
+                    continue
+            if process.poll() is None:
+                return process
+            # Died while idle; drop it and try again
+            self._discard(process)
+    
+    def _release(self, process):
+        self._idle.put(process)
+    
+    def _discard(self, process):
+        """Kill a process and forget it, so the next job starts a replacement"""
+        try:
+            process.kill()
+            process.wait(timeout=5)
+        except Exception:
+            pass
+        with self._lock:
+            if process in self._processes:
+                self._processes.discard(process)
+                self.restarts += 1
+    
+    @staticmethod
+    def _read_line(process, timeout):
+        """Read one protocol line, or None if the process does not answer in time"""
+        ready, _, _ = select.select([process.stdout], [], [], timeout)
+        if not ready:
+            return None
+        return process.stdout.readline() or None
+    
+    def synthesize(self, text, output_path, rate, volume):
+        """
+        Synthesize text to a file in one of the pool's processes.
+        
+        Args:
+            text: Text to convert to speech
+            output_path: Path to save audio file
+            rate: pyttsx3 speech rate
+            volume: pyttsx3 volume (0-1)
+        
+        Returns:
+            bool: True if the file was written before the timeout
+        """
+        self.jobs += 1
+        try:
+            process = self._acquire()
+        except queue.Empty:
+            self.failures += 1
+            logger.error(f"No pyttsx3 process became free within {self.timeout}s")
+            return False
+        
+        job = {'id': uuid.uuid4().hex, 'text': text, 'output_path': str(output_path), 'rate': rate, 'volume': volume}
+        try:
+            process.stdin.write(json.dumps(job, ensure_ascii=False) + '\n')
+            process.stdin.flush()
+            line = self._read_line(process, self.timeout)
+        except Exception as e:
+            logger.error(f"pyttsx3 process failed: {e}")
+            line = None
+        
+        if line is None:
+            if process.poll() is None:
+                self.timeouts += 1
+                logger.error(f"pyttsx3 job timed out after {self.timeout}s; restarting its process")
+            self.failures += 1
+            self._discard(process)
+            return False
+        
+        self._release(process)
+        try:
+            result = json.loads(line)
+        except ValueError:
+            self.failures += 1
+            logger.error(f"Unreadable pyttsx3 worker reply: {line[:200]}")
+            return False
+        if not result.get('success'):
+            self.failures += 1
+            logger.error(f"pyttsx3 synthesis failed: {result.get('error', 'no output written')}")
+        return bool(result.get('success'))
+    
+    def shutdown(self):
+        """Stop every process in the pool"""
+        with self._lock:
+            processes = list(self._processes)
+            self._processes.clear()
+        for process in processes:
+            try:
+                process.stdin.close()
+                process.wait(timeout=2)
+            except Exception:
+                process.kill()
+    
+    def stats(self):
+        return {
+            'size': self.size,
+            'running': len(self._processes),
+            'jobs': self.jobs,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+        }
@@ -0,0 +1,36 @@
+"""
+pyttsx3 synthesis worker, run as a subprocess by Pyttsx3ProcessPool
+
+Reads one JSON job per line on stdin and answers with one JSON line on
+stdout. Runs as a plain script (no Django), so it starts quickly.
+"""
+import json
+import os
+import sys
+
+
+def main():
+    # Keep the protocol channel clean: anything the speech driver prints goes to stderr
+    protocol = os.fdopen(os.dup(1), 'w', buffering=1, encoding='utf-8')
+    os.dup2(2, 1)
+    
+    import pyttsx3
+    engine = pyttsx3.init()
+    
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        try:
+            engine.setProperty('rate', job['rate'])
+            engine.setProperty('volume', job['volume'])
+            engine.save_to_file(job['text'], job['output_path'])
+            engine.runAndWait()
+            result = {'id': job['id'], 'success': os.path.exists(job['output_path'])}
+        except Exception as e:
+            result = {'id': job['id'], 'success': False, 'error': str(e)}
+        protocol.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Queue wait time metrics per processing lane
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWaitMetrics:
+    """
+    Record how long tasks wait in the broker before a worker starts them.
+    
+    Samples are kept per lane in Redis (a capped list of recent waits plus
+    running totals) so every worker contributes to one view; without Redis
+    the samples stay in-process.
+    """
+    
+    KEY = 'queue_wait:{}'
+    SAMPLES_KEY = 'queue_wait:{}:samples'
+    
+    def __init__(self, redis_url=None, max_samples=None):
+        self.max_samples = max_samples or getattr(settings, 'QUEUE_WAIT_MAX_SAMPLES', 500)
+        self.redis = None
+        self._lock = threading.Lock()
+        self._local = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._totals = defaultdict(lambda: {'count': 0, 'total': 0.0})
+        
+        redis_url = redis_url or getattr(settings, 'QUEUE_WAIT_REDIS_URL', None)
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+            except Exception as e:
+                logger.warning(f"Shared queue metrics unavailable: {e}. Recording in-process only.")
+    
+    def record(self, lane, wait_seconds):
+        """Record one task's wait in a lane"""
+        wait_seconds = max(0.0, float(wait_seconds))
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.lpush(self.SAMPLES_KEY.format(lane), wait_seconds)
+                pipe.ltrim(self.SAMPLES_KEY.format(lane), 0, self.max_samples - 1)
+                pipe.hincrby(self.KEY.format(lane), 'count', 1)
+                pipe.hincrbyfloat(self.KEY.format(lane), 'total', wait_seconds)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Shared queue metrics write failed: {e}")
+        with self._lock:
+            self._local[lane].append(wait_seconds)
+            totals = self._totals[lane]
+            totals['count'] += 1
+            totals['total'] += wait_seconds
+    
+    def _lane_data(self, lane):
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.lrange(self.SAMPLES_KEY.format(lane), 0, -1)
+                pipe.hgetall(self.KEY.format(lane))
+                samples, totals = pipe.execute()
+                return (
+                    [float(sample) for sample in samples],
+                    int(totals.get(b'count', 0)),
+                    float(totals.get(b'total', 0.0)),
+                )
+            except Exception as e:
+                logger.warning(f"Shared queue metrics read failed: {e}")
+        with self._lock:
+            totals = self._totals[lane]
+            return list(self._local[lane]), totals['count'], totals['total']
+    
+    @staticmethod
+    def _percentile(ordered, fraction):
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+    
+    def summary(self, lanes):
+        """
+        Wait time statistics per lane.
+        
+        Returns:
+            dict: Lane -> {'count', 'mean', 'p50', 'p95', 'max'} in seconds;
+            percentiles and max cover the most recent samples
+        """
+        result = {}
+        for lane in lanes:
+            samples, count, total = self._lane_data(lane)
+            ordered = sorted(samples)
+            result[lane] = {
+                'count': count,
+                'mean': round(total / count, 3) if count else None,
+                'p50': self._percentile(ordered, 0.5),
+                'p95': self._percentile(ordered, 0.95),
+                'max': round(ordered[-1], 3) if ordered else None,
+            }
+        return result
@@ -0,0 +1,145 @@
+"""
+Token-bucket rate limiter shared across Celery workers
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Dual token bucket enforcing requests-per-minute and tokens-per-minute quotas.
+
+    Bucket state lives in Redis so every worker draws from the same quota.
+    Both buckets are checked and debited atomically in a Lua script; when
+    Redis is unreachable the limiter falls back to an in-process bucket.
+    """
+
+    # KEYS[1] = bucket hash; ARGV = rpm, tpm, requested tokens
+    # Returns 0 when granted, otherwise the number of seconds to wait
+    LUA_SCRIPT = """
+    local rpm = tonumber(ARGV[1])
+    local tpm = tonumber(ARGV[2])
+    local requested = tonumber(ARGV[3])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+    local requests = tonumber(state[1]) or rpm
+    local tokens = tonumber(state[2]) or tpm
+    local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+    requests = math.min(rpm, requests + elapsed * rpm / 60)
+    tokens = math.min(tpm, tokens + elapsed * tpm / 60)
+    local wait = 0
+    if requests < 1 then
+        wait = math.max(wait, (1 - requests) * 60 / rpm)
+    end
+    if tokens < requested then
+        wait = math.max(wait, (requested - tokens) * 60 / tpm)
+    end
+    if wait == 0 then
+        requests = requests - 1
+        tokens = tokens - requested
+    end
+    redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], 120)
+    return tostring(wait)
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, redis_url=None, key='gemini'):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.key = f"ratelimit:{key}"
+        self._script = None
+        self._lock = threading.Lock()
+        self._local = {'requests': float(requests_per_minute), 'tokens': float(tokens_per_minute), 'ts': time.monotonic()}
+
+        if redis_url:
+            try:
+                import redis
+                client = redis.Redis.from_url(redis_url, socket_timeout=1)
+                self._script = client.register_script(self.LUA_SCRIPT)
+            except Exception as e:
+                logger.warning(f"Shared rate limiter unavailable: {e}. Using in-process bucket.")
+
+    @classmethod
+    def from_settings(cls):
+        """Build the Gemini limiter from Django settings"""
+        return cls(
+            requests_per_minute=getattr(settings, 'GEMINI_REQUESTS_PER_MINUTE', 10),
+            tokens_per_minute=getattr(settings, 'GEMINI_TOKENS_PER_MINUTE', 250000),
+            redis_url=getattr(settings, 'GEMINI_RATE_LIMIT_REDIS_URL', None),
+        )
+
+    @staticmethod
+    def estimate_tokens(prompt, expected_outputs=1):
+        """Rough token estimate: prompt plus one translated copy per expected output"""
+        # ~3 characters per token is conservative for mixed Latin/Indic text
+        prompt_tokens = len(prompt) // 3 + 1
+        return prompt_tokens * (1 + expected_outputs)
+
+    def _try_acquire_local(self, tokens):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._local['ts']
+            self._local['ts'] = now
+            self._local['requests'] = min(
+                self.requests_per_minute,
+                self._local['requests'] + elapsed * self.requests_per_minute / 60,
+            )
+            self._local['tokens'] = min(
+                self.tokens_per_minute,
+                self._local['tokens'] + elapsed * self.tokens_per_minute / 60,
+            )
+            wait = 0.0
+            if self._local['requests'] < 1:
+                wait = max(wait, (1 - self._local['requests']) * 60 / self.requests_per_minute)
+            if self._local['tokens'] < tokens:
+                wait = max(wait, (tokens - self._local['tokens']) * 60 / self.tokens_per_minute)
+            if wait == 0:
+                self._local['requests'] -= 1
+                self._local['tokens'] -= tokens
+            return wait
+
+    def try_acquire(self, tokens=0):
+        """
+        Try to take one request and `tokens` tokens from the buckets.
+
+        Returns:
+            float: 0 if granted, otherwise seconds until the quota should allow it
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        if self._script is not None:
+            try:
+                return float(self._script(
+                    keys=[self.key],
+                    args=[self.requests_per_minute, self.tokens_per_minute, tokens],
+                ))
+            except Exception as e:
+                logger.warning(f"Shared rate limiter failed: {e}. Using in-process bucket.")
+        return self._try_acquire_local(tokens)
+
+    def acquire(self, tokens=0, timeout=None):
+        """
+        Block until the quota allows one request of `tokens` tokens.
+
+        Args:
+            tokens: Estimated tokens for the request
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            bool: True if acquired, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
@@ -0,0 +1,68 @@
+"""
+Counters shared by every worker process
+"""
+import logging
+import threading
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCounters:
+    """
+    Named integer counters kept in one Redis hash per namespace.
+    
+    Every worker increments the same hash, so hit rates read from any
+    process (e.g. the web process serving the stats endpoint) cover the
+    whole deployment; without Redis the counters stay in-process.
+    """
+    
+    KEY = 'counters:{}'
+    
+    def __init__(self, namespace, redis_url=None):
+        self.key = self.KEY.format(namespace)
+        self.redis = None
+        self._lock = threading.Lock()
+        self._local = defaultdict(int)
+        
+        redis_url = redis_url or getattr(settings, 'SERVICE_STATS_REDIS_URL', None)
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=1)
+            except Exception as e:
+                logger.warning(f"Shared counters unavailable: {e}. Counting in-process only.")
+    
+    def incr(self, **amounts):
+        """Add to one or more counters, e.g. incr(lookups=1, misses=1)"""
+        amounts = {name: amount for name, amount in amounts.items() if amount}
+        if not amounts:
+            return
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline()
+                for name, amount in amounts.items():
+                    pipe.hincrby(self.key, name, amount)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Shared counter write failed: {e}")
+        with self._lock:
+            for name, amount in amounts.items():
+                self._local[name] += amount
+    
+    def get_all(self):
+        """
+        Current counter values.
+        
+        Returns:
+            dict: Counter name -> int
+        """
+        if self.redis is not None:
+            try:
+                return {name.decode(): int(value) for name, value in self.redis.hgetall(self.key).items()}
+            except Exception as e:
+                logger.warning(f"Shared counter read failed: {e}")
+        with self._lock:
+            return dict(self._local)
@@ -0,0 +1,209 @@
+"""
+Template/slot translation engine for recurring railway announcements
+"""
+import logging
+import re
+from django.conf import settings
+from .shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+
+class AnnouncementTemplate:
+    """
+    A recurring announcement pattern with variable slots.
+
+    Slots are written as ``{slot_name}``; a trailing ``?`` (``{train_name?}``)
+    marks a slot as optional.
+    """
+
+    # Regex used to capture each known slot
+    SLOT_PATTERNS = {
+        'train_number': r'\d{4,5}',
+        'train_name': r"[A-Za-z][A-Za-z .'\-]*?",
+        'platform': r'\d{1,2}[A-Za-z]?',
+        'time': r'\d{1,2}[:.]\d{2}(?:\s?[AaPp]\.?[Mm]\.?)?',
+        'delay_minutes': r'\d{1,4}',
+    }
+    DEFAULT_SLOT_PATTERN = r'.+?'
+
+    SLOT_RE = re.compile(r'\{(\w+)(\?)?\}')
+
+    def __init__(self, name, pattern):
+        self.name = name
+        self.pattern = pattern
+        self.slots = [m.group(1) for m in self.SLOT_RE.finditer(pattern)]
+        # Text sent for translation: every slot as a plain {placeholder}
+        self.source_text = self.SLOT_RE.sub(lambda m: '{' + m.group(1) + '}', pattern)
+        self.regex = self._compile(pattern)
+
+    def _compile(self, pattern):
+        parts = []
+        position = 0
+        for m in self.SLOT_RE.finditer(pattern):
+            literal = pattern[position:m.start()]
+            slot, optional = m.group(1), m.group(2)
+            slot_regex = f"(?P<{slot}>{self.SLOT_PATTERNS.get(slot, self.DEFAULT_SLOT_PATTERN)})"
+            if optional:
+                # Swallow the whitespace before an optional slot along with it
+                literal = literal.rstrip()
+                parts.append(self._literal_regex(literal))
+                parts.append(rf"(?:\s+{slot_regex})?")
+                position = m.end()
+                continue
+            parts.append(self._literal_regex(literal))
+            parts.append(slot_regex)
+            position = m.end()
+        parts.append(self._literal_regex(pattern[position:].rstrip('.')))
+        return re.compile(r'^\s*' + ''.join(parts) + r'\s*\.?\s*$', re.IGNORECASE)
+
+    @staticmethod
+    def _literal_regex(literal):
+        words = literal.split()
+        if not words:
+            return r'\s+' if literal else ''
+        body = r'\s+'.join(re.escape(word) for word in words)
+        leading = r'\s+' if literal[0].isspace() else ''
+        trailing = r'\s+' if literal[-1].isspace() else ''
+        return leading + body + trailing
+
+    def match(self, text):
+        """
+        Match text against this template.
+
+        Returns:
+            dict: Slot name -> value, or None if the text does not match
+        """
+        m = self.regex.match(text or '')
+        if not m:
+            return None
+        return {slot: (m.group(slot) or '').strip() for slot in self.slots}
+
+    def fill(self, translated_pattern, slots):
+        """Substitute slot values into a translated pattern"""
+        text = translated_pattern
+        for slot, value in slots.items():
+            text = text.replace('{' + slot + '}', value)
+        return ' '.join(text.split())
+
+    def is_valid_translation(self, translated_pattern):
+        """A translated pattern is usable only if every placeholder survived"""
+        return all('{' + slot + '}' in translated_pattern for slot in self.slots)
+
+
+class TemplateEngine:
+    """
+    Translate recurring announcements by filling slots into pre-translated patterns.
+
+    Each pattern is translated once per language (through the Translator, so
+    the result also lands in the shared translation memory). Matching
+    announcements are then assembled locally without a network call.
+    Unmatched text is left to the normal Translator path.
+    """
+
+    DEFAULT_TEMPLATES = {
+        'arrival': "Train {train_number} {train_name?} will arrive on platform {platform} at {time}",
+        'arrival_number': "Train number {train_number} {train_name?} will arrive on platform number {platform} at {time}",
+        'arriving_now': "Train {train_number} {train_name?} is arriving on platform {platform}",
+        'departure': "Train {train_number} {train_name?} will depart from platform {platform} at {time}",
+        'delay': "Train {train_number} {train_name?} is running late by {delay_minutes} minutes",
+        'delay_expected': "Train {train_number} {train_name?} is running late by {delay_minutes} minutes and is expected to arrive at {time}",
+        'platform_change': "The platform for train {train_number} {train_name?} has been changed to platform {platform}",
+    }
+
+    def __init__(self, translator=None, templates=None):
+        self.translator = translator
+        self.templates = []
+        self._translated_patterns = {}
+        # Lookup and per-template hit counts, shared by every worker
+        self.counters = SharedCounters('template_engine')
+
+        if templates is None:
+            templates = dict(self.DEFAULT_TEMPLATES)
+            templates.update(getattr(settings, 'TRANSLATION_TEMPLATES', {}))
+        for name, pattern in templates.items():
+            self.register(name, pattern)
+
+    def register(self, name, pattern):
+        """Register a new template pattern"""
+        template = AnnouncementTemplate(name, pattern)
+        self.templates = [t for t in self.templates if t.name != name]
+        self.templates.append(template)
+        return template
+
+    def match(self, text):
+        """
+        Find the first template matching the text.
+
+        Returns:
+            tuple: (template, slots) or (None, None)
+        """
+        for template in self.templates:
+            slots = template.match(text)
+            if slots is not None:
+                return template, slots
+        return None, None
+
+    def _get_translated_patterns(self, template, source_lang, target_languages):
+        """Return translated patterns for the requested languages, translating missing ones once"""
+        key = (template.name, source_lang)
+        patterns = self._translated_patterns.setdefault(key, {})
+        missing = [lang for lang in target_languages if lang not in patterns]
+
+        if missing and self.translator is not None:
+            results = self.translator.translate_multiple_with_service(
+                template.source_text,
+                source_lang=source_lang,
+                target_languages=missing,
+            )
+            for lang, (translated_pattern, service) in results.items():
+                if service == 'fallback':
+                    continue
+                if template.is_valid_translation(translated_pattern):
+                    patterns[lang] = translated_pattern
+                else:
+                    logger.warning(f"Template '{template.name}' lost placeholders in {lang}; not using it")
+
+        return {lang: patterns[lang] for lang in target_languages if lang in patterns}
+
+    def translate_multiple_with_service(self, text, source_lang='auto', target_languages=None):
+        """
+        Translate text through a matching template.
+
+        Returns:
+            dict: Language code -> (translated_text, 'template') for each language
+            the template could serve; empty if no template matches
+        """
+        if target_languages is None:
+            target_languages = ['hi', 'ta', 'te', 'bn', 'kn']
+
+        template, slots = self.match(text)
+        if template is None:
+            self.counters.incr(lookups=1, misses=1)
+            return {}
+
+        self.counters.incr(**{'lookups': 1, f'hit:{template.name}': 1})
+        patterns = self._get_translated_patterns(template, source_lang, target_languages)
+        logger.info(f"Template '{template.name}' matched; served {list(patterns)} locally")
+        return {
+            lang: (template.fill(translated_pattern, slots), 'template')
+            for lang, translated_pattern in patterns.items()
+        }
+
+    def stats(self):
+        """Return per-template hit counts and rates across all workers"""
+        counters = self.counters.get_all()
+        lookups = counters.get('lookups', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'lookups': lookups,
+            'misses': misses,
+            'hit_rate': (lookups - misses) / lookups if lookups else 0.0,
+            'templates': {
+                template.name: {
+                    'hits': counters.get(f'hit:{template.name}', 0),
+                    'hit_rate': counters.get(f'hit:{template.name}', 0) / lookups if lookups else 0.0,
+                }
+                for template in self.templates
+            },
+        }
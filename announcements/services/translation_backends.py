@@ -0,0 +1,377 @@
+"""
+Pluggable translation backends with per-backend circuit breakers
+"""
+import json
+import logging
+import re
+import threading
+import time
+import google.generativeai as genai
+from django.conf import settings
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationBackendError(Exception):
+    """Raised by a backend when a translation request fails"""
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker.
+    
+    After `failure_threshold` consecutive failures the circuit opens and the
+    backend is skipped without a network call. Once `reset_timeout` seconds
+    have passed a single health probe decides whether it closes again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or getattr(settings, 'TRANSLATION_BREAKER_FAILURE_THRESHOLD', 3)
+        self.reset_timeout = reset_timeout or getattr(settings, 'TRANSLATION_BREAKER_RESET_TIMEOUT', 30)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow(self, probe=None):
+        """
+        Decide whether a call may go through.
+        
+        Args:
+            probe: Optional callable returning True if the backend is healthy;
+                run once when an open circuit's reset timeout has passed
+        
+        Returns:
+            bool: True if the backend may be called
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN:
+                # A probe is already in flight
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        
+        healthy = True
+        if probe is not None:
+            try:
+                healthy = bool(probe())
+            except Exception:
+                healthy = False
+        if healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+        return healthy
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class TranslationBackend:
+    """Base class for translation backends"""
+    
+    name = None
+    # Whether results may be stored in the translation memory
+    cacheable = True
+    # Whether translate_batch does all languages in one request
+    supports_batch = False
+    
+    def __init__(self, timeout=None, breaker=None):
+        self.timeout = timeout or getattr(settings, 'TRANSLATION_BACKEND_TIMEOUT', 15)
+        self.breaker = breaker or CircuitBreaker()
+    
+    def is_configured(self):
+        """Whether the backend has what it needs to run at all"""
+        return True
+    
+    def translate(self, text, source_lang, target_lang):
+        """
+        Translate text into one language.
+        
+        Returns:
+            str: Translated text
+        
+        Raises:
+            TranslationBackendError: If the request fails
+        """
+        raise NotImplementedError
+    
+    def translate_batch(self, text, source_lang, target_languages):
+        """
+        Translate text into several languages.
+        
+        Returns:
+            dict: Language code -> translated text (may be partial)
+        """
+        return {lang: self.translate(text, source_lang, lang) for lang in target_languages}
+    
+    def health_check(self):
+        """Cheap probe used to close an open circuit"""
+        return self.is_configured()
+
+
+class GeminiBackend(TranslationBackend):
+    """Google Gemini backend"""
+    
+    name = 'gemini'
+    supports_batch = True
+    
+    # Language code mapping to full language names for Gemini
+    LANGUAGE_NAMES = {
+        'hi': 'Hindi',
+        'ta': 'Tamil',
+        'te': 'Telugu',
+        'bn': 'Bengali',
+        'kn': 'Kannada',
+        'en': 'English',
+    }
+    
+    # Appended to prompts so template placeholders like {platform} survive translation
+    PLACEHOLDER_INSTRUCTION = "Keep any placeholder in curly braces exactly as written. "
+    
+    def __init__(self, api_key=None, rate_limiter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key or getattr(settings, 'GEMINI_API_KEY', None)
+        self.rate_limiter = rate_limiter or RateLimiter.from_settings()
+        self.rate_limit_timeout = getattr(settings, 'GEMINI_RATE_LIMIT_TIMEOUT', 60)
+        self.model = None
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+            # Use gemini-2.5-flash (fast and efficient for translation)
+            # Fallback to gemini-flash-latest if not available
+            try:
+                self.model = genai.GenerativeModel('gemini-2.5-flash')
+            except Exception:
+                try:
+                    self.model = genai.GenerativeModel('gemini-flash-latest')
+                except Exception:
+                    try:
+                        self.model = genai.GenerativeModel('gemini-2.5-pro')
+                    except Exception:
+                        # Last fallback
+                        self.model = genai.GenerativeModel('gemini-pro-latest')
+        else:
+            logger.warning("GEMINI_API_KEY not configured. Gemini backend disabled.")
+    
+    def is_configured(self):
+        return self.model is not None
+    
+    def health_check(self):
+        if not self.is_configured():
+            return False
+        genai.get_model(self.model.model_name, request_options={'timeout': self.timeout})
+        return True
+    
+    def _generate(self, prompt, expected_outputs=1, json_output=False):
+        """Send one prompt to Gemini under the shared quota"""
+        tokens = RateLimiter.estimate_tokens(prompt, expected_outputs)
+        if not self.rate_limiter.acquire(tokens, timeout=self.rate_limit_timeout):
+            raise TranslationBackendError(f"Gemini quota not available within {self.rate_limit_timeout}s")
+        kwargs = {'request_options': {'timeout': self.timeout}}
+        if json_output:
+            kwargs['generation_config'] = {'response_mime_type': 'application/json'}
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+            return response.text
+        except Exception as e:
+            raise TranslationBackendError(f"Gemini request failed: {e}") from e
+    
+    def translate(self, text, source_lang, target_lang):
+        # Get target language name
+        target_language = self.LANGUAGE_NAMES.get(target_lang, 'English')
+        
+        # Build prompt for translation
+        if source_lang == 'auto':
+            prompt = f"Translate the following text to {target_language}. {self.PLACEHOLDER_INSTRUCTION}Only return the translated text, nothing else:\n\n{text}"
+        else:
+            source_language = self.LANGUAGE_NAMES.get(source_lang, 'English')
+            prompt = f"Translate the following text from {source_language} to {target_language}. {self.PLACEHOLDER_INSTRUCTION}Only return the translated text, nothing else:\n\n{text}"
+        
+        translated_text = self._generate(prompt).strip()
+        if not translated_text:
+            raise TranslationBackendError("Gemini returned an empty translation")
+        logger.info(f"Translated {source_lang} -> {target_lang}: {text[:50]}...")
+        return translated_text
+    
+    def _build_batch_prompt(self, text, source_lang, target_languages):
+        """Build a prompt asking for all target languages as one JSON object"""
+        language_list = ", ".join(
+            f'"{lang}" ({self.LANGUAGE_NAMES.get(lang, lang)})' for lang in target_languages
+        )
+        if source_lang == 'auto':
+            source = ""
+        else:
+            source = f" from {self.LANGUAGE_NAMES.get(source_lang, 'English')}"
+        return (
+            f"Translate the following text{source} into each of these languages: {language_list}.\n"
+            f"Return only a JSON object whose keys are exactly these language codes and whose "
+            f"values are the translated text. {self.PLACEHOLDER_INSTRUCTION}"
+            f"Do not add any other keys or commentary.\n\n{text}"
+        )
+    
+    @staticmethod
+    def _extract_json_object(raw_text):
+        """Pull a JSON object out of a model response; returns None if there is none"""
+        raw_text = (raw_text or '').strip()
+        # Strip a markdown code fence if the model added one
+        fenced = re.match(r'^```(?:json)?\s*(.*?)\s*```$', raw_text, re.DOTALL)
+        if fenced:
+            raw_text = fenced.group(1)
+        
+        try:
+            data = json.loads(raw_text)
+        except ValueError:
+            # Fall back to the outermost JSON object in the text
+            start, end = raw_text.find('{'), raw_text.rfind('}')
+            if start == -1 or end <= start:
+                return None
+            try:
+                data = json.loads(raw_text[start:end + 1])
+            except ValueError:
+                return None
+        
+        return data if isinstance(data, dict) else None
+    
+    @staticmethod
+    def _valid_translations(data, target_languages):
+        """Keep only non-empty string translations for the requested languages"""
+        results = {}
+        if not isinstance(data, dict):
+            return results
+        for lang in target_languages:
+            value = data.get(lang)
+            if isinstance(value, str) and value.strip():
+                results[lang] = value.strip()
+        return results
+    
+    def translate_batch(self, text, source_lang, target_languages):
+        """Request several target languages in a single Gemini call"""
+        prompt = self._build_batch_prompt(text, source_lang, target_languages)
+        raw_text = self._generate(prompt, expected_outputs=len(target_languages), json_output=True)
+        results = self._valid_translations(self._extract_json_object(raw_text), target_languages)
+        logger.info(f"Batch translated {source_lang} -> {list(results)}: {text[:50]}...")
+        return results
+    
+    def translate_jobs(self, jobs):
+        """
+        Translate several independent texts in a single Gemini call.
+        
+        Returns:
+            dict: Job id -> {language code: translated text}; missing or malformed
+            entries are omitted
+        """
+        items = []
+        for job in jobs:
+            source_lang = job.get('source_lang', 'auto')
+            items.append({
+                'id': job['id'],
+                'source': 'auto-detect' if source_lang == 'auto' else self.LANGUAGE_NAMES.get(source_lang, 'English'),
+                'languages': list(job['target_languages']),
+                'text': job['text'],
+            })
+        prompt = (
+            "Translate each item below into every language code listed in its \"languages\" field.\n"
+            "Return only a JSON object whose keys are the item ids and whose values are JSON "
+            "objects mapping each listed language code to the translated text. "
+            f"{self.PLACEHOLDER_INSTRUCTION}Do not add any other keys or commentary.\n\n"
+            + json.dumps(items, ensure_ascii=False)
+        )
+        expected_outputs = sum(len(job['target_languages']) for job in jobs)
+        data = self._extract_json_object(
+            self._generate(prompt, expected_outputs=expected_outputs, json_output=True)
+        ) or {}
+        
+        results = {}
+        for job in jobs:
+            translations = self._valid_translations(data.get(str(job['id'])), job['target_languages'])
+            if translations:
+                results[job['id']] = translations
+        return results
+
+
+class LibreTranslateBackend(TranslationBackend):
+    """Self-hosted LibreTranslate over HTTP with a pooled keep-alive session"""
+    
+    name = 'libretranslate'
+    
+    def __init__(self, url=None, api_key=None, pool_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = (url or getattr(settings, 'LIBRETRANSLATE_URL', 'http://127.0.0.1:5000')).rstrip('/')
+        self.api_key = api_key or getattr(settings, 'LIBRETRANSLATE_API_KEY', '')
+        pool_size = pool_size or getattr(settings, 'TRANSLATION_MAX_CONCURRENCY', 4)
+        
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def is_configured(self):
+        return bool(self.url)
+    
+    def translate(self, text, source_lang, target_lang):
+        payload = {
+            'q': text,
+            'source': source_lang,
+            'target': target_lang,
+            'format': 'text',
+        }
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        try:
+            response = self.session.post(f"{self.url}/translate", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            translated_text = (response.json().get('translatedText') or '').strip()
+        except Exception as e:
+            raise TranslationBackendError(f"LibreTranslate request failed: {e}") from e
+        if not translated_text:
+            raise TranslationBackendError("LibreTranslate returned an empty translation")
+        logger.info(f"LibreTranslate {source_lang} -> {target_lang}: {text[:50]}...")
+        return translated_text
+    
+    def health_check(self):
+        response = self.session.get(f"{self.url}/languages", timeout=self.timeout)
+        return response.status_code == 200
+
+
+class StubBackend(TranslationBackend):
+    """Deterministic local backend for development and tests (no network)"""
+    
+    name = 'stub'
+    cacheable = False
+    
+    def translate(self, text, source_lang, target_lang):
+        return f"[{target_lang}] {text}"
+
+
+# Registry of available backends, looked up by the names in settings.TRANSLATION_BACKENDS
+TRANSLATION_BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    LibreTranslateBackend.name: LibreTranslateBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def register_backend(backend_class):
+    """Register an additional backend class under its `name`"""
+    TRANSLATION_BACKENDS[backend_class.name] = backend_class
+    return backend_class
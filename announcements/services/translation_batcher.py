@@ -0,0 +1,99 @@
+"""
+Cross-announcement micro-batching of translation requests
+"""
+import logging
+from django.conf import settings
+from .micro_batcher import RedisMicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationBatcher(RedisMicroBatcher):
+    """
+    Collect translation jobs from concurrent tasks and send them to Gemini together.
+
+    All jobs share one queue; the flusher sends every queued job in one
+    request via Translator.translate_jobs. A task that gets no answer within
+    max_wait falls back to translating on its own, which bounds
+    single-announcement latency.
+
+    A flush may wait GEMINI_RATE_LIMIT_TIMEOUT for quota and then
+    TRANSLATION_BACKEND_TIMEOUT for the request; max_wait defaults to that
+    plus the window, so under quota pressure waiters do not give up (and
+    translate a second time) while their batch is still being sent.
+    """
+
+    KEY_PREFIX = 'translation_batch'
+
+    def __init__(self, translator, redis_url=None, window_ms=None, max_size=None, max_wait=None):
+        self.translator = translator
+        window_ms = window_ms or getattr(settings, 'TRANSLATION_BATCH_WINDOW_MS', 200)
+        flush_timeout = (
+            getattr(settings, 'GEMINI_RATE_LIMIT_TIMEOUT', 60)
+            + getattr(settings, 'TRANSLATION_BACKEND_TIMEOUT', 15)
+        )
+        super().__init__(
+            redis_url=redis_url or getattr(settings, 'TRANSLATION_BATCH_REDIS_URL', None),
+            window_ms=window_ms,
+            max_size=max_size or getattr(settings, 'TRANSLATION_BATCH_MAX_SIZE', 10),
+            max_wait=max_wait or getattr(settings, 'TRANSLATION_BATCH_MAX_WAIT', None) or flush_timeout + window_ms / 1000.0,
+            flush_timeout=flush_timeout,
+        )
+
+    def is_available(self):
+        """Batching needs both Redis and a configured Gemini model"""
+        return self.redis is not None and self.translator.is_available()
+
+    def translate_multiple_with_service(self, text, source_lang='auto', target_languages=None):
+        """
+        Translate text through the shared batch.
+
+        Returns:
+            dict: Language code -> (translated_text, service), same shape as
+            Translator.translate_multiple_with_service
+        """
+        if target_languages is None:
+            target_languages = ['hi', 'ta', 'te', 'bn', 'kn']
+
+        results = {}
+        pending = []
+        for lang in target_languages:
+            if not text or not text.strip() or (source_lang != 'auto' and source_lang == lang):
+                results[lang] = (text, 'original')
+            elif lang not in pending:
+                pending.append(lang)
+
+        cache = self.translator.cache
+        if pending and cache is not None:
+            for lang, cached in cache.get_many(text, source_lang, pending).items():
+                results[lang] = (cached, 'cache')
+            pending = [lang for lang in pending if lang not in results]
+
+        if pending and self.is_available():
+            try:
+                batched = self._submit(text, source_lang, pending)
+            except Exception as e:
+                logger.warning(f"Translation batch failed: {e}. Translating directly.")
+                batched = {}
+            for lang, translated_text in batched.items():
+                results[lang] = (translated_text, 'gemini')
+            pending = [lang for lang in pending if lang not in batched]
+
+        # Anything the batch could not serve goes through the normal path
+        if pending:
+            results.update(self.translator.translate_multiple_with_service(text, source_lang, pending))
+
+        return {lang: results[lang] for lang in target_languages}
+
+    def _submit(self, text, source_lang, target_languages):
+        """Queue a job on the shared batch and wait for its translations ({} on timeout)"""
+        return self.submit({
+            'text': text,
+            'source_lang': source_lang,
+            'target_languages': target_languages,
+        }) or {}
+
+    def process_batch(self, group, jobs):
+        """Send every queued job to Gemini in one request"""
+        results = self.translator.translate_jobs(jobs)
+        return {job['id']: results.get(job['id'], {}) for job in jobs}
@@ -0,0 +1,177 @@
+"""
+Translation memory: two-tier cache for translated text
+"""
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from django.conf import settings
+from .shared_counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """
+    Translation memory keyed by normalized source text, source and target language.
+
+    Lookups go to an in-process LRU tier first, then to a shared persistent
+    tier (a Django cache alias, Redis by default) so that repeats are answered
+    across Celery workers without another API call.
+    """
+
+    KEY_PREFIX = 'tm'
+
+    def __init__(self, max_entries=None, cache_alias=None, timeout=None):
+        self.max_entries = max_entries or getattr(settings, 'TRANSLATION_CACHE_MAX_ENTRIES', 5000)
+        self.cache_alias = cache_alias or getattr(settings, 'TRANSLATION_CACHE_ALIAS', None)
+        self.timeout = timeout or getattr(settings, 'TRANSLATION_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = None
+
+        # Hit/miss counts, shared by every worker
+        self.counters = SharedCounters('translation_cache')
+
+        if self.cache_alias:
+            try:
+                from django.core.cache import caches
+                self._shared = caches[self.cache_alias]
+            except Exception as e:
+                logger.warning(f"Translation cache alias '{self.cache_alias}' unavailable: {e}. Using in-process tier only.")
+
+    @staticmethod
+    def normalize(text):
+        """Normalize text so trivially different inputs share a cache entry"""
+        text = unicodedata.normalize('NFC', text or '')
+        return ' '.join(text.split())
+
+    def make_key(self, text, source_lang, target_lang):
+        """Build the cache key for a (text, source, target) triple"""
+        digest = hashlib.sha256(self.normalize(text).encode('utf-8')).hexdigest()
+        return f"{self.KEY_PREFIX}:{source_lang}:{target_lang}:{digest}"
+
+    def _memory_get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key, value):
+        evicted = 0
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                evicted += 1
+        self.counters.incr(evictions=evicted)
+
+    def get(self, text, source_lang, target_lang):
+        """
+        Look up a translation.
+
+        Returns:
+            str: Cached translation, or None on a miss
+        """
+        key = self.make_key(text, source_lang, target_lang)
+
+        value = self._memory_get(key)
+        if value is not None:
+            self.counters.incr(memory_hits=1)
+            return value
+
+        if self._shared is not None:
+            try:
+                value = self._shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared translation cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.counters.incr(shared_hits=1)
+                self._memory_set(key, value)
+                return value
+
+        self.counters.incr(misses=1)
+        return None
+
+    def get_many(self, text, source_lang, target_languages):
+        """
+        Look up several target languages for the same text.
+
+        Returns:
+            dict: Language code -> cached translation, for hits only
+        """
+        results = {}
+        shared_keys = {}
+        memory_hits = shared_hits = 0
+        for lang in target_languages:
+            key = self.make_key(text, source_lang, lang)
+            value = self._memory_get(key)
+            if value is not None:
+                memory_hits += 1
+                results[lang] = value
+            else:
+                shared_keys[key] = lang
+
+        if shared_keys and self._shared is not None:
+            try:
+                found = self._shared.get_many(list(shared_keys))
+            except Exception as e:
+                logger.warning(f"Shared translation cache read failed: {e}")
+                found = {}
+            for key, value in found.items():
+                if value is None:
+                    continue
+                shared_hits += 1
+                self._memory_set(key, value)
+                results[shared_keys.pop(key)] = value
+
+        self.counters.incr(memory_hits=memory_hits, shared_hits=shared_hits, misses=len(shared_keys))
+        return results
+
+    def set(self, text, source_lang, target_lang, translated_text):
+        """Store a translation in both tiers"""
+        self.set_many(text, source_lang, {target_lang: translated_text})
+
+    def set_many(self, text, source_lang, translations):
+        """Store translations of one text in both tiers"""
+        entries = {}
+        for lang, translated_text in translations.items():
+            if not translated_text or not translated_text.strip():
+                continue
+            key = self.make_key(text, source_lang, lang)
+            self._memory_set(key, translated_text)
+            entries[key] = translated_text
+
+        if entries and self._shared is not None:
+            try:
+                self._shared.set_many(entries, timeout=self.timeout)
+            except Exception as e:
+                logger.warning(f"Shared translation cache write failed: {e}")
+
+    def clear(self):
+        """Drop the in-process tier (the shared tier is left untouched)"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        """Return hit/miss counters across all workers (memory_entries is this process's tier)"""
+        counters = self.counters.get_all()
+        memory_hits = counters.get('memory_hits', 0)
+        shared_hits = counters.get('shared_hits', 0)
+        misses = counters.get('misses', 0)
+        hits = memory_hits + shared_hits
+        total = hits + misses
+        return {
+            'memory_hits': memory_hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'memory_entries': len(self._memory),
+            'max_entries': self.max_entries,
+            'hit_rate': hits / total if total else 0.0,
+        }
@@ -1,46 +1,84 @@
 """
-Translation service using Google Gemini API
+Translation service: translation memory in front of an ordered chain of backends
 """
 import logging
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from .translation_backends import TRANSLATION_BACKENDS, GeminiBackend, TranslationBackendError
+from .translation_cache import TranslationCache
 
 logger = logging.getLogger(__name__)
 
 
 class Translator:
-    """Service for translating text using Google Gemini API"""
+    """Service for translating text using Google Gemini API (with fallback backends)"""
     
-    # Language code mapping to full language names for Gemini
-    LANGUAGE_NAMES = {
-        'hi': 'Hindi',
-        'ta': 'Tamil',
-        'te': 'Telugu',
-        'bn': 'Bengali',
-        'kn': 'Kannada',
-        'en': 'English',
-    }
+    # Language code mapping to full language names (shared with the Gemini prompts)
+    LANGUAGE_NAMES = GeminiBackend.LANGUAGE_NAMES
     
-    def __init__(self, api_key=None):
-        self.api_key = api_key or getattr(settings, 'GEMINI_API_KEY', None)
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            # Use gemini-2.5-flash (fast and efficient for translation)
-            # Fallback to gemini-flash-latest if not available
+    # Number of single-call batch requests before falling back to per-language calls
+    BATCH_MAX_ATTEMPTS = 2
+    
+    def __init__(self, api_key=None, cache=None, rate_limiter=None, max_concurrency=None, backends=None):
+        if cache is None and getattr(settings, 'TRANSLATION_CACHE_ENABLED', True):
+            cache = TranslationCache()
+        self.cache = cache
+        self.max_concurrency = max_concurrency or getattr(settings, 'TRANSLATION_MAX_CONCURRENCY', 4)
+        
+        if backends is None:
+            backends = self._build_backends(api_key, rate_limiter)
+        self.backends = backends
+        self.gemini = next((b for b in self.backends if b.name == 'gemini'), None)
+        self.api_key = self.gemini.api_key if self.gemini else None
+        self.model = self.gemini.model if self.gemini else None
+        if not self.backends:
+            logger.warning("No translation backend configured. Translation will use fallback.")
+    
+    def _build_backends(self, api_key, rate_limiter):
+        """Instantiate the configured backend chain, in order"""
+        backends = []
+        for name in getattr(settings, 'TRANSLATION_BACKENDS', ['gemini']):
+            backend_class = TRANSLATION_BACKENDS.get(name)
+            if backend_class is None:
+                logger.warning(f"Unknown translation backend '{name}' ignored")
+                continue
             try:
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
-            except Exception:
-                try:
-                    self.model = genai.GenerativeModel('gemini-flash-latest')
-                except Exception:
-                    try:
-                        self.model = genai.GenerativeModel('gemini-2.5-pro')
-                    except Exception:
-                        # Last fallback
-                        self.model = genai.GenerativeModel('gemini-pro-latest')
-        else:
-            self.model = None
-            logger.warning("GEMINI_API_KEY not configured. Translation will use fallback.")
+                if name == 'gemini':
+                    backend = backend_class(api_key=api_key, rate_limiter=rate_limiter)
+                else:
+                    backend = backend_class()
+            except Exception as e:
+                logger.warning(f"Could not initialise translation backend '{name}': {e}")
+                continue
+            if backend.is_configured():
+                backends.append(backend)
+        return backends
+    
+    def _call(self, backend, method, *args):
+        """
+        Call a backend method through its circuit breaker.
+        
+        Returns:
+            The method's result, or None if the circuit is open or the call failed
+        """
+        if not backend.breaker.allow(probe=backend.health_check):
+            return None
+        try:
+            result = method(*args)
+        except TranslationBackendError as e:
+            backend.breaker.record_failure()
+            logger.error(f"Translation backend '{backend.name}' failed: {e}")
+            return None
+        except Exception as e:
+            backend.breaker.record_failure()
+            logger.error(f"Unexpected error in translation backend '{backend.name}': {e}")
+            return None
+        backend.breaker.record_success()
+        return result
+    
+    def _store(self, backend, text, source_lang, translations):
+        if translations and backend.cacheable and self.cache is not None:
+            self.cache.set_many(text, source_lang, translations)
     
     def translate(self, text, source_lang='auto', target_lang='hi'):
         """
@@ -50,67 +88,146 @@ class Translator:
             text: Text to translate
             source_lang: Source language code (default: 'auto' for auto-detection)
             target_lang: Target language code (hi, ta, te, bn, kn, en)
-            
+        
         Returns:
             str: Translated text or original text if translation fails
         """
-        if not text or not text.strip():
-            return text
-        
-        # If source and target are the same, return original
-        if source_lang != 'auto' and source_lang == target_lang:
-            return text
-        
-        # If API key not configured, return original text
-        if not self.model:
-            logger.warning("Gemini API not configured. Returning original text.")
-            return text
+        return self.translate_with_service(text, source_lang, target_lang)[0]
+    
+    def translate_with_service(self, text, source_lang='auto', target_lang='hi'):
+        """
+        Translate text and report where the result came from.
         
-        try:
-            # Get target language name
-            target_language = self.LANGUAGE_NAMES.get(target_lang, 'English')
-            
-            # Build prompt for translation
-            if source_lang == 'auto':
-                prompt = f"Translate the following text to {target_language}. Only return the translated text, nothing else:\n\n{text}"
-            else:
-                source_language = self.LANGUAGE_NAMES.get(source_lang, 'English')
-                prompt = f"Translate the following text from {source_language} to {target_language}. Only return the translated text, nothing else:\n\n{text}"
-            
-            # Generate translation
-            response = self.model.generate_content(prompt)
-            translated_text = response.text.strip()
-            
-            logger.info(f"Translated {source_lang} -> {target_lang}: {text[:50]}...")
-            return translated_text
-            
-        except Exception as e:
-            logger.error(f"Translation request failed: {e}")
-            # Return original text if translation fails
-            return text
+        Returns:
+            tuple: (text: str, service: str) where service is 'original',
+            'cache', 'fallback' or the name of the backend that answered
+        """
+        return self.translate_multiple_with_service(text, source_lang, [target_lang], batch=False)[target_lang]
     
-    def translate_multiple(self, text, source_lang='auto', target_languages=None):
+    def translate_multiple(self, text, source_lang='auto', target_languages=None, batch=True):
         """
         Translate text to multiple languages.
         
+        In batch mode every target language is requested in a single Gemini
+        call that returns a JSON object keyed by language code. Languages that
+        are missing or malformed in the response are re-requested (only those),
+        and anything still missing falls back to a per-language request.
+        
         Args:
             text: Text to translate
             source_lang: Source language code
             target_languages: List of target language codes
-            
+            batch: Request all languages in one call (default: True)
+        
         Returns:
             dict: Dictionary mapping language codes to translated texts
         """
+        results = self.translate_multiple_with_service(text, source_lang, target_languages, batch)
+        return {lang: translated_text for lang, (translated_text, _) in results.items()}
+    
+    def translate_multiple_with_service(self, text, source_lang='auto', target_languages=None, batch=True):
+        """
+        Translate text to multiple languages and report the service per language.
+        
+        Backends are tried in order; a backend whose circuit is open is skipped
+        without a network call and the next one picks up the remaining languages.
+        A backend whose batch request fails is left at once; only languages
+        missing from a successful batch are requested one by one.
+        
+        Returns:
+            dict: Language code -> (translated_text, service)
+        """
         if target_languages is None:
             target_languages = ['hi', 'ta', 'te', 'bn', 'kn']
         
-        translations = {}
+        results = {}
+        pending = []
         for lang in target_languages:
-            translations[lang] = self.translate(text, source_lang, lang)
+            if not text or not text.strip() or (source_lang != 'auto' and source_lang == lang):
+                results[lang] = (text, 'original')
+            elif lang not in pending:
+                pending.append(lang)
+        
+        if pending and self.cache is not None:
+            for lang, cached in self.cache.get_many(text, source_lang, pending).items():
+                results[lang] = (cached, 'cache')
+            pending = [lang for lang in pending if lang not in results]
+        
+        for backend in self.backends:
+            if not pending:
+                break
+            
+            if batch and backend.supports_batch and len(pending) > 1:
+                batch_failed = False
+                for attempt in range(self.BATCH_MAX_ATTEMPTS):
+                    batch_results = self._call(backend, backend.translate_batch, text, source_lang, pending)
+                    if batch_results is None:
+                        batch_failed = True
+                        break
+                    self._store(backend, text, source_lang, batch_results)
+                    for lang, translated_text in batch_results.items():
+                        results[lang] = (translated_text, backend.name)
+                    pending = [lang for lang in pending if lang not in batch_results]
+                    if not pending:
+                        break
+                    logger.warning(f"Batch translation attempt {attempt + 1} missing languages: {pending}")
+                if batch_failed:
+                    # Down or timed out: per-language requests would each wait out the same timeout
+                    logger.warning(f"Translation backend '{backend.name}' batch failed; trying the next backend for {pending}")
+                    continue
+            
+            # One request per language still missing, run concurrently
+            def request_one(lang, backend=backend):
+                return self._call(backend, backend.translate, text, source_lang, lang)
+            
+            for lang, translated_text in zip(pending, self._map_concurrent(request_one, pending)):
+                if translated_text:
+                    self._store(backend, text, source_lang, {lang: translated_text})
+                    results[lang] = (translated_text, backend.name)
+            pending = [lang for lang in pending if lang not in results]
         
-        return translations
+        # Return original text if translation fails
+        for lang in pending:
+            results[lang] = (text, 'fallback')
+        
+        return {lang: results[lang] for lang in target_languages}
+    
+    def translate_jobs(self, jobs):
+        """
+        Translate several independent texts in a single Gemini call.
+        
+        Args:
+            jobs: List of dicts with 'id', 'text', 'source_lang' and 'target_languages'
+        
+        Returns:
+            dict: Job id -> {language code: translated text}; missing or malformed
+            entries are omitted so callers can retry them individually
+        """
+        if not jobs or self.gemini is None:
+            return {}
+        
+        results = self._call(self.gemini, self.gemini.translate_jobs, jobs) or {}
+        for job in jobs:
+            if job['id'] in results:
+                self._store(self.gemini, job['text'], job.get('source_lang', 'auto'), results[job['id']])
+        logger.info(f"Translated {len(results)}/{len(jobs)} jobs in one request")
+        return results
+    
+    def _map_concurrent(self, func, items):
+        """Apply func to items on a thread pool bounded by max_concurrency, preserving order"""
+        items = list(items)
+        if len(items) <= 1 or self.max_concurrency <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            return list(executor.map(func, items))
+    
+    def backend_status(self):
+        """Return circuit breaker state for each backend in the chain"""
+        return [
+            {'name': backend.name, 'state': backend.breaker.state, 'failures': backend.breaker.failures}
+            for backend in self.backends
+        ]
     
     def is_available(self):
         """Check if Gemini API is available (checks if API key is configured)"""
         return self.model is not None and self.api_key is not None
-
@@ -0,0 +1,65 @@
+"""
+Cross-announcement micro-batching of TTS synthesis
+"""
+import logging
+from django.conf import settings
+from .micro_batcher import RedisMicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class TTSBatcher(RedisMicroBatcher):
+    """
+    Collect utterances from concurrent tasks and synthesize them together, per language.
+    
+    Each language has its own queue; the flusher runs every queued utterance
+    through TTSService.synthesize_batch. Output files are written to the
+    paths the submitters chose, on the shared media volume. A task that gets
+    no answer within max_wait synthesizes on its own.
+    """
+    
+    KEY_PREFIX = 'tts_batch'
+    
+    def __init__(self, tts_service, redis_url=None, window_ms=None, max_size=None, max_wait=None):
+        self.tts_service = tts_service
+        super().__init__(
+            redis_url=redis_url or getattr(settings, 'TTS_BATCH_REDIS_URL', None),
+            window_ms=window_ms or getattr(settings, 'TTS_BATCH_WINDOW_MS', 100),
+            max_size=max_size or getattr(settings, 'TTS_BATCH_MAX_SIZE', 8),
+            max_wait=max_wait or getattr(settings, 'TTS_BATCH_MAX_WAIT', 120),
+        )
+    
+    def is_available(self):
+        return self.redis is not None
+    
+    def synthesize(self, text, language_code, output_path):
+        """
+        Synthesize text through the shared batch.
+        
+        Returns:
+            tuple: (success: bool, service_used: str), same as TTSService.synthesize
+        """
+        try:
+            result = self._submit(text, language_code, str(output_path))
+        except Exception as e:
+            logger.warning(f"TTS batch failed: {e}. Synthesizing directly.")
+            result = None
+        if result is not None and result['success']:
+            return True, result['service']
+        return self.tts_service.synthesize_direct(text, language_code, output_path)
+    
+    def _submit(self, text, language_code, output_path):
+        """Queue an utterance on its language's batch and wait for the result (None on timeout)"""
+        return self.submit({'text': text, 'output_path': output_path}, group=language_code)
+    
+    def process_batch(self, language_code, jobs):
+        """Synthesize every queued utterance of one language together"""
+        results = self.tts_service.synthesize_batch(
+            [job['text'] for job in jobs],
+            language_code,
+            [job['output_path'] for job in jobs],
+        )
+        return {
+            job['id']: {'success': success, 'service': service_used}
+            for job, (success, service_used) in zip(jobs, results)
+        }
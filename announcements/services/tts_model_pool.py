@@ -0,0 +1,108 @@
+"""
+Per-language pool of loaded Coqui TTS models
+"""
+import logging
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CoquiModelPool:
+    """
+    Keeps loaded Coqui models in memory, keyed by model name.
+    
+    Models are evicted least-recently-used first once the estimated memory of
+    all loaded models exceeds the configured budget, so a worker cycling
+    through every language no longer reloads a model from disk each time.
+    """
+    
+    # Used when a model's size cannot be measured
+    DEFAULT_MODEL_SIZE_MB = 150
+    
+    def __init__(self, memory_budget_mb=None, loader=None):
+        self.memory_budget_mb = memory_budget_mb or getattr(settings, 'TTS_MODEL_MEMORY_BUDGET_MB', 1024)
+        self._loader = loader
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+    
+    def _load(self, model_name):
+        if self._loader is not None:
+            return self._loader(model_name)
+        from TTS.api import TTS
+        return TTS(model_name)
+    
+    def _measure(self, model):
+        """Estimate a model's memory footprint in MB from its parameters"""
+        try:
+            tts_model = model.synthesizer.tts_model
+            size = sum(p.numel() * p.element_size() for p in tts_model.parameters())
+            return size / (1024 * 1024)
+        except Exception:
+            return self.DEFAULT_MODEL_SIZE_MB
+    
+    def get(self, model_name):
+        """
+        Return a loaded model, loading (and evicting others) if needed.
+        
+        Args:
+            model_name: Coqui model name
+        
+        Returns:
+            The loaded TTS model
+        """
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is not None:
+                self._models.move_to_end(model_name)
+                self.hits += 1
+                return model
+            
+            model = self._load(model_name)
+            self.loads += 1
+            self._models[model_name] = model
+            self._sizes[model_name] = self._measure(model)
+            logger.info(f"Loaded Coqui model {model_name} ({self._sizes[model_name]:.0f} MB)")
+            self._evict(keep=model_name)
+            return model
+    
+    def _evict(self, keep):
+        """Drop least-recently-used models until the pool fits the budget"""
+        while self.memory_used_mb() > self.memory_budget_mb and len(self._models) > 1:
+            model_name = next(iter(self._models))
+            if model_name == keep:
+                break
+            self._models.pop(model_name)
+            self._sizes.pop(model_name, None)
+            self.evictions += 1
+            logger.info(f"Evicted Coqui model {model_name} to stay within {self.memory_budget_mb} MB")
+    
+    def memory_used_mb(self):
+        return sum(self._sizes.values())
+    
+    def preload(self, model_names):
+        """Load models ahead of time (e.g. when a worker process starts)"""
+        for model_name in model_names:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.warning(f"Could not preload Coqui model {model_name}: {e}")
+    
+    def loaded_models(self):
+        return list(self._models)
+    
+    def stats(self):
+        return {
+            'loaded_models': self.loaded_models(),
+            'memory_used_mb': self.memory_used_mb(),
+            'memory_budget_mb': self.memory_budget_mb,
+            'hits': self.hits,
+            'loads': self.loads,
+            'evictions': self.evictions,
+        }
@@ -2,9 +2,20 @@
 Text-to-Speech service using Coqui TTS (primary) and pyttsx3 (fallback)
 """
 import os
+import re
+import json
+import wave
+import struct
+import hashlib
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from django.conf import settings
+from .tts_model_pool import CoquiModelPool
+from .phrase_audio import PhraseAudioCache
+from .audio_postprocess import AudioPostProcessor
+from .pyttsx3_pool import Pyttsx3ProcessPool
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +23,27 @@ logger = logging.getLogger(__name__)
 class TTSService:
     """Service for generating speech from text"""
     
+    # Coqui model used for each language
+    COQUI_MODELS = {
+        'en': 'tts_models/en/ljspeech/tacotron2-DDC',
+        'hi': 'tts_models/hi/cv/vits',
+        'ta': 'tts_models/ta/cv/vits',
+        'te': 'tts_models/te/cv/vits',
+        'bn': 'tts_models/bn/cv/vits',
+        'kn': 'tts_models/kn/cv/vits',
+    }
+    DEFAULT_COQUI_MODEL = 'tts_models/en/ljspeech/tacotron2-DDC'
+    
     def __init__(self):
         self.coqui_available = False
         self.pyttsx3_available = False
         self._init_coqui()
         self._init_pyttsx3()
+        self.postprocessor = AudioPostProcessor()
+        self.batcher = None
+        self.phrase_cache = None
+        if getattr(settings, 'TTS_PHRASE_CACHE_ENABLED', True):
+            self.phrase_cache = PhraseAudioCache(self)
     
     def _init_coqui(self):
         """Initialize Coqui TTS"""
@@ -29,54 +56,67 @@ class TTSService:
                 return
             
             self.coqui_available = True
-            self.coqui_tts = None
-            self._current_model = None
+            self.coqui_models = CoquiModelPool()
             logger.info("Coqui TTS available")
         except Exception as e:
             logger.warning(f"Error initializing Coqui TTS: {e}. Using pyttsx3 as fallback.")
             self.coqui_available = False
     
     def _init_pyttsx3(self):
-        """Initialize pyttsx3 as fallback"""
+        """Initialize pyttsx3 as fallback (engines run in a pool of subprocesses)"""
         try:
             import pyttsx3
             self.pyttsx3_available = True
-            self.pyttsx3_engine = pyttsx3.init()
-            self.pyttsx3_engine.setProperty('rate', 150)
-            self.pyttsx3_engine.setProperty('volume', 0.9)
+            self.pyttsx3_pool = Pyttsx3ProcessPool()
             logger.info("pyttsx3 TTS available")
         except Exception as e:
             logger.warning(f"pyttsx3 not available: {e}")
             self.pyttsx3_available = False
     
     def _get_coqui_model(self, language_code):
-        """Get appropriate Coqui TTS model for language"""
+        """Get appropriate Coqui TTS model for language (kept loaded in the model pool)"""
         if not self.coqui_available:
             return None
         
         try:
-            from TTS.api import TTS
-            
-            model_map = {
-                'en': 'tts_models/en/ljspeech/tacotron2-DDC',
-                'hi': 'tts_models/hi/cv/vits',
-                'ta': 'tts_models/ta/cv/vits',
-                'te': 'tts_models/te/cv/vits',
-                'bn': 'tts_models/bn/cv/vits',
-                'kn': 'tts_models/kn/cv/vits',
-            }
-            
-            model_name = model_map.get(language_code, 'tts_models/en/ljspeech/tacotron2-DDC')
-            
-            if self.coqui_tts is None or getattr(self, '_current_model', None) != model_name:
-                self.coqui_tts = TTS(model_name)
-                self._current_model = model_name
-            
-            return self.coqui_tts
+            model_name = self.COQUI_MODELS.get(language_code, self.DEFAULT_COQUI_MODEL)
+            return self.coqui_models.get(model_name)
         except Exception as e:
             logger.error(f"Error getting Coqui model: {e}")
             return None
     
+    def preload_models(self, language_codes=None):
+        """
+        Load Coqui models for the given languages ahead of time.
+        
+        Args:
+            language_codes: Languages to warm (default: settings.TTS_PRELOAD_LANGUAGES)
+        """
+        if not self.coqui_available:
+            return
+        if language_codes is None:
+            language_codes = getattr(settings, 'TTS_PRELOAD_LANGUAGES', [])
+        model_names = []
+        for language_code in language_codes:
+            model_name = self.COQUI_MODELS.get(language_code, self.DEFAULT_COQUI_MODEL)
+            if model_name not in model_names:
+                model_names.append(model_name)
+        self.coqui_models.preload(model_names)
+    
+    def warm_phrases(self, language_codes=None):
+        """
+        Pre-synthesize the phrase clips for the given languages.
+        
+        Args:
+            language_codes: Languages to warm (default: settings.TTS_PRELOAD_LANGUAGES)
+        """
+        if self.phrase_cache is None:
+            return
+        if language_codes is None:
+            language_codes = getattr(settings, 'TTS_PRELOAD_LANGUAGES', [])
+        for language_code in language_codes:
+            self.phrase_cache.warm(language_code)
+    
     def _language_to_pyttsx3_voice(self, language_code):
         """Map language code to pyttsx3 voice"""
         voice_map = {
@@ -89,22 +129,138 @@ class TTSService:
         }
         return voice_map.get(language_code, 'english')
     
+    # pyttsx3 engine settings (part of the audio content hash)
+    PYTTSX3_RATE = 150
+    PYTTSX3_VOLUME = 0.9
+    
+    def available_engines(self):
+        """TTS engines in the order generate_audio tries them"""
+        engines = []
+        if self.coqui_available:
+            engines.append('coqui')
+        if self.pyttsx3_available:
+            engines.append('pyttsx3')
+        return engines
+    
+    def voice_settings(self, engine, language_code):
+        """Settings that change the audio an engine produces for a language"""
+        if engine == 'coqui':
+            return {'model': self.COQUI_MODELS.get(language_code, self.DEFAULT_COQUI_MODEL)}
+        return {
+            'voice': self._language_to_pyttsx3_voice(language_code),
+            'rate': self.PYTTSX3_RATE,
+            'volume': self.PYTTSX3_VOLUME,
+        }
+    
+    def audio_hash(self, text, language_code, engine):
+        """
+        Content address of the audio for text in a language from an engine.
+        
+        Returns:
+            str: SHA-256 hex digest of text, language, engine and voice settings
+        """
+        payload = json.dumps({
+            'text': ' '.join((text or '').split()),
+            'language': language_code,
+            'engine': engine,
+            'voice': self.voice_settings(engine, language_code),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def audio_hash_candidates(self, text, language_code):
+        """Content hashes for every available engine, in preference order"""
+        return [self.audio_hash(text, language_code, engine) for engine in self.available_engines()]
+    
     def generate_audio_coqui(self, text, language_code, output_path):
         """Generate audio using Coqui TTS"""
+        return self.generate_audio_coqui_batch([text], language_code, [output_path])[0]
+    
+    @staticmethod
+    def _supports_batch_inference(tts):
+        """VITS models accept a padded batch of utterances in one forward pass"""
         try:
-            tts = self._get_coqui_model(language_code)
-            if tts is None:
-                return False
+            return type(tts.synthesizer.tts_model).__name__ == 'Vits'
+        except AttributeError:
+            return False
+    
+    def _coqui_batch_inference(self, tts, utterances):
+        """
+        Synthesize utterances with one VITS forward pass per batch.
+        
+        Returns:
+            list: One float waveform (NumPy array) per utterance
+        """
+        import torch
+        
+        model = tts.synthesizer.tts_model
+        device = next(model.parameters()).device
+        hop_length = model.config.audio.hop_length
+        batch_size = getattr(settings, 'TTS_BATCH_MAX_SIZE', 8)
+        
+        waveforms = []
+        for start in range(0, len(utterances), batch_size):
+            token_ids = [model.tokenizer.text_to_ids(text) for text in utterances[start:start + batch_size]]
+            lengths = torch.tensor([len(ids) for ids in token_ids], dtype=torch.long)
+            x = torch.zeros(len(token_ids), int(lengths.max()), dtype=torch.long)
+            for row, ids in enumerate(token_ids):
+                x[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
             
-            output_path = Path(output_path)
-            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with torch.no_grad():
+                outputs = model.inference(x.to(device), aux_input={'x_lengths': lengths.to(device)})
             
-            tts.tts_to_file(text=text, file_path=str(output_path))
-            logger.info(f"Generated audio with Coqui TTS: {output_path}")
-            return True
-        except Exception as e:
-            logger.error(f"Coqui TTS generation failed: {e}")
-            return False
+            # Padding frames are masked out by y_mask; trim each output to its own length
+            audio = outputs['model_outputs'].squeeze(1).cpu().numpy()
+            output_lengths = (outputs['y_mask'].sum(dim=(1, 2)).cpu().numpy() * hop_length).astype(int)
+            waveforms.extend(audio[row, :output_lengths[row]] for row in range(len(token_ids)))
+        return waveforms
+    
+    def generate_audio_coqui_batch(self, texts, language_code, output_paths):
+        """
+        Generate several files with Coqui TTS, batching sentences across texts.
+        
+        Every sentence of every text is run through the model together (VITS
+        models only) and the outputs are split back into one file per text.
+        Other models, or a failed batch, synthesize each text on its own.
+        
+        Args:
+            texts: Texts to convert to speech
+            language_code: Language of all texts
+            output_paths: Path to save each text's audio
+        
+        Returns:
+            list: One success bool per text
+        """
+        tts = self._get_coqui_model(language_code)
+        if tts is None:
+            return [False] * len(texts)
+        
+        for output_path in output_paths:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        
+        if self._supports_batch_inference(tts):
+            try:
+                import numpy as np
+                sentences = [self.split_sentences(text) or [text] for text in texts]
+                flat = [sentence for group in sentences for sentence in group]
+                waveforms = iter(self._coqui_batch_inference(tts, flat))
+                for group, output_path in zip(sentences, output_paths):
+                    wav = np.concatenate([next(waveforms) for _ in group])
+                    tts.synthesizer.save_wav(wav, str(output_path))
+                logger.info(f"Generated {len(texts)} file(s) from {len(flat)} sentence(s) with batched Coqui TTS ({language_code})")
+                return [True] * len(texts)
+            except Exception as e:
+                logger.warning(f"Batched Coqui inference failed, synthesizing one by one: {e}")
+        
+        results = []
+        for text, output_path in zip(texts, output_paths):
+            try:
+                tts.tts_to_file(text=text, file_path=str(output_path))
+                logger.info(f"Generated audio with Coqui TTS: {output_path}")
+                results.append(True)
+            except Exception as e:
+                logger.error(f"Coqui TTS generation failed: {e}")
+                results.append(False)
+        return results
     
     def generate_audio_pyttsx3(self, text, language_code, output_path):
         """Generate audio using pyttsx3 (fallback)"""
@@ -115,8 +271,8 @@ class TTSService:
             output_path = Path(output_path)
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            self.pyttsx3_engine.save_to_file(text, str(output_path))
-            self.pyttsx3_engine.runAndWait()
+            if not self.pyttsx3_pool.synthesize(text, output_path, self.PYTTSX3_RATE, self.PYTTSX3_VOLUME):
+                return False
             
             logger.info(f"Generated audio with pyttsx3: {output_path}")
             return True
@@ -128,6 +284,10 @@ class TTSService:
         """
         Generate audio file from text.
         
+        Text containing known phrases (station names, digits, fixed phrases)
+        is assembled from cached phrase clips, so only the new pieces are
+        synthesized; anything else is synthesized in one go.
+        
         Args:
             text: Text to convert to speech
             language_code: Language code (hi, ta, te, bn, kn, en)
@@ -140,6 +300,60 @@ class TTSService:
             logger.warning("Empty text provided for TTS")
             return False, None
         
+        if self.phrase_cache is not None:
+            segments = self.phrase_cache.segment(text, language_code)
+            if self.phrase_cache.should_use(segments):
+                try:
+                    success, service_used = self.phrase_cache.generate_audio(segments, language_code, output_path)
+                    if success:
+                        return True, service_used
+                except Exception as e:
+                    logger.warning(f"Phrase concatenation failed, synthesizing whole text: {e}")
+        
+        return self.synthesize(text, language_code, output_path)
+    
+    def synthesize(self, text, language_code, output_path):
+        """
+        Synthesize text in one piece with the first engine that succeeds.
+        
+        Goes through the cross-announcement batcher when one is attached
+        (Celery worker processes with TTS_BATCH_ENABLED).
+        
+        Returns:
+            tuple: (success: bool, service_used: str)
+        """
+        if self.batcher is not None and self.batcher.is_available():
+            return self.batcher.synthesize(text, language_code, output_path)
+        return self.synthesize_direct(text, language_code, output_path)
+    
+    def synthesize_batch(self, texts, language_code, output_paths):
+        """
+        Synthesize several texts of one language, batching Coqui inference.
+        
+        Returns:
+            list: One (success: bool, service_used: str) tuple per text
+        """
+        results = [(False, None)] * len(texts)
+        if self.coqui_available:
+            for index, success in enumerate(self.generate_audio_coqui_batch(texts, language_code, output_paths)):
+                if success:
+                    results[index] = (True, 'coqui')
+        
+        # pyttsx3 fallbacks run in parallel, one per pool process
+        failed = [index for index, (success, _) in enumerate(results) if not success]
+        if failed and self.pyttsx3_available:
+            with ThreadPoolExecutor(max_workers=min(self.pyttsx3_pool.size, len(failed))) as executor:
+                outcomes = executor.map(
+                    lambda index: self.generate_audio_pyttsx3(texts[index], language_code, output_paths[index]),
+                    failed,
+                )
+                for index, success in zip(failed, outcomes):
+                    if success:
+                        results[index] = (True, 'pyttsx3')
+        return results
+    
+    def synthesize_direct(self, text, language_code, output_path):
+        """Synthesize text in this process with the first engine that succeeds"""
         if self.coqui_available:
             if self.generate_audio_coqui(text, language_code, output_path):
                 return True, 'coqui'
@@ -151,13 +365,89 @@ class TTSService:
         logger.error("No TTS service available")
         return False, None
     
+    # Sentence boundaries for chunked synthesis (Latin and Devanagari full stops)
+    SENTENCE_PATTERN = re.compile(r'(?<=[.!?।])\s+')
+    
+    def split_sentences(self, text):
+        """Split text into sentences for chunked synthesis"""
+        return [sentence.strip() for sentence in self.SENTENCE_PATTERN.split(text or '') if sentence.strip()]
+    
+    @staticmethod
+    def streaming_wav_header(channels, sample_width, frame_rate):
+        """
+        WAV header for a stream of unknown length.
+        
+        The RIFF and data sizes are set to the maximum, which players treat
+        as "read until the connection closes".
+        """
+        unknown = 0xFFFFFFFF
+        return b''.join([
+            b'RIFF', struct.pack('<I', unknown), b'WAVE',
+            b'fmt ', struct.pack(
+                '<IHHIIHH', 16, 1, channels, frame_rate,
+                frame_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+            ),
+            b'data', struct.pack('<I', unknown),
+        ])
+    
+    def stream_audio(self, text, language_code):
+        """
+        Synthesize text sentence by sentence, yielding audio as each one is ready.
+        
+        The first chunk is a streaming WAV header taken from the first
+        sentence's format; every chunk after that is raw PCM, converted to
+        that format if an engine produced something different.
+        
+        Args:
+            text: Text to convert to speech
+            language_code: Language code (hi, ta, te, bn, kn, en)
+        
+        Yields:
+            bytes: WAV header, then PCM frames per sentence
+        """
+        params = None
+        with tempfile.TemporaryDirectory(prefix='tts-stream-') as tmp_dir:
+            for index, sentence in enumerate(self.split_sentences(text)):
+                chunk_path = Path(tmp_dir) / f"{index}.wav"
+                success, _ = self.generate_audio(sentence, language_code, str(chunk_path))
+                if not success:
+                    logger.warning(f"Skipping sentence {index} of streamed audio ({language_code})")
+                    continue
+                self.postprocess(str(chunk_path))
+                
+                try:
+                    with wave.open(str(chunk_path), 'rb') as chunk:
+                        chunk_params = chunk.getparams()
+                        frames = chunk.readframes(chunk_params.nframes)
+                except Exception as e:
+                    logger.warning(f"Could not read streamed chunk {index}: {e}")
+                    continue
+                
+                if params is None:
+                    params = chunk_params
+                    yield self.streaming_wav_header(params.nchannels, params.sampwidth, params.framerate)
+                elif chunk_params[:3] != params[:3]:
+                    from pydub import AudioSegment
+                    segment = AudioSegment.from_file(str(chunk_path))
+                    segment = segment.set_channels(params.nchannels).set_sample_width(params.sampwidth).set_frame_rate(params.framerate)
+                    frames = segment.raw_data
+                
+                yield frames
+                chunk_path.unlink(missing_ok=True)
+        
+        if params is None:
+            logger.error(f"Streamed synthesis produced no audio ({language_code})")
+    
     def get_audio_duration(self, audio_path):
-        """Get duration of audio file in seconds"""
-        try:
-            from pydub import AudioSegment
-            audio = AudioSegment.from_file(audio_path)
-            return len(audio) / 1000.0  # Convert milliseconds to seconds
-        except Exception as e:
-            logger.warning(f"Could not get audio duration: {e}")
-            return None
+        """Get duration of audio file in seconds (from the file header)"""
+        return self.postprocessor.duration(audio_path)
+    
+    def postprocess(self, audio_path):
+        """
+        Normalize loudness in place and measure a generated WAV file.
+        
+        Returns:
+            dict: 'duration_seconds', 'gain_db' and 'waveform_peaks'
+        """
+        return self.postprocessor.process(audio_path)
 
@@ -2,142 +2,959 @@
 Celery tasks for async processing of announcements
 """
 import logging
-from celery import shared_task
+from celery import chain, chord, group, shared_task
+from celery.signals import before_task_publish, task_prerun, worker_process_init
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from .models import Announcement, Translation, AudioFile
-from .services import LanguageDetector, Translator, TTSService
+from .models import Announcement, Translation, AudioBlob, AudioFile, content_fingerprint
+from .services import AudioEncoder, AudioProgramRenderer, LanguageDetector, QueueWaitMetrics, Translator, TemplateEngine, TranslationBatcher, TTSBatcher, TTSService
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 language_detector = LanguageDetector()
 translator = Translator()
+template_engine = TemplateEngine(translator)
+translation_batcher = TranslationBatcher(translator)
 tts_service = TTSService()
+audio_encoder = AudioEncoder()
+program_renderer = AudioProgramRenderer(audio_encoder)
+queue_metrics = QueueWaitMetrics()
 
 
-@shared_task(bind=True, max_retries=3)
-def process_announcement(self, announcement_id):
+@worker_process_init.connect
+def preload_tts_models(**kwargs):
+    """Warm the hot languages' TTS models (and optionally phrase clips) in each new worker process"""
+    # Only worker processes join cross-announcement TTS batches; web processes synthesize directly
+    if getattr(settings, 'TTS_BATCH_ENABLED', False):
+        tts_service.batcher = TTSBatcher(tts_service)
+    tts_service.preload_models()
+    if getattr(settings, 'TTS_PHRASE_WARM_ON_START', False):
+        tts_service.warm_phrases()
+
+
+@before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    """Stamp every message with its publish time for queue wait metrics"""
+    if headers is not None:
+        headers.setdefault('enqueued_at', time.time())
+
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    """Record how long a pipeline task waited in its lane's queue"""
+    request = task.request if task is not None else None
+    if request is None or request.called_directly:
+        return
+    headers = getattr(request, 'headers', None) or {}
+    lane = getattr(request, 'lane', None) or headers.get('lane')
+    enqueued_at = getattr(request, 'enqueued_at', None) or headers.get('enqueued_at')
+    if lane and enqueued_at:
+        # ETA tasks (scheduled pre-renders, held notifications) only start waiting at their ETA
+        ready_at = float(enqueued_at)
+        eta = getattr(request, 'eta', None) or headers.get('eta')
+        if eta:
+            try:
+                eta = datetime.fromisoformat(eta) if isinstance(eta, str) else eta
+                if eta.tzinfo is None:
+                    eta = eta.replace(tzinfo=dt_timezone.utc)
+                ready_at = max(ready_at, eta.timestamp())
+            except (TypeError, ValueError):
+                pass
+        wait = time.time() - ready_at
+        queue_metrics.record(lane, wait)
+        if wait > getattr(settings, 'QUEUE_WAIT_WARNING_SECONDS', {}).get(lane, float('inf')):
+            logger.warning(f"{task.name} waited {wait:.1f}s in the {lane} lane")
+
+
+def get_processing_lane(announcement):
     """
-    Process an announcement: detect language, translate, generate audio.
+    Processing lane for an announcement, from is_urgent and priority.
+    
+    Returns:
+        str: 'urgent', 'high' or 'normal' (keys of settings.PROCESSING_LANES)
+    """
+    if announcement.is_urgent or announcement.priority >= getattr(settings, 'URGENT_PRIORITY_THRESHOLD', 9):
+        return 'urgent'
+    if announcement.priority >= getattr(settings, 'HIGH_PRIORITY_THRESHOLD', 7):
+        return 'high'
+    return 'normal'
+
+
+def lane_options(lane, task=None):
+    """
+    apply_async options that put a task in a lane.
+    
+    A lane without a queue keeps the normal routing and only sets the broker
+    priority. So does synthesize_audio on dedicated TTS queues in every lane:
+    an explicit queue would override route_task and send it to a worker
+    without that language's model, so urgent TTS jumps the language's queue
+    by priority instead.
     
     Args:
-        announcement_id: ID of the announcement to process
+        lane: Key of settings.PROCESSING_LANES
+        task: Task the options are for (default: any task without its own route)
+    """
+    config = getattr(settings, 'PROCESSING_LANES', {}).get(lane, {})
+    options = {'headers': {'lane': lane}}
+    routed = task is not None and task.name == synthesize_audio.name and getattr(settings, 'TTS_DEDICATED_QUEUES', False)
+    if config.get('queue') and not routed:
+        options['queue'] = config['queue']
+    if config.get('priority') is not None:
+        options['priority'] = config['priority']
+    return options
+
+
+def scheduled_time(announcement):
+    """
+    The announcement's announcement_time (None if unscheduled).
+    
+    Raises:
+        ValueError: If the time is naive; callers must make it aware first
+    """
+    if announcement.announcement_time is not None and timezone.is_naive(announcement.announcement_time):
+        raise ValueError(f"Announcement {announcement.id} has a naive announcement_time: {announcement.announcement_time}")
+    return announcement.announcement_time
+
+
+def prerender_time(announcement):
+    """When rendering of a scheduled announcement should start (None if unscheduled)"""
+    if scheduled_time(announcement) is None:
+        return None
+    lead = getattr(settings, 'SCHEDULE_PRERENDER_LEAD_SECONDS', 600)
+    return announcement.announcement_time - timedelta(seconds=lead)
+
+
+def is_held(announcement):
+    """Whether an announcement is scheduled for later and must not reach boards yet"""
+    due = scheduled_time(announcement)
+    return due is not None and due > timezone.now()
+
+
+def enqueue_announcements(announcements, producer=None, **options):
+    """
+    Queue several announcements for processing, each in its priority lane.
+    
+    Announcements whose pre-render window opens after the next scheduler
+    sweep are parked as 'scheduled' instead; warm_scheduled_announcements
+    queues them in time. Ones opening sooner are queued with that ETA, as
+    are all of them when SCHEDULE_USE_BEAT is off (no celery beat running).
+    
+    Statuses change in one UPDATE per outcome: parked rows become
+    'scheduled', queued ones 'queued' (so process_pending does not pick them
+    up a second time) and ones the broker refused go back to 'pending'.
+    Every message is published over one broker connection.
+    
+    Args:
+        announcements: Announcements to process
+        producer: Broker producer to reuse (one is acquired if None)
+        options: Extra apply_async options for every message (e.g. eta)
+    
+    Returns:
+        tuple: (queued: dict id -> AsyncResult, parked: list of ids, failed: dict id -> exception)
+    """
+    now = timezone.now()
+    sweep_interval = getattr(settings, 'SCHEDULE_SWEEP_INTERVAL_SECONDS', 60)
+    use_beat = getattr(settings, 'SCHEDULE_USE_BEAT', True)
+    parked = []
+    to_queue = []
+    for announcement in announcements:
+        message_options = dict(options)
+        render_at = prerender_time(announcement)
+        if 'eta' not in options and 'countdown' not in options and render_at is not None:
+            if render_at > now + timedelta(seconds=sweep_interval) and use_beat:
+                parked.append(announcement)
+                logger.info(f"Announcement {announcement.id} scheduled for {announcement.announcement_time}; rendering from {render_at}")
+                continue
+            if render_at > now:
+                message_options['eta'] = render_at
+        to_queue.append((announcement, message_options))
+    
+    if parked:
+        Announcement.objects.filter(id__in=[announcement.id for announcement in parked]).update(status='scheduled', updated_at=now)
+    if not to_queue:
+        return {}, [announcement.id for announcement in parked], {}
+    
+    Announcement.objects.filter(
+        id__in=[announcement.id for announcement, _ in to_queue],
+        status__in=['pending', 'scheduled']
+    ).update(status='queued', updated_at=now)
+    queued = {}
+    failed = {}
+    with process_announcement.app.producer_or_acquire(producer) as producer:
+        for announcement, message_options in to_queue:
+            try:
+                queued[announcement.id] = process_announcement.apply_async(
+                    args=[announcement.id],
+                    producer=producer,
+                    **{**lane_options(get_processing_lane(announcement)), **message_options}
+                )
+            except Exception as e:
+                failed[announcement.id] = e
+    if failed:
+        Announcement.objects.filter(id__in=list(failed), status='queued').update(status='pending', updated_at=timezone.now())
+    return queued, [announcement.id for announcement in parked], failed
+
+
+def enqueue_announcement(announcement, **options):
+    """
+    Queue one announcement for processing in its priority lane (see enqueue_announcements).
+    
+    Args:
+        announcement: Announcement to process
+        options: Extra apply_async options (e.g. eta, producer)
+    
+    Returns:
+        AsyncResult, or None if the announcement was parked
+    
+    Raises:
+        Exception: The broker's error if it refused the message (the
+        announcement is back to 'pending')
+    """
+    queued, _, failed = enqueue_announcements([announcement], **options)
+    if announcement.id in failed:
+        raise failed[announcement.id]
+    return queued.get(announcement.id)
+
+
+def publish_announcement_event(announcement_id, event_type, data):
+    """
+    Push a progress event to boards subscribed to one announcement.
+    
+    Args:
+        announcement_id: ID of the announcement
+        event_type: Consumer handler name (translation_ready, audio_ready)
+        data: Event payload
     """
     try:
-        announcement = Announcement.objects.get(id=announcement_id)
-        announcement.status = 'processing'
-        announcement.save()
-        
-        if not announcement.detected_language or announcement.detected_language == 'en':
-            detected_lang = language_detector.detect_language(announcement.text)
-            announcement.detected_language = detected_lang
-            announcement.save()
-            logger.info(f"Detected language: {detected_lang} for announcement {announcement_id}")
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f'announcement_{announcement_id}',
+            {'type': event_type, 'announcement_id': announcement_id, **data}
+        )
+    except Exception as e:
+        logger.warning(f"Could not publish {event_type} for announcement {announcement_id}: {e}")
+
+
+def save_translations(announcement, translations_dict):
+    """
+    Store translations in one bulk upsert, then publish each one.
+    
+    Args:
+        announcement: Announcement being processed
+        translations_dict: Language code -> (translated_text, service)
+    
+    Returns:
+        dict: Language code -> saved Translation
+    """
+    source_hash = announcement.translation_source_hash()
+    translations = []
+    for lang_code, (translated_text, service_used) in translations_dict.items():
+        if not translated_text or not translated_text.strip():
+            translated_text, service_used = announcement.text, 'fallback'
+        translations.append(Translation(
+            announcement=announcement,
+            language_code=lang_code,
+            translated_text=translated_text,
+            translation_service=service_used,
+            # Fallbacks keep a blank hash so the next run translates again
+            source_hash='' if service_used == 'fallback' else source_hash,
+        ))
+    if not translations:
+        return {}
+    
+    Translation.objects.bulk_create(
+        translations,
+        update_conflicts=True,
+        unique_fields=['announcement', 'language_code'],
+        update_fields=['translated_text', 'translation_service', 'source_hash'],
+    )
+    for translation in translations:
+        publish_announcement_event(announcement.id, 'translation_ready', {
+            'language_code': translation.language_code,
+            'text': translation.translated_text,
+            'translation_service': translation.translation_service,
+        })
+    return {translation.language_code: translation for translation in translations}
+
+
+def get_or_create_audio_blob(text, lang_code):
+    """
+    Return the shared audio blob for text in a language, synthesizing only if it is new.
+    
+    Blobs are addressed by hash(text, language, engine, voice settings), so
+    byte-identical spoken content is synthesized and written only once.
+    
+    Args:
+        text: Text to speak
+        lang_code: Language of the text
+    
+    Returns:
+        AudioBlob or None if synthesis failed
+    """
+    candidates = tts_service.audio_hash_candidates(text, lang_code)
+    existing = {blob.content_hash: blob for blob in AudioBlob.objects.filter(content_hash__in=candidates)}
+    for content_hash in candidates:
+        if content_hash in existing:
+            logger.info(f"Reusing audio blob {content_hash[:12]} for {lang_code}")
+            return existing[content_hash]
+    
+    tmp_path = Path(settings.MEDIA_ROOT) / 'audio' / 'blobs' / 'tmp' / f"{uuid.uuid4().hex}.wav"
+    success, service_used = tts_service.generate_audio(text, lang_code, str(tmp_path))
+    if not success:
+        logger.warning(f"Failed to generate audio for {lang_code} - TTS service may not be available")
+        return None
+    
+    # Normalize loudness and measure before the file becomes shared
+    audio_info = tts_service.postprocess(str(tmp_path))
+    
+    content_hash = tts_service.audio_hash(text, lang_code, service_used)
+    relative_path = AudioBlob.path_for(content_hash)
+    final_path = Path(settings.MEDIA_ROOT) / relative_path
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, final_path)
+    
+    blob, _ = AudioBlob.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={
+            'audio_file': relative_path,
+            'language_code': lang_code,
+            'duration_seconds': audio_info['duration_seconds'],
+            'waveform_peaks': audio_info['waveform_peaks'],
+            'tts_service': service_used,
+        }
+    )
+    logger.info(f"Generated audio blob {content_hash[:12]} for {lang_code}: {final_path}")
+    return blob
+
+
+def get_or_create_variant_blobs(master):
+    """
+    Return the compressed variant blobs of a master WAV blob, encoding missing ones.
+    
+    Variant blobs are addressed by hash(master hash, encoding settings), so
+    each variant is encoded once no matter how many announcements share it.
+    
+    Args:
+        master: WAV AudioBlob
+    
+    Returns:
+        dict: Variant name -> AudioBlob, for the variants that are available
+    """
+    hashes = {variant: audio_encoder.variant_hash(master.content_hash, variant) for variant in audio_encoder.variants}
+    existing = {blob.content_hash: blob for blob in AudioBlob.objects.filter(content_hash__in=hashes.values())}
+    blobs = {variant: existing[content_hash] for variant, content_hash in hashes.items() if content_hash in existing}
+    
+    tmp_dir = Path(settings.MEDIA_ROOT) / 'audio' / 'blobs' / 'tmp'
+    outputs = {
+        variant: tmp_dir / f"{uuid.uuid4().hex}.{audio_encoder.extension(variant)}"
+        for variant in hashes if variant not in blobs
+    }
+    encoded = []
+    for variant in audio_encoder.encode_many(master.audio_file.path, outputs):
+        content_hash = hashes[variant]
+        relative_path = AudioBlob.path_for(content_hash, audio_encoder.extension(variant))
+        final_path = Path(settings.MEDIA_ROOT) / relative_path
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(outputs[variant], final_path)
         
-        target_languages = ['hi', 'ta', 'te', 'bn', 'kn']
-        if announcement.detected_language != 'en':
-            target_languages.append('en')
+        encoded.append(AudioBlob(
+            content_hash=content_hash,
+            audio_file=relative_path,
+            language_code=master.language_code,
+            duration_seconds=master.duration_seconds,
+            waveform_peaks=master.waveform_peaks,
+            tts_service=master.tts_service,
+            variant=variant,
+        ))
+        logger.info(f"Encoded {variant} variant of audio blob {master.content_hash[:12]}: {final_path}")
+    
+    if encoded:
+        # Another worker may have stored the same variant meanwhile; read back whichever row won
+        AudioBlob.objects.bulk_create(encoded, ignore_conflicts=True)
+        for blob in AudioBlob.objects.filter(content_hash__in=[blob.content_hash for blob in encoded]):
+            blobs[blob.variant] = blob
+    return blobs
+
+
+def link_audio_blobs(announcement, lang_code, translation, blobs, source_hash=''):
+    """
+    Point the announcement's AudioFiles for a language at the given blobs.
+    
+    The current rows are read once, new blob references are added in one
+    query and every variant is written in one upsert, inside a transaction.
+    
+    Args:
+        blobs: AudioBlobs to link, one per variant
+        source_hash: Fingerprint of what the audio was produced from
+    
+    Returns:
+        list: AudioFile per blob, in the same order
+    
+    Raises:
+        AudioBlob.DoesNotExist: If a blob was deleted by a concurrent release
+        (nothing is linked then)
+    """
+    replaced = []
+    with transaction.atomic():
+        existing = {
+            audio.variant: audio
+            for audio in AudioFile.objects.filter(
+                announcement=announcement,
+                language_code=lang_code,
+                variant__in=[blob.variant for blob in blobs]
+            ).select_related('blob')
+        }
+        acquired = []
+        for blob in blobs:
+            current = existing.get(blob.variant)
+            if current is None or current.blob_id != blob.id:
+                acquired.append(blob.id)
+                if current is not None and current.blob is not None:
+                    replaced.append(current.blob)
+        gone = AudioBlob.acquire_all(acquired)
+        if gone:
+            # Released and deleted since it was looked up; the caller stores it again
+            raise AudioBlob.DoesNotExist(f"Audio blob(s) {sorted(gone)} were deleted before they could be linked")
         
-        translations_dict = translator.translate_multiple(
-            announcement.text,
-            source_lang=announcement.detected_language,
-            target_languages=target_languages
+        audio_files = [
+            AudioFile(
+                announcement=announcement,
+                language_code=lang_code,
+                variant=blob.variant,
+                translation=translation,
+                audio_file=blob.audio_file.name,
+                blob=blob,
+                duration_seconds=blob.duration_seconds,
+                tts_service=blob.tts_service,
+                mime_type=audio_encoder.mime_type(blob.variant),
+                bitrate_kbps=audio_encoder.bitrate_kbps(blob.variant),
+                source_hash=source_hash,
+            )
+            for blob in blobs
+        ]
+        AudioFile.objects.bulk_create(
+            audio_files,
+            update_conflicts=True,
+            unique_fields=['announcement', 'language_code', 'variant'],
+            update_fields=[
+                'translation', 'audio_file', 'blob', 'duration_seconds',
+                'tts_service', 'mime_type', 'bitrate_kbps', 'source_hash',
+            ],
+        )
+    
+    # Releasing may delete a blob's file, so only do it once the new rows are committed
+    for blob in replaced:
+        blob.release()
+    return audio_files
+
+
+def get_texts_to_speak(announcement, lang_codes):
+    """
+    Text to synthesize for each language of an announcement, in one query.
+    
+    The original language speaks the announcement text; other languages
+    speak their translation, or the original text until one exists.
+    
+    Returns:
+        dict: Language code -> (text: str, translation: Translation or None)
+    """
+    translations = {
+        translation.language_code: translation
+        for translation in Translation.objects.filter(
+            announcement=announcement,
+            language_code__in=[lang for lang in lang_codes if lang != announcement.detected_language]
         )
+    }
+    texts = {}
+    for lang_code in lang_codes:
+        translation = translations.get(lang_code)
+        if translation is not None:
+            texts[lang_code] = (translation.translated_text, translation)
+        else:
+            texts[lang_code] = (announcement.text, None)
+    return texts
+
+
+def get_text_to_speak(announcement, lang_code):
+    """
+    Text to synthesize for one language of an announcement.
+    
+    Returns:
+        tuple: (text: str, translation: Translation or None)
+    """
+    return get_texts_to_speak(announcement, [lang_code])[lang_code]
+
+
+def audio_source_hash(text_to_speak, lang_code):
+    """Source hash an up-to-date AudioFile for this text carries"""
+    return content_fingerprint(text_to_speak, lang_code)
+
+
+def stale_audio_languages(announcement, texts):
+    """
+    Languages whose audio variants were not all made from the text to speak.
+    
+    Args:
+        texts: Language code -> (text, translation), as from get_texts_to_speak
+    
+    Returns:
+        list: Language codes needing synthesis, in the order given
+    """
+    expected = {audio_encoder.MASTER_VARIANT, *audio_encoder.variants}
+    current = defaultdict(set)
+    for lang_code, variant, source_hash in AudioFile.objects.filter(
+        announcement=announcement,
+        language_code__in=list(texts)
+    ).values_list('language_code', 'variant', 'source_hash'):
+        if source_hash == audio_source_hash(texts[lang_code][0], lang_code):
+            current[lang_code].add(variant)
+    return [lang for lang in texts if not expected <= current[lang]]
+
+
+def stale_translation_languages(announcement, target_languages):
+    """Target languages without a translation of the current text"""
+    current = set(Translation.objects.filter(
+        announcement=announcement,
+        language_code__in=target_languages,
+        source_hash=announcement.translation_source_hash()
+    ).values_list('language_code', flat=True))
+    return [lang for lang in target_languages if lang not in current]
+
+
+def generate_language_audio(announcement, lang_code):
+    """
+    Synthesize, store and publish the audio for one language of an announcement.
+    
+    Does nothing when the stored audio was already made from the current text.
+    
+    Args:
+        announcement: Announcement being processed
+        lang_code: Language to synthesize
+    
+    Returns:
+        bool: True if audio was generated or already current
+    """
+    try:
+        texts = get_texts_to_speak(announcement, [lang_code])
+        text_to_speak, translation = texts[lang_code]
+        if not stale_audio_languages(announcement, texts):
+            logger.info(f"Audio for {lang_code} of announcement {announcement.id} is up to date")
+            return True
         
-        for lang_code, translated_text in translations_dict.items():
-            if translated_text and translated_text.strip():
-                Translation.objects.update_or_create(
-                    announcement=announcement,
-                    language_code=lang_code,
-                    defaults={
-                        'translated_text': translated_text,
-                        'translation_service': 'gemini' if translator.is_available() else 'fallback'
-                    }
-                )
-            else:
-                Translation.objects.update_or_create(
-                    announcement=announcement,
-                    language_code=lang_code,
-                    defaults={
-                        'translated_text': announcement.text,
-                        'translation_service': 'fallback'
-                    }
+        for attempt in range(2):
+            blob = get_or_create_audio_blob(text_to_speak, lang_code)
+            if blob is None:
+                return False
+            
+            blobs = {audio_encoder.MASTER_VARIANT: blob}
+            blobs.update(get_or_create_variant_blobs(blob))
+            
+            try:
+                audio_files = link_audio_blobs(
+                    announcement, lang_code, translation, list(blobs.values()), audio_source_hash(text_to_speak, lang_code)
                 )
+                break
+            except AudioBlob.DoesNotExist as e:
+                # A shared blob lost its last other reference meanwhile; store it again
+                logger.info(f"{e}; storing {lang_code} audio again")
+        else:
+            return False
+        logger.info(f"Linked audio for {lang_code}: {', '.join(sorted(blobs))}")
         
-        all_languages = list(set([announcement.detected_language] + target_languages))
-        audio_generated = False
+        default_variant = getattr(settings, 'TTS_DEFAULT_AUDIO_VARIANT', 'mp3')
+        default_audio = next((audio for audio in audio_files if audio.variant == default_variant), audio_files[0])
+        publish_announcement_event(announcement.id, 'audio_ready', {
+            'language_code': lang_code,
+            'audio_url': default_audio.audio_file.url,
+            'duration_seconds': blob.duration_seconds,
+            'waveform_peaks': blob.waveform_peaks,
+            'variants': [audio.as_variant() for audio in audio_files],
+        })
+        return True
+    except Exception as e:
+        logger.warning(f"Error generating audio for {lang_code}: {e}")
+        return False
+
+
+def build_announcement_program(announcement):
+    """
+    Render (or reuse) the announcement's multilingual program and link it.
+    
+    The program is content-addressed by its parts, chime, gaps and encoding,
+    so announcements with identical audio share one file.
+    
+    Args:
+        announcement: Announcement whose per-language audio is ready
+    
+    Returns:
+        AudioFile or None if there is no audio to sequence
+    """
+    masters = {
+        audio.language_code: audio.blob
+        for audio in AudioFile.objects.filter(
+            announcement=announcement,
+            variant=audio_encoder.MASTER_VARIANT,
+            blob__isnull=False
+        ).exclude(language_code=AudioFile.PROGRAM_LANGUAGE).select_related('blob')
+    }
+    if not masters:
+        return None
+    
+    languages = program_renderer.order(masters)
+    content_hash = program_renderer.program_hash([masters[lang].content_hash for lang in languages])
+    for attempt in range(2):
+        blob = AudioBlob.objects.filter(content_hash=content_hash).first()
+        if blob is None:
+            relative_path = AudioBlob.path_for(content_hash, audio_encoder.extension(program_renderer.variant))
+            tmp_path = Path(settings.MEDIA_ROOT) / 'audio' / 'blobs' / 'tmp' / f"{uuid.uuid4().hex}.{audio_encoder.extension(program_renderer.variant)}"
+            duration = program_renderer.render([masters[lang].audio_file.path for lang in languages], tmp_path)
+            if duration is None:
+                return None
+            final_path = Path(settings.MEDIA_ROOT) / relative_path
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, final_path)
+            
+            blob, _ = AudioBlob.objects.get_or_create(
+                content_hash=content_hash,
+                defaults={
+                    'audio_file': relative_path,
+                    'language_code': AudioFile.PROGRAM_LANGUAGE,
+                    'duration_seconds': duration,
+                    'tts_service': 'program',
+                    'variant': program_renderer.variant,
+                }
+            )
+            logger.info(f"Rendered program for announcement {announcement.id} ({', '.join(languages)}): {final_path}")
         
-        for lang_code in all_languages:
+        try:
+            return link_audio_blobs(announcement, AudioFile.PROGRAM_LANGUAGE, None, [blob], content_hash)[0]
+        except AudioBlob.DoesNotExist as e:
+            # The shared program lost its last other reference meanwhile; render it again
+            logger.info(f"{e}; rendering the program again")
+    return None
+
+
+def detect_announcement_language(announcement):
+    """Detect and store the announcement's language unless it is known for the current text"""
+    fingerprint = announcement.current_fingerprint()
+    if not announcement.language_detected or not announcement.detected_language or announcement.content_hash != fingerprint:
+        detected_lang = language_detector.detect_language(announcement.text)
+        announcement.detected_language = detected_lang
+        announcement.language_detected = True
+        announcement.content_hash = fingerprint
+        announcement.save(update_fields=['detected_language', 'language_detected', 'content_hash', 'updated_at'])
+        logger.info(f"Detected language: {detected_lang} for announcement {announcement.id}")
+
+
+def get_target_languages(announcement):
+    """Languages to translate an announcement into"""
+    target_languages = ['hi', 'ta', 'te', 'bn', 'kn']
+    if announcement.detected_language != 'en':
+        target_languages.append('en')
+    return target_languages
+
+
+def translate_languages(announcement, target_languages):
+    """
+    Translate an announcement into the given languages and save the results.
+    
+    Languages already translated from the current text are skipped.
+    Recurring patterns are filled in locally; anything left goes to the
+    translation backends (through the cross-announcement batch when enabled).
+    """
+    target_languages = stale_translation_languages(announcement, target_languages)
+    if not target_languages:
+        return
+    
+    translations_dict = template_engine.translate_multiple_with_service(
+        announcement.text,
+        source_lang=announcement.detected_language,
+        target_languages=target_languages
+    )
+    save_translations(announcement, translations_dict)
+    
+    remaining_languages = [lang for lang in target_languages if lang not in translations_dict]
+    if remaining_languages:
+        # Concurrent announcements share one Gemini request when batching is on
+        backend = translation_batcher if getattr(settings, 'TRANSLATION_BATCH_ENABLED', False) else translator
+        save_translations(announcement, backend.translate_multiple_with_service(
+            announcement.text,
+            source_lang=announcement.detected_language,
+            target_languages=remaining_languages
+        ))
+
+
+def mark_announcement_failed(announcement_id, error):
+    Announcement.objects.filter(id=announcement_id).update(
+        status='failed',
+        error_message=str(error),
+        updated_at=timezone.now()
+    )
+
+
+@shared_task(bind=True, max_retries=3)
+def process_announcement(self, announcement_id):
+    """
+    Process an announcement: detect language, translate, generate audio.
+    
+    Under Celery this only starts the pipeline canvas:
+    detect -> chord(group(translate_language | synthesize_audio per language)) -> finalize,
+    so each language is synthesized as soon as its own translation is saved
+    and the languages spread across workers. Called directly (e.g.
+    process_pending --sync) every step runs inline.
+    
+    Args:
+        announcement_id: ID of the announcement to process
+    """
+    try:
+        announcement = Announcement.objects.get(id=announcement_id)
+        announcement.status = 'processing'
+        announcement.save(update_fields=['status', 'updated_at'])
+        
+        # Let boards subscribe to announcement_{id} before per-language results arrive
+        # (pre-rendered announcements stay off the boards until they are due)
+        if not is_held(announcement):
             try:
-                if lang_code == announcement.detected_language:
-                    text_to_speak = announcement.text
-                else:
-                    translation = Translation.objects.filter(
-                        announcement=announcement,
-                        language_code=lang_code
-                    ).first()
-                    if translation:
-                        text_to_speak = translation.translated_text
-                    else:
-                        text_to_speak = announcement.text
-                
-                audio_dir = Path(settings.MEDIA_ROOT) / 'audio' / timezone.now().strftime('%Y/%m/%d')
-                audio_dir.mkdir(parents=True, exist_ok=True)
-                audio_filename = f"announcement_{announcement_id}_{lang_code}.wav"
-                audio_path = audio_dir / audio_filename
-                
-                success, service_used = tts_service.generate_audio(
-                    text_to_speak,
-                    lang_code,
-                    str(audio_path)
-                )
-                
-                if success:
-                    duration = tts_service.get_audio_duration(str(audio_path))
-                    translation = Translation.objects.filter(
-                        announcement=announcement,
-                        language_code=lang_code
-                    ).first()
-                    
-                    AudioFile.objects.update_or_create(
-                        announcement=announcement,
-                        language_code=lang_code,
-                        defaults={
-                            'translation': translation,
-                            'audio_file': f"audio/{timezone.now().strftime('%Y/%m/%d')}/{audio_filename}",
-                            'duration_seconds': duration,
-                            'tts_service': service_used,
-                        }
-                    )
-                    logger.info(f"Generated audio for {lang_code}: {audio_path}")
-                    audio_generated = True
-                else:
-                    logger.warning(f"Failed to generate audio for {lang_code} - TTS service may not be available")
+                async_to_sync(get_channel_layer().group_send)('display_boards', {
+                    'type': 'announcement_processing',
+                    'announcement_id': announcement_id,
+                })
             except Exception as e:
-                logger.warning(f"Error generating audio for {lang_code}: {e}")
+                logger.warning(f"Could not announce processing of {announcement_id}: {e}")
         
-        announcement.status = 'completed'
-        announcement.save()
-        logger.info(f"Marked announcement {announcement_id} as completed")
+        if not self.request.called_directly:
+            detect_language.apply_async(args=[announcement_id], **lane_options(get_processing_lane(announcement)))
+            return f"Announcement {announcement_id} pipeline started"
         
-        notify_announcement_ready.delay(announcement_id)
+        # Synchronous run: every stage inline
+        detect_announcement_language(announcement)
+        target_languages = get_target_languages(announcement)
+        publish_announcement_event(announcement_id, 'translation_ready', {
+            'language_code': announcement.detected_language,
+            'text': announcement.text,
+            'translation_service': 'original',
+        })
+        target_languages = [lang for lang in target_languages if lang != announcement.detected_language]
+        translate_languages(announcement, target_languages)
+        for lang_code in [announcement.detected_language] + target_languages:
+            generate_language_audio(announcement, lang_code)
+        finalize_announcement(None, announcement_id)
         
         logger.info(f"Successfully processed announcement {announcement_id}")
         return f"Announcement {announcement_id} processed successfully"
-        
+    
     except Announcement.DoesNotExist:
         logger.error(f"Announcement {announcement_id} not found")
         return f"Announcement {announcement_id} not found"
     except Exception as e:
         logger.error(f"Error processing announcement {announcement_id}: {e}", exc_info=True)
-        announcement.status = 'failed'
-        announcement.error_message = str(e)
-        announcement.save()
+        mark_announcement_failed(announcement_id, e)
+        raise self.retry(exc=e, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def detect_language(self, announcement_id):
+    """
+    First pipeline stage: detect the language, then fan out per language.
+    
+    The task replaces itself with a chord whose header has one
+    translate_language | synthesize_audio chain per target language (the
+    original language is only synthesized) and whose body is
+    finalize_announcement. Languages whose translation and audio were
+    already made from the current text are left out, so re-queues and
+    edits that don't touch the text cost almost nothing.
+    
+    Args:
+        announcement_id: ID of the announcement
+    """
+    try:
+        announcement = Announcement.objects.get(id=announcement_id)
+        detect_announcement_language(announcement)
+    except Announcement.DoesNotExist:
+        logger.error(f"Announcement {announcement_id} not found")
+        return None
+    except Exception as e:
+        logger.error(f"Language detection failed for announcement {announcement_id}: {e}", exc_info=True)
+        mark_announcement_failed(announcement_id, e)
         raise self.retry(exc=e, countdown=60)
+    
+    # The original text is displayable right away
+    publish_announcement_event(announcement_id, 'translation_ready', {
+        'language_code': announcement.detected_language,
+        'text': announcement.text,
+        'translation_service': 'original',
+    })
+    
+    # Every stage stays in the announcement's lane (urgent work bypasses the backlog)
+    lane = get_processing_lane(announcement)
+    options = lane_options(lane)
+    tts_options = lane_options(lane, synthesize_audio)
+    target_languages = [lang for lang in get_target_languages(announcement) if lang != announcement.detected_language]
+    stale_translations = set(stale_translation_languages(announcement, target_languages))
+    
+    # Only languages whose translation or audio is stale or missing get tasks
+    per_language = [
+        chain(
+            translate_language.si(announcement_id, lang_code).set(**options),
+            synthesize_audio.si(announcement_id, lang_code).set(**tts_options),
+        )
+        for lang_code in target_languages if lang_code in stale_translations
+    ]
+    texts = get_texts_to_speak(announcement, [
+        lang for lang in [announcement.detected_language] + target_languages if lang not in stale_translations
+    ])
+    for lang_code in stale_audio_languages(announcement, texts):
+        per_language.append(synthesize_audio.si(announcement_id, lang_code).set(**tts_options))
+    
+    if not per_language:
+        logger.info(f"Announcement {announcement_id} is up to date; nothing to translate or synthesize")
+        raise self.replace(finalize_announcement.si(None, announcement_id).set(**options))
+    raise self.replace(chord(group(per_language), finalize_announcement.s(announcement_id).set(**options)))
+
+
+@shared_task(bind=True, max_retries=3)
+def translate_language(self, announcement_id, language_code):
+    """
+    Translate an announcement into one language and save it.
+    
+    Args:
+        announcement_id: ID of the announcement
+        language_code: Target language
+    """
+    try:
+        announcement = Announcement.objects.get(id=announcement_id)
+    except Announcement.DoesNotExist:
+        logger.error(f"Announcement {announcement_id} not found for translation")
+        return False
+    try:
+        translate_languages(announcement, [language_code])
+    except Exception as e:
+        logger.error(f"Translating announcement {announcement_id} to {language_code} failed: {e}", exc_info=True)
+        if self.request.retries >= self.max_retries:
+            # Speak the original text rather than leave the language out
+            save_translations(announcement, {language_code: (announcement.text, 'fallback')})
+            return False
+        raise self.retry(exc=e, countdown=10)
+    return True
+
+
+@shared_task
+def synthesize_audio(announcement_id, language_code):
+    """
+    Generate audio for one language of an announcement.
+    
+    Routed by language_code to a dedicated TTS queue (see TTS_LANGUAGE_QUEUES)
+    so each TTS worker only keeps its own languages' models warm.
+    
+    Args:
+        announcement_id: ID of the announcement
+        language_code: Language to synthesize
+    """
+    try:
+        announcement = Announcement.objects.get(id=announcement_id)
+    except Announcement.DoesNotExist:
+        logger.error(f"Announcement {announcement_id} not found for TTS")
+        return False
+    return generate_language_audio(announcement, language_code)
+
+
+@shared_task
+def finalize_announcement(results, announcement_id):
+    """
+    Render the multilingual program and mark an announcement completed
+    once all its audio tasks have finished.
+    
+    Args:
+        results: Per-language synthesis results (unused)
+        announcement_id: ID of the announcement
+    """
+    announcement = Announcement.objects.filter(id=announcement_id).first()
+    if announcement is not None and getattr(settings, 'TTS_PROGRAM_ENABLED', True):
+        try:
+            build_announcement_program(announcement)
+        except Exception as e:
+            logger.warning(f"Could not build program for announcement {announcement_id}: {e}")
+    
+    Announcement.objects.filter(id=announcement_id).update(status='completed', updated_at=timezone.now())
+    logger.info(f"Marked announcement {announcement_id} as completed")
+    
+    if announcement is None:
+        notify_announcement_ready.delay(announcement_id)
+    elif is_held(announcement):
+        # Rendered ahead of time: publish at the scheduled moment
+        notify_announcement_ready.apply_async(
+            args=[announcement_id],
+            eta=announcement.announcement_time,
+            **lane_options(get_processing_lane(announcement))
+        )
+        logger.info(f"Announcement {announcement_id} held until {announcement.announcement_time}")
+    else:
+        notify_announcement_ready.apply_async(args=[announcement_id], **lane_options(get_processing_lane(announcement)))
+
+
+@shared_task
+def warm_scheduled_announcements():
+    """
+    Start pre-rendering scheduled announcements whose window is opening.
+    
+    Run by celery beat every SCHEDULE_SWEEP_INTERVAL_SECONDS. Takes the
+    scheduled announcements that should start rendering before the next
+    sweep, earliest due first, at most SCHEDULE_WARM_BATCH_SIZE per sweep,
+    and spaces their start ETAs SCHEDULE_WARM_SPACING_SECONDS apart so a
+    backlog is rendered gradually instead of all at once.
+    """
+    now = timezone.now()
+    lead = getattr(settings, 'SCHEDULE_PRERENDER_LEAD_SECONDS', 600)
+    sweep_interval = getattr(settings, 'SCHEDULE_SWEEP_INTERVAL_SECONDS', 60)
+    spacing = timedelta(seconds=getattr(settings, 'SCHEDULE_WARM_SPACING_SECONDS', 5))
+    batch_size = getattr(settings, 'SCHEDULE_WARM_BATCH_SIZE', 20)
+    
+    candidates = Announcement.objects.filter(
+        status='scheduled',
+        announcement_time__lte=now + timedelta(seconds=lead + sweep_interval)
+    ).order_by('announcement_time')[:batch_size]
+    
+    next_slot = now
+    started = 0
+    for announcement in candidates:
+        # Claim the row so an overlapping sweep (or process_pending) does not queue it twice
+        if not Announcement.objects.filter(id=announcement.id, status='scheduled').update(status='queued', updated_at=now):
+            continue
+        # Never start later than the due time, even at the back of a backlog
+        eta = min(max(prerender_time(announcement), next_slot), announcement.announcement_time)
+        enqueue_announcement(announcement, eta=eta)
+        next_slot = max(next_slot, eta) + spacing
+        started += 1
+    
+    if started:
+        logger.info(f"Started pre-rendering {started} scheduled announcement(s)")
+    return started
+
+
+@shared_task
+def sweep_audio_blobs():
+    """
+    Delete audio blobs that were stored but never linked to an announcement.
+    
+    Run by celery beat. A blob is created before its reference is taken, so a
+    task that dies (or whose link fails) in between leaves it at ref_count 0;
+    blobs younger than AUDIO_BLOB_ORPHAN_GRACE_SECONDS are left alone since
+    their link may still be on its way.
+    """
+    grace = timedelta(seconds=getattr(settings, 'AUDIO_BLOB_ORPHAN_GRACE_SECONDS', 3600))
+    deleted = AudioBlob.delete_unreferenced(timezone.now() - grace)
+    if deleted:
+        logger.info(f"Deleted {deleted} unreferenced audio blob(s)")
+    return deleted
 
 
 @shared_task
@@ -153,19 +970,20 @@ def notify_announcement_ready(announcement_id):
         channel_layer = get_channel_layer()
         
         # Prepare announcement data
+        audio = AudioFile.audio_payload([announcement.id]).get(announcement.id, {})
         translations = {}
         for trans in announcement.translations.all():
             translations[trans.language_code] = {
                 'text': trans.translated_text,
-                'audio_url': None
+                'audio_url': None,
+                'audio_variants': [],
+                'waveform_peaks': None,
             }
-            # Get audio URL if available
-            audio = AudioFile.objects.filter(
-                announcement=announcement,
-                language_code=trans.language_code
-            ).first()
-            if audio:
-                translations[trans.language_code]['audio_url'] = audio.audio_file.url
+            # Get audio URLs if available
+            if trans.language_code in audio:
+                translations[trans.language_code]['audio_url'] = audio[trans.language_code]['audio_url']
+                translations[trans.language_code]['audio_variants'] = audio[trans.language_code]['variants']
+                translations[trans.language_code]['waveform_peaks'] = audio[trans.language_code]['waveform_peaks']
         
         message = {
             'type': 'announcement_ready',
@@ -175,6 +993,7 @@ def notify_announcement_ready(announcement_id):
                 'detected_language': announcement.detected_language,
                 'status': announcement.status,
                 'translations': translations,
+                'program': audio.get(AudioFile.PROGRAM_LANGUAGE),
                 'created_at': announcement.created_at.isoformat(),
             }
         }
@@ -186,7 +1005,7 @@ def notify_announcement_ready(announcement_id):
         )
         
         logger.info(f"Notified clients about announcement {announcement_id}")
-        
+    
     except Exception as e:
         logger.error(f"Error notifying about announcement {announcement_id}: {e}")
 
@@ -1,3 +1,698 @@
-from django.test import TestCase
+import contextlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from .models import Announcement, AudioBlob, AudioFile, Translation, content_fingerprint
+from .services import (
+    AnnouncementTemplate,
+    CircuitBreaker,
+    LanguageDetector,
+    Pyttsx3ProcessPool,
+    RateLimiter,
+    RedisMicroBatcher,
+    StubBackend,
+    TemplateEngine,
+    TranslationBackend,
+    TranslationBackendError,
+    TranslationCache,
+    Translator,
+)
 
-# Create your tests here.
+
+def reachable_redis_url():
+    """Redis URL for tests of the shared-state helpers (TEST_REDIS_URL), or None if it is not reachable"""
+    url = os.environ.get('TEST_REDIS_URL', 'redis://127.0.0.1:6379/15')
+    try:
+        import redis
+        redis.Redis.from_url(url, socket_timeout=1).ping()
+    except Exception:
+        return None
+    return url
+
+
+TEST_REDIS_URL = reachable_redis_url()
+requires_redis = unittest.skipUnless(TEST_REDIS_URL, 'Redis is not reachable (set TEST_REDIS_URL)')
+
+
+class ContentFingerprintTests(SimpleTestCase):
+    """Fingerprints decide whether stored translations and audio are still current"""
+    
+    def test_ignores_whitespace_differences(self):
+        self.assertEqual(
+            content_fingerprint('Train  12622 will arrive\n on platform 3 '),
+            content_fingerprint('Train 12622 will arrive on platform 3'),
+        )
+    
+    def test_normalizes_unicode(self):
+        # Precomposed 'é' vs. 'e' followed by a combining acute accent
+        self.assertEqual(content_fingerprint('caf\u00e9'), content_fingerprint('cafe\u0301'))
+    
+    def test_text_change_changes_fingerprint(self):
+        self.assertNotEqual(
+            content_fingerprint('Train 12622 will arrive on platform 3'),
+            content_fingerprint('Train 12622 will arrive on platform 4'),
+        )
+    
+    def test_parts_are_not_concatenated(self):
+        self.assertNotEqual(content_fingerprint('ab', 'c'), content_fingerprint('a', 'bc'))
+        self.assertNotEqual(content_fingerprint('text', 'hi'), content_fingerprint('text', 'ta'))
+    
+    def test_none_is_empty(self):
+        self.assertEqual(content_fingerprint(None), content_fingerprint(''))
+
+
+class StaleLanguageTests(TestCase):
+    """Only languages whose translation or audio predates the current text are redone"""
+    
+    def setUp(self):
+        self.announcement = Announcement.objects.create(
+            text='Train 12622 will arrive on platform 3',
+            detected_language='en',
+        )
+    
+    def test_translation_source_hash_covers_language(self):
+        source_hash = self.announcement.translation_source_hash()
+        self.announcement.detected_language = 'hi'
+        self.assertNotEqual(self.announcement.translation_source_hash(), source_hash)
+    
+    def test_stale_translation_languages(self):
+        from .tasks import stale_translation_languages
+        
+        Translation.objects.create(
+            announcement=self.announcement, language_code='hi', translated_text='...',
+            source_hash=self.announcement.translation_source_hash(),
+        )
+        Translation.objects.create(
+            announcement=self.announcement, language_code='ta', translated_text='...',
+            source_hash=content_fingerprint('An older text', 'en'),
+        )
+        Translation.objects.create(
+            announcement=self.announcement, language_code='te', translated_text='...',
+            source_hash='',
+        )
+        self.assertEqual(
+            stale_translation_languages(self.announcement, ['hi', 'ta', 'te', 'bn']),
+            ['ta', 'te', 'bn'],
+        )
+    
+    def test_edited_text_makes_translations_stale(self):
+        from .tasks import stale_translation_languages
+        
+        Translation.objects.create(
+            announcement=self.announcement, language_code='hi', translated_text='...',
+            source_hash=self.announcement.translation_source_hash(),
+        )
+        self.assertEqual(stale_translation_languages(self.announcement, ['hi']), [])
+        self.announcement.text = 'Train 12622 will arrive on platform 4'
+        self.assertEqual(stale_translation_languages(self.announcement, ['hi']), ['hi'])
+    
+    def _create_audio(self, lang_code, text, variants):
+        from .tasks import audio_source_hash
+        
+        for variant in variants:
+            AudioFile.objects.create(
+                announcement=self.announcement,
+                language_code=lang_code,
+                variant=variant,
+                audio_file=f'audio/test/{lang_code}.{variant}',
+                source_hash=audio_source_hash(text, lang_code),
+            )
+    
+    def test_stale_audio_languages(self):
+        from .tasks import audio_encoder, get_texts_to_speak, stale_audio_languages
+        
+        all_variants = [audio_encoder.MASTER_VARIANT, *audio_encoder.variants]
+        Translation.objects.create(
+            announcement=self.announcement, language_code='hi', translated_text='हिंदी पाठ',
+            source_hash=self.announcement.translation_source_hash(),
+        )
+        # Current audio in every variant
+        self._create_audio('en', self.announcement.text, all_variants)
+        # Audio made from the original text before the translation arrived
+        self._create_audio('hi', self.announcement.text, all_variants)
+        # Current text, but a variant is missing
+        self._create_audio('ta', self.announcement.text, all_variants[:1])
+        
+        texts = get_texts_to_speak(self.announcement, ['en', 'hi', 'ta', 'bn'])
+        self.assertEqual(texts['hi'][0], 'हिंदी पाठ')
+        self.assertEqual(texts['bn'][0], self.announcement.text)
+        self.assertEqual(stale_audio_languages(self.announcement, texts), ['hi', 'ta', 'bn'])
+
+
+class ProcessPendingTests(TestCase):
+    """process_pending claims pending rows in batches and queues or runs each exactly once"""
+    
+    def setUp(self):
+        from . import tasks
+        from .management.commands.process_pending import Command
+        
+        self.tasks = tasks
+        self.command = Command()
+        self.low = Announcement.objects.create(text='Platform 2 is closed for cleaning', priority=3)
+        self.high = Announcement.objects.create(text='Train 12622 is arriving on platform 3', priority=8)
+        self.normal = Announcement.objects.create(text='Train 12622 will depart from platform 1 at 6:05', priority=5)
+        
+        # No broker here: acquiring a producer yields whatever was passed in
+        producer = mock.patch.object(
+            tasks.process_announcement.app, 'producer_or_acquire',
+            side_effect=lambda producer=None: contextlib.nullcontext(producer),
+        )
+        producer.start()
+        self.addCleanup(producer.stop)
+    
+    def statuses(self):
+        return dict(Announcement.objects.values_list('id', 'status'))
+    
+    def test_claim_batch_takes_most_urgent_first(self):
+        claimed = self.command.claim_batch(2)
+        self.assertEqual([announcement.id for announcement in claimed], [self.high.id, self.normal.id])
+        self.assertEqual(self.statuses(), {self.high.id: 'processing', self.normal.id: 'processing', self.low.id: 'pending'})
+        self.assertEqual([announcement.id for announcement in self.command.claim_batch(2)], [self.low.id])
+        self.assertEqual(self.command.claim_batch(2), [])
+    
+    def test_claim_batch_skips_excluded_and_non_pending_rows(self):
+        Announcement.objects.filter(id=self.normal.id).update(status='queued')
+        claimed = self.command.claim_batch(10, claim_status='queued', exclude={self.high.id})
+        self.assertEqual([announcement.id for announcement in claimed], [self.low.id])
+        self.assertEqual(self.statuses()[self.high.id], 'pending')
+    
+    def test_enqueue_publishes_each_row_once(self):
+        with mock.patch.object(self.tasks.process_announcement, 'apply_async') as apply_async:
+            call_command('process_pending', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            [call.kwargs['args'] for call in apply_async.call_args_list],
+            [[self.high.id], [self.normal.id], [self.low.id]],
+        )
+        self.assertEqual(set(self.statuses().values()), {'queued'})
+    
+    def test_broker_down_stops_the_run(self):
+        with mock.patch.object(self.tasks.process_announcement, 'apply_async', side_effect=ConnectionError('broker down')) as apply_async:
+            call_command('process_pending', batch_size=2, stdout=StringIO())
+        # The whole first batch was refused, so the same rows are not claimed over and over
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(set(self.statuses().values()), {'pending'})
+    
+    def test_refused_row_is_not_retried_in_the_same_run(self):
+        def publish(args=None, **kwargs):
+            if args == [self.high.id]:
+                raise ConnectionError('message refused')
+            return mock.Mock()
+        
+        with mock.patch.object(self.tasks.process_announcement, 'apply_async', side_effect=publish) as apply_async:
+            call_command('process_pending', batch_size=2, stdout=StringIO())
+        self.assertEqual(apply_async.call_count, 3)
+        self.assertEqual(self.statuses(), {self.high.id: 'pending', self.normal.id: 'queued', self.low.id: 'queued'})
+    
+    @override_settings(SCHEDULE_USE_BEAT=True)
+    def test_far_future_announcement_is_parked(self):
+        Announcement.objects.filter(id=self.low.id).update(announcement_time=timezone.now() + timedelta(hours=2))
+        with mock.patch.object(self.tasks.process_announcement, 'apply_async') as apply_async:
+            call_command('process_pending', stdout=StringIO())
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(self.statuses()[self.low.id], 'scheduled')
+    
+    def test_sync_runs_each_row_inline(self):
+        with mock.patch('announcements.management.commands.process_pending.process_announcement') as process:
+            call_command('process_pending', sync=True, batch_size=2, stdout=StringIO())
+        self.assertEqual([call.args[0] for call in process.call_args_list], [self.high.id, self.normal.id, self.low.id])
+        self.assertEqual(set(self.statuses().values()), {'processing'})
+
+
+class RecordingBatcher(RedisMicroBatcher):
+    """Micro-batcher that doubles each job's number and records the batches it processed"""
+    
+    def __init__(self, delay=0, fail=False, **kwargs):
+        self.KEY_PREFIX = f'test_batch:{uuid.uuid4().hex}'
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        super().__init__(redis_url=TEST_REDIS_URL, **kwargs)
+    
+    def process_batch(self, group, jobs):
+        self.batches.append([job['n'] for job in jobs])
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('backend down')
+        return {job['id']: job['n'] * 2 for job in jobs}
+
+
+@requires_redis
+class MicroBatcherTests(SimpleTestCase):
+    """Concurrent submitters share batches, and no submitter waits for a result that never comes"""
+    
+    def make_batcher(self, **kwargs):
+        batcher = RecordingBatcher(**kwargs)
+        self.addCleanup(lambda: [batcher.redis.delete(key) for key in batcher.redis.scan_iter(f'{batcher.KEY_PREFIX}:*')])
+        return batcher
+    
+    def submit_concurrently(self, batcher, count):
+        results = {}
+        threads = [
+            threading.Thread(target=lambda n=n: results.__setitem__(n, batcher.submit({'n': n}, group='en')))
+            for n in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def test_concurrent_jobs_share_one_batch(self):
+        batcher = self.make_batcher(window_ms=2000, max_size=4, max_wait=10)
+        started = time.monotonic()
+        results = self.submit_concurrently(batcher, 4)
+        self.assertEqual(results, {0: 0, 1: 2, 2: 4, 3: 6})
+        self.assertEqual([sorted(batch) for batch in batcher.batches], [[0, 1, 2, 3]])
+        # The size cap flushes before the window ends
+        self.assertLess(time.monotonic() - started, 2)
+    
+    def test_failed_batch_answers_every_job(self):
+        batcher = self.make_batcher(fail=True, window_ms=50, max_size=4, max_wait=10)
+        started = time.monotonic()
+        results = self.submit_concurrently(batcher, 3)
+        self.assertEqual(results, {0: None, 1: None, 2: None})
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(batcher.redis.llen(batcher._key('queue', 'en')), 0)
+    
+    def test_untaken_job_is_withdrawn_on_timeout(self):
+        batcher = self.make_batcher(window_ms=50, max_size=4, max_wait=0.5)
+        # Someone else holds the flush lock and never flushes
+        batcher.redis.set(batcher._key('lock', 'en'), 'elsewhere', px=60000)
+        self.assertIsNone(batcher.submit({'n': 1}, group='en'))
+        self.assertEqual(batcher.batches, [])
+        self.assertEqual(batcher.redis.llen(batcher._key('queue', 'en')), 0)
+    
+    def test_taken_job_waits_for_a_slow_flush(self):
+        batcher = self.make_batcher(delay=1.5, window_ms=50, max_size=4, max_wait=0.5, flush_timeout=5)
+        results = self.submit_concurrently(batcher, 2)
+        # Both jobs came back from the one slow flush instead of being processed again
+        self.assertEqual(results, {0: 0, 1: 2})
+        self.assertEqual(sum(len(batch) for batch in batcher.batches), 2)
+
+
+class FlakyBackend(TranslationBackend):
+    """Batch-capable backend whose batch request returns only `batch_languages` (or fails if None)"""
+    
+    name = 'flaky'
+    supports_batch = True
+    
+    def __init__(self, batch_languages=None):
+        super().__init__(timeout=1, breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60))
+        self.batch_languages = batch_languages
+        self.batch_calls = 0
+        self.single_calls = []
+    
+    def translate_batch(self, text, source_lang, target_languages):
+        self.batch_calls += 1
+        if self.batch_languages is None:
+            raise TranslationBackendError('timed out')
+        return {lang: f'<{lang}> {text}' for lang in target_languages if lang in self.batch_languages}
+    
+    def translate(self, text, source_lang, target_lang):
+        self.single_calls.append(target_lang)
+        return f'<{target_lang}> {text}'
+
+
+@override_settings(TRANSLATION_CACHE_ENABLED=False)
+class TranslatorFailoverTests(SimpleTestCase):
+    """A failed backend is left at once instead of being asked once per language"""
+    
+    def test_failed_batch_moves_to_next_backend(self):
+        flaky = FlakyBackend()
+        translator = Translator(backends=[flaky, StubBackend()])
+        results = translator.translate_multiple_with_service('Platform 2 is closed', 'en', ['hi', 'ta', 'te'])
+        self.assertEqual(flaky.batch_calls, 1)
+        self.assertEqual(flaky.single_calls, [])
+        self.assertEqual({service for _, service in results.values()}, {'stub'})
+    
+    def test_languages_missing_from_a_batch_are_requested_singly(self):
+        flaky = FlakyBackend(batch_languages={'hi', 'ta'})
+        translator = Translator(backends=[flaky, StubBackend()])
+        results = translator.translate_multiple_with_service('Platform 2 is closed', 'en', ['hi', 'ta', 'te'])
+        self.assertEqual(flaky.single_calls, ['te'])
+        self.assertEqual({service for _, service in results.values()}, {'flaky'})
+
+
+class AudioBlobRefCountTests(TestCase):
+    """Shared audio is deleted with its last reference, never under a live AudioFile"""
+    
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        
+        self.first = Announcement.objects.create(text='Train 12622 will arrive on platform 3')
+        self.second = Announcement.objects.create(text='Train 12622 will arrive on platform 3')
+    
+    def make_blob(self, content_hash='a' * 64, **fields):
+        name = default_storage.save(AudioBlob.path_for(content_hash), ContentFile(b'RIFF'))
+        return AudioBlob.objects.create(
+            content_hash=content_hash, audio_file=name, language_code='en', tts_service='pyttsx3', **fields
+        )
+    
+    def link(self, announcement, blob):
+        from .tasks import link_audio_blobs
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            return link_audio_blobs(announcement, 'en', None, [blob])[0]
+    
+    def test_shared_blob_outlives_all_but_its_last_reference(self):
+        blob = self.make_blob()
+        first_audio = self.link(self.first, blob)
+        self.link(self.second, blob)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            first_audio.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(blob.audio_file.storage.exists(blob.audio_file.name))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.audio_files.all().delete()
+        self.assertFalse(AudioBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(blob.audio_file.storage.exists(blob.audio_file.name))
+    
+    def test_relinking_the_same_blob_takes_no_extra_reference(self):
+        blob = self.make_blob()
+        self.link(self.first, blob)
+        self.link(self.first, blob)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+    
+    def test_deleted_blob_is_not_linked(self):
+        blob = self.make_blob()
+        AudioBlob.objects.filter(pk=blob.pk).delete()
+        self.assertEqual(AudioBlob.acquire_all([blob.pk]), {blob.pk})
+        with self.assertRaises(AudioBlob.DoesNotExist):
+            self.link(self.first, blob)
+        self.assertFalse(self.first.audio_files.exists())
+    
+    def test_sweep_deletes_only_old_unlinked_blobs(self):
+        from .tasks import sweep_audio_blobs
+        
+        old = timezone.now() - timedelta(hours=2)
+        orphan = self.make_blob('b' * 64, created_at=old)
+        linked = self.make_blob('c' * 64, created_at=old)
+        self.link(self.first, linked)
+        fresh = self.make_blob('d' * 64)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep_audio_blobs(), 1)
+        self.assertEqual(set(AudioBlob.objects.values_list('pk', flat=True)), {linked.pk, fresh.pk})
+        self.assertFalse(orphan.audio_file.storage.exists(orphan.audio_file.name))
+
+
+class AnnouncementTemplateTests(SimpleTestCase):
+    """Slot matching for recurring announcement patterns"""
+    
+    def test_match_extracts_slots(self):
+        template = AnnouncementTemplate('arrival', TemplateEngine.DEFAULT_TEMPLATES['arrival'])
+        self.assertEqual(
+            template.match('Train 12622 Tamil Nadu Express will arrive on platform 3 at 10:30'),
+            {'train_number': '12622', 'train_name': 'Tamil Nadu Express', 'platform': '3', 'time': '10:30'},
+        )
+    
+    def test_optional_slot_may_be_missing(self):
+        template = AnnouncementTemplate('arrival', TemplateEngine.DEFAULT_TEMPLATES['arrival'])
+        self.assertEqual(
+            template.match('train 12622 will arrive on platform 3 at 10:30.'),
+            {'train_number': '12622', 'train_name': '', 'platform': '3', 'time': '10:30'},
+        )
+    
+    def test_no_match(self):
+        template = AnnouncementTemplate('arrival', TemplateEngine.DEFAULT_TEMPLATES['arrival'])
+        self.assertIsNone(template.match('Passengers are requested to keep their luggage with them'))
+        self.assertIsNone(template.match('Train 12622 will arrive on platform 3 at 10:30 and then depart'))
+    
+    def test_fill_and_validation(self):
+        template = AnnouncementTemplate('delay', TemplateEngine.DEFAULT_TEMPLATES['delay'])
+        slots = template.match('Train 12622 is running late by 45 minutes')
+        self.assertEqual(slots['delay_minutes'], '45')
+        self.assertTrue(template.is_valid_translation('ट्रेन {train_number} {train_name} {delay_minutes} मिनट देरी से है'))
+        self.assertFalse(template.is_valid_translation('ट्रेन {train_number} देरी से है'))
+        self.assertEqual(
+            template.fill('ट्रेन {train_number} {train_name} {delay_minutes} मिनट देरी से है', slots),
+            'ट्रेन 12622 45 मिनट देरी से है',
+        )
+    
+    def test_engine_picks_matching_template(self):
+        engine = TemplateEngine(templates=TemplateEngine.DEFAULT_TEMPLATES)
+        template, slots = engine.match('Train 12622 will depart from platform 1A at 6:05 PM')
+        self.assertEqual(template.name, 'departure')
+        self.assertEqual(slots['platform'], '1A')
+        self.assertEqual(slots['time'], '6:05 PM')
+        self.assertEqual(engine.match('Welcome to the station'), (None, None))
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Failing translation backends are skipped until a probe succeeds"""
+    
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+    
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_probe_closes_after_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker.opened_at = time.monotonic() - 61
+        self.assertTrue(breaker.allow(probe=lambda: True))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+    
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker.opened_at = time.monotonic() - 61
+        
+        def probe():
+            raise ConnectionError('still down')
+        
+        self.assertFalse(breaker.allow(probe=probe))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow(probe=lambda: True))
+
+
+class ClassifyScriptTests(SimpleTestCase):
+    """Indic scripts are recognized from their Unicode block without langdetect"""
+    
+    def test_indic_scripts(self):
+        self.assertEqual(LanguageDetector.classify_script('यात्रीगण कृपया ध्यान दें'), 'hi')
+        self.assertEqual(LanguageDetector.classify_script('যাত্রীগণ দয়া করে শুনুন'), 'bn')
+        self.assertEqual(LanguageDetector.classify_script('பயணிகள் கவனத்திற்கு'), 'ta')
+        self.assertEqual(LanguageDetector.classify_script('ప్రయాణికుల దృష్టికి'), 'te')
+        self.assertEqual(LanguageDetector.classify_script('ಪ್ರಯಾಣಿಕರ ಗಮನಕ್ಕೆ'), 'kn')
+    
+    def test_digits_and_latin_words_do_not_override_script(self):
+        self.assertEqual(LanguageDetector.classify_script('गाड़ी संख्या 12622 प्लेटफॉर्म 3 पर आएगी'), 'hi')
+    
+    def test_latin_and_mixed_text_left_to_langdetect(self):
+        self.assertIsNone(LanguageDetector.classify_script('Train will arrive on platform 3'))
+        self.assertIsNone(LanguageDetector.classify_script('Chennai Express ट्रेन'))
+    
+    def test_no_letters_is_english(self):
+        self.assertEqual(LanguageDetector.classify_script('12622 10:30'), 'en')
+        self.assertEqual(LanguageDetector.classify_script(''), 'en')
+
+
+class RateLimiterTests(SimpleTestCase):
+    """Requests and tokens are both rationed; the wait until quota frees up is reported"""
+    
+    def make_limiter(self, **kwargs):
+        # An unreachable Redis URL exercises the in-process fallback
+        return RateLimiter(redis_url='redis://127.0.0.1:1/0', **kwargs)
+    
+    def test_request_quota(self):
+        limiter = self.make_limiter(requests_per_minute=2, tokens_per_minute=1000)
+        self.assertEqual(limiter.try_acquire(), 0)
+        self.assertEqual(limiter.try_acquire(), 0)
+        self.assertAlmostEqual(limiter.try_acquire(), 30, delta=1)
+    
+    def test_token_quota(self):
+        limiter = self.make_limiter(requests_per_minute=100, tokens_per_minute=100)
+        self.assertEqual(limiter.try_acquire(80), 0)
+        self.assertAlmostEqual(limiter.try_acquire(80), 36, delta=1)
+        # A denied request takes nothing, so a smaller one still fits
+        self.assertEqual(limiter.try_acquire(20), 0)
+    
+    def test_acquire_gives_up_at_timeout(self):
+        limiter = self.make_limiter(requests_per_minute=1, tokens_per_minute=1000)
+        self.assertTrue(limiter.acquire(timeout=0.1))
+        started = time.monotonic()
+        self.assertFalse(limiter.acquire(timeout=0.1))
+        self.assertLess(time.monotonic() - started, 1)
+    
+    @requires_redis
+    def test_workers_share_one_bucket(self):
+        key = f'test-{uuid.uuid4().hex}'
+        first = RateLimiter(requests_per_minute=2, tokens_per_minute=1000, redis_url=TEST_REDIS_URL, key=key)
+        second = RateLimiter(requests_per_minute=2, tokens_per_minute=1000, redis_url=TEST_REDIS_URL, key=key)
+        self.assertIsNotNone(first._script)
+        self.assertEqual(first.try_acquire(), 0)
+        self.assertEqual(second.try_acquire(), 0)
+        self.assertGreater(first.try_acquire(), 0)
+        self.assertGreater(second.try_acquire(), 0)
+
+
+@override_settings(
+    SERVICE_STATS_REDIS_URL=None,
+    TRANSLATION_CACHE_ALIAS=None,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'translations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'translation-cache-tests'},
+    },
+)
+class TranslationCacheTests(SimpleTestCase):
+    """Repeats are answered from the in-process LRU first, then from the shared tier"""
+    
+    def setUp(self):
+        from django.core.cache import caches
+        caches['translations'].clear()
+    
+    def test_lru_evicts_least_recently_used(self):
+        cache = TranslationCache(max_entries=2)
+        cache.set('Platform 1', 'en', 'hi', 'प्लेटफॉर्म 1')
+        cache.set('Platform 2', 'en', 'hi', 'प्लेटफॉर्म 2')
+        cache.get('Platform 1', 'en', 'hi')
+        cache.set('Platform 3', 'en', 'hi', 'प्लेटफॉर्म 3')
+        self.assertIsNone(cache.get('Platform 2', 'en', 'hi'))
+        self.assertEqual(cache.get('Platform 1', 'en', 'hi'), 'प्लेटफॉर्म 1')
+        self.assertEqual(cache.stats()['evictions'], 1)
+    
+    def test_shared_tier_answers_another_worker(self):
+        TranslationCache(cache_alias='translations').set_many('Platform 2', 'en', {'hi': 'प्लेटफॉर्म 2', 'ta': 'நடைமேடை 2'})
+        other = TranslationCache(cache_alias='translations')
+        self.assertEqual(other.get_many('Platform 2', 'en', ['hi', 'ta', 'te']), {'hi': 'प्लेटफॉर्म 2', 'ta': 'நடைமேடை 2'})
+        # Shared hits are kept in the worker's own tier
+        other.get_many('Platform 2', 'en', ['hi', 'ta'])
+        stats = other.stats()
+        self.assertEqual((stats['shared_hits'], stats['memory_hits'], stats['misses']), (2, 2, 1))
+    
+    def test_key_ignores_whitespace_and_keeps_direction(self):
+        cache = TranslationCache()
+        cache.set('Platform  2\n', 'en', 'hi', 'प्लेटफॉर्म 2')
+        self.assertEqual(cache.get(' Platform 2', 'en', 'hi'), 'प्लेटफॉर्म 2')
+        self.assertIsNone(cache.get('Platform 2', 'auto', 'hi'))
+        self.assertIsNone(cache.get('Platform 2', 'en', 'ta'))
+    
+    def test_blank_translations_are_not_stored(self):
+        cache = TranslationCache(cache_alias='translations')
+        cache.set_many('Platform 2', 'en', {'hi': '  ', 'ta': ''})
+        cache.clear()
+        self.assertEqual(cache.get_many('Platform 2', 'en', ['hi', 'ta']), {})
+    
+    def test_shared_tier_failure_is_a_miss(self):
+        cache = TranslationCache(cache_alias='translations')
+        with mock.patch.object(cache._shared, 'get_many', side_effect=ConnectionError('redis down')):
+            self.assertEqual(cache.get_many('Platform 2', 'en', ['hi']), {})
+
+
+# Speaks nothing: writes an empty file per job, or hangs on the text 'hang'
+FAKE_PYTTSX3_WORKER = '''
+import json, sys, time
+for line in sys.stdin:
+    job = json.loads(line)
+    if job['text'] == 'hang':
+        time.sleep(60)
+    open(job['output_path'], 'w').close()
+    print(json.dumps({'id': job['id'], 'success': True}), flush=True)
+'''
+
+
+class Pyttsx3ProcessPoolTests(SimpleTestCase):
+    """A hung pyttsx3 process is killed at the timeout and replaced for the next job"""
+    
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.workdir = workdir.name
+        worker_script = os.path.join(self.workdir, 'worker.py')
+        with open(worker_script, 'w') as f:
+            f.write(FAKE_PYTTSX3_WORKER)
+        
+        self.pool = Pyttsx3ProcessPool(size=1, timeout=1)
+        self.pool.WORKER_SCRIPT = worker_script
+        self.addCleanup(self.pool.shutdown)
+    
+    def synthesize(self, text):
+        return self.pool.synthesize(text, os.path.join(self.workdir, f'{uuid.uuid4().hex}.wav'), 150, 1.0)
+    
+    def test_process_is_reused(self):
+        self.assertTrue(self.synthesize('Platform 2'))
+        self.assertTrue(self.synthesize('Platform 3'))
+        stats = self.pool.stats()
+        self.assertEqual((stats['jobs'], stats['running'], stats['restarts']), (2, 1, 0))
+    
+    def test_hung_job_times_out_and_process_is_replaced(self):
+        self.assertTrue(self.synthesize('Platform 2'))
+        process = next(iter(self.pool._processes))
+        started = time.monotonic()
+        self.assertFalse(self.synthesize('hang'))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertIsNotNone(process.poll())
+        stats = self.pool.stats()
+        self.assertEqual((stats['timeouts'], stats['restarts'], stats['running']), (1, 1, 0))
+        
+        self.assertTrue(self.synthesize('Platform 3'))
+        self.assertNotIn(process, self.pool._processes)
+        self.assertEqual(self.pool.stats()['running'], 1)
+    
+    def test_dead_idle_process_is_replaced(self):
+        self.assertTrue(self.synthesize('Platform 2'))
+        process = next(iter(self.pool._processes))
+        process.kill()
+        process.wait()
+        self.assertTrue(self.synthesize('Platform 3'))
+        self.assertEqual(self.pool.stats()['restarts'], 1)
+
+
+class LaneOptionsTests(SimpleTestCase):
+    """Urgent work skips the backlog without leaving the language-affine TTS queues"""
+    
+    PROCESSING_LANES = {
+        'urgent': {'queue': 'urgent', 'priority': 0},
+        'normal': {'queue': None, 'priority': 6},
+    }
+    
+    def test_urgent_stages_use_the_urgent_queue(self):
+        from .tasks import lane_options, synthesize_audio, translate_language
+        
+        with self.settings(PROCESSING_LANES=self.PROCESSING_LANES, TTS_DEDICATED_QUEUES=False):
+            self.assertEqual(lane_options('urgent', translate_language)['queue'], 'urgent')
+            self.assertEqual(lane_options('urgent', synthesize_audio)['queue'], 'urgent')
+            self.assertNotIn('queue', lane_options('normal'))
+    
+    def test_urgent_tts_stays_on_its_language_queue(self):
+        from railannounce.celery import route_task
+        from .tasks import lane_options, synthesize_audio
+        
+        with self.settings(PROCESSING_LANES=self.PROCESSING_LANES, TTS_DEDICATED_QUEUES=True, TTS_LANGUAGE_QUEUES={'ta': 'tts_south'}):
+            options = lane_options('urgent', synthesize_audio)
+            self.assertNotIn('queue', options)
+            self.assertEqual(options['priority'], 0)
+            self.assertEqual(route_task(synthesize_audio.name, [1, 'ta'], {}, options), {'queue': 'tts_south'})
+            self.assertEqual(lane_options('urgent')['queue'], 'urgent')
@@ -21,5 +21,8 @@ urlpatterns = [
     path('announcement/<int:announcement_id>/delete/', views.delete_announcement_now, name='delete_announcement'),
     path('api/announcement/<int:announcement_id>/status/', views.api_announcement_status, name='api_announcement_status'),
     path('api/announcement/create/', views.api_create_announcement, name='api_create_announcement'),
+    path('api/metrics/queue-wait/', views.api_queue_metrics, name='api_queue_metrics'),
+    path('api/metrics/translation/', views.api_translation_metrics, name='api_translation_metrics'),
+    path('api/announcement/<int:announcement_id>/stream/<str:language_code>/', views.api_announcement_audio_stream, name='api_announcement_audio_stream'),
 ]
 
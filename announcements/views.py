@@ -2,9 +2,10 @@
 Views for RailAnnounce application
 """
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.mail import send_mail
@@ -13,16 +14,44 @@ from django.template.loader import render_to_string
 import json
 import logging
 from django.utils import timezone
+from django.db.models import F
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
-from .models import Announcement, Translation, AudioFile, DisplayBoard
-from .tasks import process_announcement, delete_announcement_after_delay
+from .models import Announcement, Translation, AudioFile, DisplayBoard, content_fingerprint
+from .tasks import (
+    enqueue_announcement, delete_announcement_after_delay, get_texts_to_speak, queue_metrics,
+    stale_audio_languages, template_engine, translator, tts_service,
+)
 from .services import LanguageDetector
 
 language_detector = LanguageDetector()
 
 
+def parse_announcement_time(value):
+    """
+    Parse a submitted announcement_time into an aware datetime.
+    
+    datetime-local inputs carry no offset; they are taken as local (TIME_ZONE) time.
+    
+    Returns:
+        datetime or None if value is empty
+    
+    Raises:
+        ValueError: If the value is not a valid date and time
+    """
+    from django.utils.dateparse import parse_datetime
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid announcement time: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
 def home(request):
     """Home page"""
     return render(request, 'announcements/home.html')
@@ -105,10 +134,11 @@ def create_announcement(request):
             return redirect('announcements:create_announcement')
         
         # Parse datetime if provided
-        from django.utils.dateparse import parse_datetime
-        parsed_time = None
-        if announcement_time:
-            parsed_time = parse_datetime(announcement_time)
+        try:
+            parsed_time = parse_announcement_time(announcement_time)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('announcements:create_announcement')
         
         # Create announcement
         announcement = Announcement.objects.create(
@@ -120,6 +150,8 @@ def create_announcement(request):
             location=location,
             contact_no=contact_no,
             detected_language=language_detector.detect_language(text),
+            language_detected=True,
+            content_hash=content_fingerprint(text),
             priority=priority,
             created_by=request.user if request.user.is_authenticated else None,
             status='pending',
@@ -197,8 +229,8 @@ RailAnnounce System
         else:
             messages.success(request, f'Announcement #{announcement.id} created and is being processed')
         
-        # Start async processing
-        process_announcement.delay(announcement.id)
+        # Start async processing in the announcement's priority lane
+        enqueue_announcement(announcement)
         
         return redirect('announcements:announcement_detail', announcement_id=announcement.id)
     
@@ -213,8 +245,11 @@ RailAnnounce System
 def announcement_detail(request, announcement_id):
     """View announcement details"""
     announcement = get_object_or_404(Announcement, id=announcement_id)
-    translations = announcement.translations.all()
-    audio_files = announcement.audio_files.all()
+    translations = list(announcement.translations.all())
+    # Lowest bitrate first so browsers pick the smallest source they can play
+    audio_files = list(announcement.audio_files.order_by(F('bitrate_kbps').asc(nulls_last=True)))
+    for translation in translations:
+        translation.audio_variants = [audio for audio in audio_files if audio.language_code == translation.language_code]
     
     context = {
         'announcement': announcement,
@@ -248,13 +283,18 @@ def display_board(request, board_id=None):
     # Order by: completed first, then by priority and date
     from django.db.models import Case, When, IntegerField
     
+    # Scheduled announcements appear when they are due
     announcements = Announcement.objects.filter(
         is_active=True
-    ).exclude(status='failed').annotate(
+    ).exclude(
+        status__in=['failed', 'scheduled']
+    ).exclude(
+        announcement_time__gt=timezone.now()
+    ).annotate(
         status_order=Case(
             When(status='completed', then=1),
             When(status='processing', then=2),
-            When(status='pending', then=3),
+            When(status__in=['pending', 'queued'], then=3),
             default=4,
             output_field=IntegerField()
         )
@@ -272,18 +312,20 @@ def api_announcement_status(request, announcement_id):
     """API endpoint to check announcement status"""
     announcement = get_object_or_404(Announcement, id=announcement_id)
     
+    audio = AudioFile.audio_payload([announcement.id]).get(announcement.id, {})
     translations = {}
     for trans in announcement.translations.all():
         translations[trans.language_code] = {
             'text': trans.translated_text,
-            'audio_url': None
+            'audio_url': None,
+            'audio_variants': [],
+            'waveform_peaks': None,
+            'stream_url': reverse('announcements:api_announcement_audio_stream', args=[announcement.id, trans.language_code]),
         }
-        audio = AudioFile.objects.filter(
-            announcement=announcement,
-            language_code=trans.language_code
-        ).first()
-        if audio:
-            translations[trans.language_code]['audio_url'] = audio.audio_file.url
+        if trans.language_code in audio:
+            translations[trans.language_code]['audio_url'] = audio[trans.language_code]['audio_url']
+            translations[trans.language_code]['audio_variants'] = audio[trans.language_code]['variants']
+            translations[trans.language_code]['waveform_peaks'] = audio[trans.language_code]['waveform_peaks']
     
     return JsonResponse({
         'id': announcement.id,
@@ -291,10 +333,82 @@ def api_announcement_status(request, announcement_id):
         'detected_language': announcement.detected_language,
         'status': announcement.status,
         'translations': translations,
+        'program': audio.get(AudioFile.PROGRAM_LANGUAGE),
         'created_at': announcement.created_at.isoformat(),
     })
 
 
+@require_http_methods(["GET"])
+def api_announcement_audio_stream(request, announcement_id, language_code):
+    """
+    Stream speech for one language, sentence by sentence, while it is synthesized.
+    
+    Boards can start playing the first sentence of a long announcement
+    before the rest has been rendered. Once the language's audio has been
+    generated from the current text, the stored file is served instead.
+    """
+    announcement = get_object_or_404(Announcement, id=announcement_id)
+    if language_code not in settings.SUPPORTED_LANGUAGES:
+        return JsonResponse({'error': 'Unsupported language'}, status=400)
+    
+    texts = get_texts_to_speak(announcement, [language_code])
+    if not stale_audio_languages(announcement, texts):
+        stored = {
+            audio.variant: audio
+            for audio in AudioFile.objects.filter(announcement=announcement, language_code=language_code)
+        }
+        audio = stored.get(getattr(settings, 'TTS_DEFAULT_AUDIO_VARIANT', 'mp3')) or stored.get('wav')
+        if audio is not None:
+            return redirect(audio.audio_file.url)
+    
+    text, _ = texts[language_code]
+    response = StreamingHttpResponse(
+        stream_in_thread(tts_service.stream_audio(text, language_code)),
+        content_type='audio/wav'
+    )
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+    return response
+
+
+async def stream_in_thread(chunks):
+    """
+    Drive a blocking chunk generator from worker threads, one chunk at a time.
+    
+    The ASGI handler reads a sync iterator to the end before sending
+    anything; an async iterator lets each chunk go out as soon as it is made.
+    """
+    done = object()
+    try:
+        while True:
+            chunk = await sync_to_async(next, thread_sensitive=False)(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Client went away (or finished): stop synthesizing and clean up temp files
+        try:
+            await sync_to_async(chunks.close, thread_sensitive=False)()
+        except ValueError:
+            # Still running a sentence in its thread; the generator cleans up when collected
+            pass
+
+
+@require_http_methods(["GET"])
+def api_queue_metrics(request):
+    """API endpoint with queue wait time statistics per processing lane"""
+    return JsonResponse({'lanes': queue_metrics.summary(settings.PROCESSING_LANES)})
+
+
+@require_http_methods(["GET"])
+def api_translation_metrics(request):
+    """API endpoint with template hit rates and translation cache statistics"""
+    return JsonResponse({
+        'templates': template_engine.stats(),
+        'translation_cache': translator.cache.stats() if translator.cache is not None else None,
+    })
+
+
 def test_email(request):
     """Test email configuration"""
     if not request.session.get('is_admin'):
@@ -409,10 +523,10 @@ def api_create_announcement(request):
             return JsonResponse({'error': 'Text is required'}, status=400)
         
         # Parse datetime if provided
-        from django.utils.dateparse import parse_datetime
-        parsed_time = None
-        if announcement_time:
-            parsed_time = parse_datetime(announcement_time)
+        try:
+            parsed_time = parse_announcement_time(announcement_time)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Create announcement
         announcement = Announcement.objects.create(
@@ -424,12 +538,14 @@ def api_create_announcement(request):
             location=location,
             contact_no=contact_no,
             detected_language=language_detector.detect_language(text),
+            language_detected=True,
+            content_hash=content_fingerprint(text),
             priority=priority,
             status='pending'
         )
         
-        # Start async processing
-        process_announcement.delay(announcement.id)
+        # Start async processing in the announcement's priority lane
+        enqueue_announcement(announcement)
         
         return JsonResponse({
             'id': announcement.id,
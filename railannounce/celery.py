@@ -19,6 +19,26 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Route TTS tasks to a language-affine queue.
+    
+    Each TTS queue is served by a worker pool that only handles (and keeps
+    warm the models for) a subset of languages; see TTS_LANGUAGE_QUEUES.
+    """
+    from django.conf import settings
+    
+    if name != 'announcements.tasks.synthesize_audio':
+        return None
+    if not getattr(settings, 'TTS_DEDICATED_QUEUES', False):
+        return None
+    language_code = kwargs.get('language_code') if kwargs else None
+    if language_code is None and args and len(args) > 1:
+        language_code = args[1]
+    queues = getattr(settings, 'TTS_LANGUAGE_QUEUES', {})
+    return {'queue': queues.get(language_code, getattr(settings, 'TTS_DEFAULT_QUEUE', 'tts'))}
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
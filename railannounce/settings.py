@@ -149,10 +149,114 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
+CELERY_TASK_ROUTES = ('railannounce.celery.route_task',)
+
+# Priority lanes. Announcements with is_urgent or priority >= URGENT_PRIORITY_THRESHOLD run
+# every pipeline stage on the 'urgent' queue (TTS on dedicated queues excepted, see
+# TTS_DEDICATED_QUEUES), which has reserved capacity: start a worker
+# that consumes only that queue (other workers should consume it too: -Q urgent,celery), e.g.
+#   celery -A railannounce worker -Q urgent -c 2 -n urgent@%h
+# High-priority work stays on the normal queues but jumps ahead via broker priority
+# (Redis: 0 is served first).
+URGENT_PRIORITY_THRESHOLD = 9
+HIGH_PRIORITY_THRESHOLD = 7
+PROCESSING_LANES = {
+    'urgent': {'queue': 'urgent', 'priority': 0},
+    'high': {'queue': None, 'priority': 3},
+    'normal': {'queue': None, 'priority': 6},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+    # ETA tasks are redelivered after this; keep it above SCHEDULE_PRERENDER_LEAD_SECONDS
+    'visibility_timeout': 3600,
+}
+CELERY_TASK_DEFAULT_PRIORITY = 6
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Don't let busy workers hoard messages an urgent task could overtake
+# Scheduled announcements (announcement_time): render this long before they are due,
+# then publish to boards at the scheduled moment
+SCHEDULE_PRERENDER_LEAD_SECONDS = 600
+SCHEDULE_SWEEP_INTERVAL_SECONDS = 60  # How often celery beat looks for announcements to warm
+SCHEDULE_WARM_BATCH_SIZE = 20  # Announcements started per sweep
+SCHEDULE_WARM_SPACING_SECONDS = 5  # Gap between their start times, so a backlog renders gradually
+# Without celery beat, set False: renders are queued with a plain ETA at creation instead of
+# being parked for the sweep (ETAs beyond the broker visibility_timeout may run twice)
+SCHEDULE_USE_BEAT = os.environ.get('SCHEDULE_USE_BEAT', '1') == '1'
+# Audio blobs stored but never linked (their task died or the link failed) are deleted
+# by a beat sweep once they are older than the grace period
+AUDIO_BLOB_SWEEP_INTERVAL_SECONDS = 3600
+AUDIO_BLOB_ORPHAN_GRACE_SECONDS = 3600
+CELERY_BEAT_SCHEDULE = {
+    'warm-scheduled-announcements': {
+        'task': 'announcements.tasks.warm_scheduled_announcements',
+        'schedule': SCHEDULE_SWEEP_INTERVAL_SECONDS,
+    },
+    'sweep-audio-blobs': {
+        'task': 'announcements.tasks.sweep_audio_blobs',
+        'schedule': AUDIO_BLOB_SWEEP_INTERVAL_SECONDS,
+    },
+}
+# Queue wait time (publish -> task start) per lane, shared through Redis
+QUEUE_WAIT_REDIS_URL = 'redis://127.0.0.1:6379/2'
+# Template and translation cache hit counters, shared by every worker
+SERVICE_STATS_REDIS_URL = 'redis://127.0.0.1:6379/2'
+QUEUE_WAIT_MAX_SAMPLES = 500  # Recent samples kept per lane for percentiles
+QUEUE_WAIT_WARNING_SECONDS = {'urgent': 5}  # Log a warning when a lane's task waits longer
 
 # Gemini API Configuration
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 
+# Translation backends, tried in order; a backend whose circuit breaker is open is skipped
+# Available: 'gemini', 'libretranslate', 'stub' (deterministic, no network - for development)
+TRANSLATION_BACKENDS = ['gemini', 'libretranslate']
+TRANSLATION_BACKEND_TIMEOUT = 15  # Seconds per backend request
+TRANSLATION_BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures before a backend is skipped
+TRANSLATION_BREAKER_RESET_TIMEOUT = 30  # Seconds before a skipped backend is probed again
+
+# LibreTranslate (see start_libretranslate.sh)
+LIBRETRANSLATE_URL = os.environ.get('LIBRETRANSLATE_URL', 'http://127.0.0.1:5000')
+LIBRETRANSLATE_API_KEY = os.environ.get('LIBRETRANSLATE_API_KEY', '')
+
+# Gemini quota shared by every worker (token bucket in Redis)
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get('GEMINI_REQUESTS_PER_MINUTE', 10))
+GEMINI_TOKENS_PER_MINUTE = int(os.environ.get('GEMINI_TOKENS_PER_MINUTE', 250000))
+GEMINI_RATE_LIMIT_REDIS_URL = 'redis://127.0.0.1:6379/2'
+GEMINI_RATE_LIMIT_TIMEOUT = 60  # Seconds to wait for quota before falling back
+TRANSLATION_MAX_CONCURRENCY = 4  # Concurrent Gemini requests per worker process
+
+# Cache Configuration
+# 'translations' is the shared translation-memory tier used by all Celery workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'translations': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+}
+
+# Translation Memory Configuration
+TRANSLATION_CACHE_ENABLED = True
+TRANSLATION_CACHE_ALIAS = 'translations'
+TRANSLATION_CACHE_MAX_ENTRIES = 5000  # In-process LRU size per worker
+TRANSLATION_CACHE_TIMEOUT = 60 * 60 * 24 * 30  # Shared tier expiry (30 days)
+
+# Cross-announcement micro-batching of translation requests
+TRANSLATION_BATCH_ENABLED = True
+TRANSLATION_BATCH_REDIS_URL = 'redis://127.0.0.1:6379/2'
+TRANSLATION_BATCH_WINDOW_MS = 200  # How long a batch collects jobs before it is sent
+TRANSLATION_BATCH_MAX_SIZE = 10  # Send early once this many jobs are queued
+# Seconds before a task gives up and translates on its own; None waits out a whole flush
+# (GEMINI_RATE_LIMIT_TIMEOUT + TRANSLATION_BACKEND_TIMEOUT + the window)
+TRANSLATION_BATCH_MAX_WAIT = None
+
+# Translation Templates
+# Extra recurring patterns merged over TemplateEngine.DEFAULT_TEMPLATES, e.g.
+# {'cancelled': "Train {train_number} {train_name?} has been cancelled"}
+TRANSLATION_TEMPLATES = {}
+
 # Supported Languages
 SUPPORTED_LANGUAGES = {
     'en': 'English',
@@ -163,10 +267,79 @@ SUPPORTED_LANGUAGES = {
     'kn': 'Kannada',
 }
 
+# Language Detection
+LANGUAGE_DETECTION_PRELOAD = True  # Load langdetect profiles at process start
+LANGUAGE_DETECTION_SEED = 0  # Makes langdetect deterministic across processes
+LANGUAGE_DETECTION_CACHE_SIZE = 4096  # Memoized detections per process
+
 # TTS Configuration
 TTS_MODEL_PATH = BASE_DIR / 'tts_models'
 AUDIO_ROOT = BASE_DIR / 'media' / 'audio'
 AUDIO_URL = '/media/audio/'
+TTS_MODEL_MEMORY_BUDGET_MB = 1024  # Loaded Coqui models kept per worker process (LRU-evicted)
+# Languages this worker serves; TTS workers are started with a subset, e.g.
+#   TTS_WORKER_LANGUAGES=hi,bn,en celery -A railannounce worker -Q tts_north -c 2
+#   TTS_WORKER_LANGUAGES=ta,te,kn celery -A railannounce worker -Q tts_south -c 2
+# Empty by default, so other workers (and web processes) load models only when they need one
+TTS_WORKER_LANGUAGES = [lang for lang in os.environ.get('TTS_WORKER_LANGUAGES', '').split(',') if lang]
+TTS_PRELOAD_LANGUAGES = TTS_WORKER_LANGUAGES  # Models loaded when a worker process starts
+PYTTSX3_POOL_SIZE = 2  # pyttsx3 subprocesses per worker process (jobs run in parallel)
+PYTTSX3_TIMEOUT = 30  # Seconds before a pyttsx3 job's process is killed and replaced
+
+# Phrase-level audio cache: recurring phrases, station names and digits are synthesized
+# once, cached under media/audio/phrases/ and joined with short crossfades.
+TTS_PHRASE_CACHE_ENABLED = True
+TTS_PHRASE_CROSSFADE_MS = 30
+TTS_PHRASE_PAUSE_MS = 250  # Silence inserted at commas and full stops
+TTS_PHRASE_WARM_ON_START = False  # Synthesize missing phrase clips when a worker process starts
+TTS_PHRASES = {}  # Extra fixed phrases per language, e.g. {'hi': ['यात्रीगण कृपया ध्यान दें']}
+TTS_STATION_NAMES = []  # Station names treated as known phrases in every language
+
+# Compressed audio variants encoded from each WAV master (pydub/ffmpeg). Each variant is
+# stored as its own AudioFile; boards pick one, e.g. opus_low on weak station links.
+TTS_AUDIO_VARIANTS = {
+    'opus': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '32k', 'extension': 'ogg', 'mime_type': 'audio/ogg; codecs=opus'},
+    'opus_low': {'format': 'ogg', 'codec': 'libopus', 'bitrate': '12k', 'extension': 'ogg', 'mime_type': 'audio/ogg; codecs=opus'},
+    'mp3': {'format': 'mp3', 'codec': 'libmp3lame', 'bitrate': '64k', 'extension': 'mp3', 'mime_type': 'audio/mpeg'},
+}
+TTS_DEFAULT_AUDIO_VARIANT = 'mp3'  # Variant reported as audio_url (plays in every browser)
+
+# Batched synthesis: sentences of a text, and utterances queued by concurrent tasks for the
+# same language, go through Coqui VITS models together (one forward pass per batch).
+TTS_BATCH_ENABLED = True
+TTS_BATCH_REDIS_URL = 'redis://127.0.0.1:6379/2'
+TTS_BATCH_WINDOW_MS = 100  # How long a batch collects utterances before synthesis starts
+TTS_BATCH_MAX_SIZE = 8  # Utterances per batch (and sentences per forward pass)
+TTS_BATCH_MAX_WAIT = 120  # Seconds before a task gives up and synthesizes on its own
+
+# Post-processing of every synthesized WAV (needs NumPy; duration is read from headers either way)
+TTS_TARGET_LOUDNESS_DBFS = -20.0  # RMS level Coqui and pyttsx3 output is normalized to
+TTS_PEAK_CEILING_DBFS = -1.0  # Normalization never lifts a peak above this
+TTS_WAVEFORM_PEAKS = 100  # Points in the waveform preview sent to boards
+
+# Announcement program: one compressed file per announcement with a chime, then every
+# language in this order with gaps between them. TTS_PROGRAM_CHIME is 'builtin' (two-tone
+# chime), a path to an audio file, or None for no chime.
+TTS_PROGRAM_ENABLED = True
+TTS_PROGRAM_LANGUAGE_ORDER = ['en', 'hi', 'bn', 'ta', 'te', 'kn']
+TTS_PROGRAM_GAP_MS = 800
+TTS_PROGRAM_CHIME = 'builtin'
+TTS_PROGRAM_CHIME_GAP_MS = 400
+TTS_PROGRAM_VARIANT = 'mp3'  # One of TTS_AUDIO_VARIANTS
+
+# Dedicated TTS queues: synthesize_audio is routed by language_code to the queue below,
+# in every lane (urgent TTS is ordered by broker priority there, not sent to 'urgent').
+# Off by default so a single `celery -A railannounce worker` still handles everything.
+TTS_DEDICATED_QUEUES = os.environ.get('TTS_DEDICATED_QUEUES', '') == '1'
+TTS_DEFAULT_QUEUE = 'tts'
+TTS_LANGUAGE_QUEUES = {
+    'hi': 'tts_north',
+    'bn': 'tts_north',
+    'en': 'tts_north',
+    'ta': 'tts_south',
+    'te': 'tts_south',
+    'kn': 'tts_south',
+}
 
 # Timezone
 TIME_ZONE = 'Asia/Kolkata'
@@ -78,7 +78,7 @@ fi
 
 # Terminal 3: Celery Worker
 echo "Opening Terminal 3: Celery Worker..."
-$TERMINAL $TERMINAL_OPTS bash -c "cd '$PROJECT_DIR' && echo 'Celery Worker - Terminal 3'; echo ''; celery -A railannounce worker --loglevel=info; exec bash" &
+$TERMINAL $TERMINAL_OPTS bash -c "cd '$PROJECT_DIR' && echo 'Celery Worker - Terminal 3'; echo ''; celery -A railannounce worker -Q urgent,celery -B --loglevel=info; exec bash" &
 sleep 2
 
 # Terminal 4: Django Server
@@ -53,7 +53,7 @@ echo ""
 echo "Next steps:"
 echo "1. Start LibreTranslate server (see README.md)"
 echo "2. Start Redis: redis-server"
-echo "3. Start Celery worker: celery -A railannounce worker --loglevel=info"
+echo "3. Start Celery worker: celery -A railannounce worker -Q urgent,celery -B --loglevel=info"
 echo "4. Start Django server: python3 manage.py runserver"
 echo ""
 echo "For detailed instructions, see README.md"
@@ -60,7 +60,17 @@ echo "STEP 3: Start Celery Worker"
 echo "========================================"
 echo ""
 echo "Run this command in Terminal 3:"
-echo -e "${GREEN}cd $(pwd) && celery -A railannounce worker --loglevel=info${NC}"
+echo -e "${GREEN}cd $(pwd) && celery -A railannounce worker -Q urgent,celery --loglevel=info${NC}"
+echo ""
+echo "Recommended - reserved capacity for urgent announcements:"
+echo -e "${GREEN}cd $(pwd) && celery -A railannounce worker -Q urgent -c 2 -n urgent@%h --loglevel=info${NC}"
+echo ""
+echo "Optional - dedicated TTS workers (export TTS_DEDICATED_QUEUES=1 for all processes):"
+echo -e "${GREEN}cd $(pwd) && TTS_WORKER_LANGUAGES=hi,bn,en celery -A railannounce worker -Q tts_north -c 2 -n tts_north@%h --loglevel=info${NC}"
+echo -e "${GREEN}cd $(pwd) && TTS_WORKER_LANGUAGES=ta,te,kn celery -A railannounce worker -Q tts_south -c 2 -n tts_south@%h --loglevel=info${NC}"
+echo ""
+echo "Scheduler for announcements with an announcement_time (pre-renders them and publishes on time):"
+echo -e "${GREEN}cd $(pwd) && celery -A railannounce beat --loglevel=info${NC}"
 echo ""
 read -p "Press Enter when Celery worker is running..."
 